@@ -0,0 +1,7 @@
+from src.db.connection import get_database
+
+
+db = get_database()
+
+filas = db.reconstruir_pagos_mensuales()
+print(f"pagos_mensuales reconstruido: {filas} filas")
@@ -0,0 +1,27 @@
+-- Índices para los filtros y joins de filter_gestiones / filtrar_pagos
+
+-- EXISTS (... FROM pagos p WHERE g.id = p.gestion_id) y pagos por gestión
+CREATE INDEX IF NOT EXISTS idx_pagos_gestion_id ON pagos (gestion_id);
+
+-- ORDER BY p.fecha DESC
+CREATE INDEX IF NOT EXISTS idx_pagos_fecha ON pagos (fecha);
+
+-- Filtros por pagador / destinatario / forma de pago
+CREATE INDEX IF NOT EXISTS idx_pagos_pagador_id ON pagos (pagador_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_destinatario_id ON pagos (destinatario_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_formapago_id ON pagos (formapago_id);
+
+-- Listado por defecto: gestiones activas ordenadas por fecha
+CREATE INDEX IF NOT EXISTS idx_gestiones_fecha_activa ON gestiones (fecha)
+WHERE activa = 1;
+
+-- Búsqueda por número de gestión (y el trigger validar_ngestion)
+CREATE INDEX IF NOT EXISTS idx_gestiones_ngestion ON gestiones (ngestion);
+
+-- Notas por factura (períodos)
+CREATE INDEX IF NOT EXISTS idx_notas_factura_id ON notas (factura_id);
+
+-- Gestiones relacionadas por documento
+CREATE INDEX IF NOT EXISTS idx_gestion_documento_documento_id ON gestion_documento (documento_id);
+
+ANALYZE;
@@ -0,0 +1,39 @@
+-- Índice de texto completo (trigramas) para el cuadro de búsqueda de
+-- gestiones y pagos. Tabla de contenido externo sobre gestiones,
+-- sincronizada por triggers.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS gestiones_fts USING fts5 (
+    ngestion,
+    cliente,
+    dominio,
+    poliza,
+    obs,
+    content = 'gestiones',
+    content_rowid = 'id',
+    tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS gestiones_fts_ai
+AFTER INSERT ON gestiones
+BEGIN
+    INSERT INTO gestiones_fts (rowid, ngestion, cliente, dominio, poliza, obs)
+    VALUES (NEW.id, NEW.ngestion, NEW.cliente, NEW.dominio, NEW.poliza, NEW.obs);
+END;
+
+CREATE TRIGGER IF NOT EXISTS gestiones_fts_ad
+AFTER DELETE ON gestiones
+BEGIN
+    INSERT INTO gestiones_fts (gestiones_fts, rowid, ngestion, cliente, dominio, poliza, obs)
+    VALUES ('delete', OLD.id, OLD.ngestion, OLD.cliente, OLD.dominio, OLD.poliza, OLD.obs);
+END;
+
+CREATE TRIGGER IF NOT EXISTS gestiones_fts_au
+AFTER UPDATE OF ngestion, cliente, dominio, poliza, obs ON gestiones
+BEGIN
+    INSERT INTO gestiones_fts (gestiones_fts, rowid, ngestion, cliente, dominio, poliza, obs)
+    VALUES ('delete', OLD.id, OLD.ngestion, OLD.cliente, OLD.dominio, OLD.poliza, OLD.obs);
+    INSERT INTO gestiones_fts (rowid, ngestion, cliente, dominio, poliza, obs)
+    VALUES (NEW.id, NEW.ngestion, NEW.cliente, NEW.dominio, NEW.poliza, NEW.obs);
+END;
+
+INSERT INTO gestiones_fts (gestiones_fts) VALUES ('rebuild');
@@ -0,0 +1,3 @@
+-- Paginación por cursor (fecha, id) de la tabla de gestiones cuando el
+-- filtro no se limita a las activas (el índice parcial no aplica)
+CREATE INDEX IF NOT EXISTS idx_gestiones_fecha ON gestiones (fecha);
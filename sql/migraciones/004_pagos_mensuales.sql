@@ -0,0 +1,167 @@
+-- Resumen mensual de pagos para /reportes. Una fila por período
+-- (YYYY-MM), forma de pago, pagador, destinatario y estado activa de la
+-- gestión, con la suma de importes y la cantidad de pagos. Los triggers
+-- lo mantienen al día; SQLiteDB.reconstruir_pagos_mensuales lo rehace
+-- desde cero.
+
+CREATE TABLE IF NOT EXISTS pagos_mensuales (
+    periodo TEXT NOT NULL,
+    formapago_id INTEGER NOT NULL,
+    pagador_id INTEGER NOT NULL,
+    destinatario_id INTEGER NOT NULL,
+    activa INTEGER NOT NULL,
+    importe REAL NOT NULL DEFAULT(0.0),
+    pagos INTEGER NOT NULL DEFAULT(0),
+    PRIMARY KEY (periodo, formapago_id, pagador_id, destinatario_id, activa)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_pagos_mensuales_activa
+ON pagos_mensuales (activa, periodo);
+
+-- Alta de un pago: sumar en su grupo
+CREATE TRIGGER IF NOT EXISTS pagos_mensuales_pagos_ai
+AFTER INSERT ON pagos
+BEGIN
+    INSERT INTO pagos_mensuales (periodo, formapago_id, pagador_id, destinatario_id, activa, importe, pagos)
+    SELECT substr(NEW.fecha, 1, 7), NEW.formapago_id, NEW.pagador_id, NEW.destinatario_id, g.activa, NEW.importe, 1
+    FROM gestiones g
+    WHERE g.id = NEW.gestion_id
+    ON CONFLICT (periodo, formapago_id, pagador_id, destinatario_id, activa) DO UPDATE SET
+        importe = importe + excluded.importe,
+        pagos = pagos + excluded.pagos;
+END;
+
+-- Baja de un pago: restar de su grupo. Si la gestión ya no existe
+-- (borrado en cascada) no hace nada: gestiones_pagos_mensuales_bd ya
+-- restó sus pagos.
+CREATE TRIGGER IF NOT EXISTS pagos_mensuales_pagos_ad
+AFTER DELETE ON pagos
+BEGIN
+    UPDATE pagos_mensuales SET
+        importe = importe - OLD.importe,
+        pagos = pagos - 1
+    WHERE periodo = substr(OLD.fecha, 1, 7)
+        AND formapago_id = OLD.formapago_id
+        AND pagador_id = OLD.pagador_id
+        AND destinatario_id = OLD.destinatario_id
+        AND activa = (SELECT activa FROM gestiones WHERE id = OLD.gestion_id);
+    DELETE FROM pagos_mensuales
+    WHERE pagos <= 0
+        AND periodo = substr(OLD.fecha, 1, 7)
+        AND formapago_id = OLD.formapago_id
+        AND pagador_id = OLD.pagador_id
+        AND destinatario_id = OLD.destinatario_id;
+END;
+
+-- Modificación de un pago: restar de su grupo viejo y sumar en el nuevo
+CREATE TRIGGER IF NOT EXISTS pagos_mensuales_pagos_au
+AFTER UPDATE OF gestion_id, fecha, pagador_id, destinatario_id, formapago_id, importe ON pagos
+BEGIN
+    UPDATE pagos_mensuales SET
+        importe = importe - OLD.importe,
+        pagos = pagos - 1
+    WHERE periodo = substr(OLD.fecha, 1, 7)
+        AND formapago_id = OLD.formapago_id
+        AND pagador_id = OLD.pagador_id
+        AND destinatario_id = OLD.destinatario_id
+        AND activa = (SELECT activa FROM gestiones WHERE id = OLD.gestion_id);
+    DELETE FROM pagos_mensuales
+    WHERE pagos <= 0
+        AND periodo = substr(OLD.fecha, 1, 7)
+        AND formapago_id = OLD.formapago_id
+        AND pagador_id = OLD.pagador_id
+        AND destinatario_id = OLD.destinatario_id;
+    INSERT INTO pagos_mensuales (periodo, formapago_id, pagador_id, destinatario_id, activa, importe, pagos)
+    SELECT substr(NEW.fecha, 1, 7), NEW.formapago_id, NEW.pagador_id, NEW.destinatario_id, g.activa, NEW.importe, 1
+    FROM gestiones g
+    WHERE g.id = NEW.gestion_id
+    ON CONFLICT (periodo, formapago_id, pagador_id, destinatario_id, activa) DO UPDATE SET
+        importe = importe + excluded.importe,
+        pagos = pagos + excluded.pagos;
+END;
+
+-- Cambio de activa en una gestión: mover sus pagos al grupo nuevo
+CREATE TRIGGER IF NOT EXISTS gestiones_pagos_mensuales_au
+AFTER UPDATE OF activa ON gestiones
+WHEN OLD.activa IS NOT NEW.activa
+BEGIN
+    UPDATE pagos_mensuales SET
+        importe = importe - (
+            SELECT sum(p.importe) FROM pagos p
+            WHERE p.gestion_id = OLD.id
+                AND substr(p.fecha, 1, 7) = pagos_mensuales.periodo
+                AND p.formapago_id = pagos_mensuales.formapago_id
+                AND p.pagador_id = pagos_mensuales.pagador_id
+                AND p.destinatario_id = pagos_mensuales.destinatario_id
+        ),
+        pagos = pagos - (
+            SELECT count(*) FROM pagos p
+            WHERE p.gestion_id = OLD.id
+                AND substr(p.fecha, 1, 7) = pagos_mensuales.periodo
+                AND p.formapago_id = pagos_mensuales.formapago_id
+                AND p.pagador_id = pagos_mensuales.pagador_id
+                AND p.destinatario_id = pagos_mensuales.destinatario_id
+        )
+    WHERE activa = OLD.activa
+        AND EXISTS (
+            SELECT 1 FROM pagos p
+            WHERE p.gestion_id = OLD.id
+                AND substr(p.fecha, 1, 7) = pagos_mensuales.periodo
+                AND p.formapago_id = pagos_mensuales.formapago_id
+                AND p.pagador_id = pagos_mensuales.pagador_id
+                AND p.destinatario_id = pagos_mensuales.destinatario_id
+        );
+    DELETE FROM pagos_mensuales
+    WHERE pagos <= 0 AND activa = OLD.activa;
+    INSERT INTO pagos_mensuales (periodo, formapago_id, pagador_id, destinatario_id, activa, importe, pagos)
+    SELECT substr(p.fecha, 1, 7), p.formapago_id, p.pagador_id, p.destinatario_id, NEW.activa, sum(p.importe), count(*)
+    FROM pagos p
+    WHERE p.gestion_id = NEW.id
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (periodo, formapago_id, pagador_id, destinatario_id, activa) DO UPDATE SET
+        importe = importe + excluded.importe,
+        pagos = pagos + excluded.pagos;
+END;
+
+-- Baja de una gestión: restar sus pagos antes de que el borrado en
+-- cascada los elimine
+CREATE TRIGGER IF NOT EXISTS gestiones_pagos_mensuales_bd
+BEFORE DELETE ON gestiones
+BEGIN
+    UPDATE pagos_mensuales SET
+        importe = importe - (
+            SELECT sum(p.importe) FROM pagos p
+            WHERE p.gestion_id = OLD.id
+                AND substr(p.fecha, 1, 7) = pagos_mensuales.periodo
+                AND p.formapago_id = pagos_mensuales.formapago_id
+                AND p.pagador_id = pagos_mensuales.pagador_id
+                AND p.destinatario_id = pagos_mensuales.destinatario_id
+        ),
+        pagos = pagos - (
+            SELECT count(*) FROM pagos p
+            WHERE p.gestion_id = OLD.id
+                AND substr(p.fecha, 1, 7) = pagos_mensuales.periodo
+                AND p.formapago_id = pagos_mensuales.formapago_id
+                AND p.pagador_id = pagos_mensuales.pagador_id
+                AND p.destinatario_id = pagos_mensuales.destinatario_id
+        )
+    WHERE activa = OLD.activa
+        AND EXISTS (
+            SELECT 1 FROM pagos p
+            WHERE p.gestion_id = OLD.id
+                AND substr(p.fecha, 1, 7) = pagos_mensuales.periodo
+                AND p.formapago_id = pagos_mensuales.formapago_id
+                AND p.pagador_id = pagos_mensuales.pagador_id
+                AND p.destinatario_id = pagos_mensuales.destinatario_id
+        );
+    DELETE FROM pagos_mensuales
+    WHERE pagos <= 0 AND activa = OLD.activa;
+END;
+
+-- Carga inicial
+DELETE FROM pagos_mensuales;
+INSERT INTO pagos_mensuales (periodo, formapago_id, pagador_id, destinatario_id, activa, importe, pagos)
+SELECT substr(p.fecha, 1, 7), p.formapago_id, p.pagador_id, p.destinatario_id, g.activa, sum(p.importe), count(*)
+FROM pagos p
+JOIN gestiones g ON g.id = p.gestion_id
+GROUP BY 1, 2, 3, 4, 5;
@@ -0,0 +1,12 @@
+-- ngestion único (salvo 0, que se repite en las gestiones sin número).
+-- El índice único reemplaza al trigger validar_ngestion: valida también
+-- los UPDATE y permite INSERT ... ON CONFLICT (ngestion) en la
+-- importación desde Excel, que el trigger abortaría antes de llegar al
+-- conflicto. Como el trigger no revisaba los UPDATE puede haber
+-- números repetidos: aplicar_migraciones los lista y no aplica el
+-- script hasta que se corrijan.
+DROP TRIGGER IF EXISTS validar_ngestion;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_gestiones_ngestion_unico
+ON gestiones (ngestion)
+WHERE ngestion != 0;
@@ -2,8 +2,36 @@ from pathlib import Path
 
 
 SQL_CREATE_FILE = Path("sql") / "create.sql"
+SQL_MIGRACIONES_DIR = Path("sql") / "migraciones"
 DB_PATH = Path("gestiones.db")
 ACCESS_DB_PATH = Path("db.accdb")
+# Tablas de Access ya exportadas (Parquet), por versión de db.accdb
+ACCESS_CACHE_DIR = Path(".cache") / "access"
 
 DATA_PATH = Path("/home/fexa/REPOSTORIOS/SOS/data")
 EXCEL_PATH = DATA_PATH / "Gestión Reclamos Y Reintegros.xlsx"
+# Filas que la importación de gestiones lee y combina por vez
+IMPORTACION_FILAS_POR_BLOQUE = 50_000
+# Filas de un bloque que se combinan en cada transacción; mientras
+# tanto la importación tiene el camino de escritura y las demás
+# escrituras esperan
+IMPORTACION_FILAS_POR_ESCRITURA = 5_000
+
+# Perfil aplicado a cada conexión SQLite al abrirla
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # negativo = KiB (64 MB)
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,  # ms
+}
+# Segundos que una escritura hecha desde el event loop espera a que
+# otro hilo libere el camino de escritura antes de avisar que la base
+# está ocupada
+ESCRITURA_ESPERA_EVENT_LOOP = 1.0
+
+# Segundos que un reporte cacheado sigue válido aunque no haya
+# escrituras (p. ej. si otro proceso modificó la base)
+REPORTES_CACHE_TTL = 600
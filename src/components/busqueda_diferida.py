@@ -0,0 +1,57 @@
+"""Búsqueda con debounce, ejecutada fuera del event loop"""
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+from nicegui import background_tasks, run
+
+from src.config import BUSQUEDA_DEMORA_MS
+
+
+class BusquedaDiferida:
+    """
+    Pipeline de búsqueda para las páginas de listado.
+
+    Cada disparo reinicia la espera; al vencer, la consulta corre en un
+    hilo (run.io_bound) y solo se muestra si no llegó un disparo más
+    nuevo mientras tanto. Las tareas superadas se cancelan y, si su
+    consulta ya estaba en curso, su resultado se descarta.
+    """
+
+    def __init__(
+        self,
+        consultar: Callable[..., Any],
+        mostrar: Callable[[Any], None],
+        demora_ms: int = BUSQUEDA_DEMORA_MS,
+    ):
+        self.consultar = consultar
+        self.mostrar = mostrar
+        self.demora_ms = demora_ms
+        self._generacion = 0
+        self._tarea: asyncio.Task | None = None
+
+    def cancelar(self):
+        """Descarta la búsqueda pendiente o en curso, si la hay"""
+        self._generacion += 1
+        if self._tarea and not self._tarea.done():
+            self._tarea.cancel()
+
+    def disparar(self, *args, inmediato: bool = False):
+        """Programa una búsqueda con los argumentos dados"""
+        self.cancelar()
+        self._tarea = background_tasks.create(
+            self._ejecutar(self._generacion, args, inmediato),
+            name="busqueda_diferida",
+        )
+
+    async def _ejecutar(
+        self, generacion: int, args: tuple, inmediato: bool
+    ):
+        if not inmediato:
+            await asyncio.sleep(self.demora_ms / 1000)
+        resultado = await run.io_bound(self.consultar, *args)
+        if generacion != self._generacion:
+            # Llegó una búsqueda más nueva: descartar
+            return
+        self.mostrar(resultado)
@@ -9,6 +9,7 @@ from pathlib import Path
 from datetime import date
 from nicegui import ui
 from src.db.connection import get_database
+from src.db.pool import EscrituraOcupada
 from src.components.tipo_select import crear_tipo_select
 from src.components.estado_select import crear_estado_select
 
@@ -575,197 +576,207 @@ def crear_dialog_gestiones_masivas(
 
         progreso_dialog.open()
 
-        # Guardar gestiones
-        gestiones_creadas = []
-        gestiones_info = []  # Para almacenar info de gestiones para pagos
-        fallos = []
-
-        for idx, gestion in enumerate(gestiones_data):
-            # Detectar si es modo edición (si la gestión tiene ID)
-            es_actualizacion = "id" in gestion and gestion["id"]
-
-            if es_actualizacion:
-                progreso_label.text = f"Actualizando gestión {idx + 1} de {len(gestiones_data)}..."
-            else:
-                progreso_label.text = f"Creando gestión {idx + 1} de {len(gestiones_data)}..."
-
-            # Para gestiones masivas, ngestion siempre es 0
-            ngestion = 0
-
-            # Normalizar dominio antes de guardar (por si acaso)
-            dominio_normalizado = (
-                gestion["dominio"].upper().replace(" ", "")
-                if gestion.get("dominio")
-                else ""
-            )
-
-            if es_actualizacion:
-                # Actualizar gestión existente
-                exito, mensaje = database.actualizar_gestion(
-                    gestion_id=gestion["id"],
-                    ngestion=ngestion,
-                    fecha=gestion["fecha"],
-                    cliente=gestion["cliente"],
-                    dominio=dominio_normalizado,
-                    poliza=gestion["poliza"],
-                    tipo=gestion["tipo"],
-                    motivo=gestion["motivo"],
-                    ncaso=gestion["ncaso"],
-                    usuariocarga=gestion["usuariocarga"],
-                    usuariorespuesta=gestion["usuariorespuesta"],
-                    estado=gestion["estado"],
-                    itr=gestion["itr"],
-                    totalfactura=gestion["totalfactura"],
-                    terminado=gestion["terminado"],
-                    obs=gestion["obs"],
-                    activa=gestion["activa"],
-                )
-                gestion_id = gestion["id"]
-            else:
-                # Crear nueva gestión
-                exito, mensaje = database.crear_gestion(
-                    ngestion=ngestion,
-                    fecha=gestion["fecha"],
-                    cliente=gestion["cliente"],
-                    dominio=dominio_normalizado,
-                    poliza=gestion["poliza"],
-                    tipo=gestion["tipo"],
-                    motivo=gestion["motivo"],
-                    ncaso=gestion["ncaso"],
-                    usuariocarga=gestion["usuariocarga"],
-                    usuariorespuesta=gestion["usuariorespuesta"],
-                    estado=gestion["estado"],
-                    itr=gestion["itr"],
-                    totalfactura=gestion["totalfactura"],
-                    terminado=gestion["terminado"],
-                    obs=gestion["obs"],
-                    activa=gestion["activa"],
-                )
-                gestion_id = database.cursor.lastrowid
-
-            if exito:
-                gestiones_creadas.append(gestion_id)
-                gestiones_info.append(
-                    {
-                        "id": gestion_id,
-                        "fecha": gestion["fecha"],
-                        "totalfactura": gestion["totalfactura"],
-                    }
-                )
-            else:
-                fallos.append(f"Gestión #{idx + 1}: {mensaje}")
-
-        # Generar pagos si se solicitó
-        pagos_creados = 0
-        fallos_pagos = []
-        if generar_pagos and gestiones_info:
-            progreso_label.text = "Generando pagos..."
-
-            # Usar valores específicos: SOS -> PRESTADOR por TRANSFERENCIA
-            pagador = "SOS"
-            destinatario = "PRESTADOR"
-            formapago = "TRANSFERENCIA"
-
-            # Verificar que existan en la BD
-            pagador_id = database.obtener_agente_id_por_nombre(
-                pagador
-            )
-            destinatario_id = (
-                database.obtener_agente_id_por_nombre(
-                    destinatario
-                )
-            )
-            formapago_id = (
-                database.obtener_formapago_id_por_nombre(
-                    formapago
-                )
-            )
+        # Todo el guardado en un solo turno del camino de escritura:
+        # si otro hilo lo tiene (p. ej. una importación) se avisa
+        # en lugar de dejar el guardado a medias
+        try:
+            with database.escritura():
+                # Guardar gestiones
+                gestiones_creadas = []
+                gestiones_info = []  # Para almacenar info de gestiones para pagos
+                fallos = []
+
+                for idx, gestion in enumerate(gestiones_data):
+                    # Detectar si es modo edición (si la gestión tiene ID)
+                    es_actualizacion = "id" in gestion and gestion["id"]
+
+                    if es_actualizacion:
+                        progreso_label.text = f"Actualizando gestión {idx + 1} de {len(gestiones_data)}..."
+                    else:
+                        progreso_label.text = f"Creando gestión {idx + 1} de {len(gestiones_data)}..."
 
-            if not pagador_id:
-                fallos_pagos.append(
-                    f"No existe el agente '{pagador}' en la base de datos"
-                )
-            if not destinatario_id:
-                fallos_pagos.append(
-                    f"No existe el agente '{destinatario}' en la base de datos"
-                )
-            if not formapago_id:
-                fallos_pagos.append(
-                    f"No existe la forma de pago '{formapago}' en la base de datos"
-                )
+                    # Para gestiones masivas, ngestion siempre es 0
+                    ngestion = 0
 
-            if pagador_id and destinatario_id and formapago_id:
-                # Crear pagos para cada gestión
-                for gestion_info in gestiones_info:
-                    exito, mensaje = database.crear_pago(
-                        gestion_id=gestion_info["id"],
-                        fecha=gestion_info["fecha"],
-                        pagador=pagador,
-                        destinatario=destinatario,
-                        formapago=formapago,
-                        importe=gestion_info["totalfactura"],
+                    # Normalizar dominio antes de guardar (por si acaso)
+                    dominio_normalizado = (
+                        gestion["dominio"].upper().replace(" ", "")
+                        if gestion.get("dominio")
+                        else ""
                     )
 
-                    if exito:
-                        pagos_creados += 1
+                    if es_actualizacion:
+                        # Actualizar gestión existente
+                        exito, mensaje = database.actualizar_gestion(
+                            gestion_id=gestion["id"],
+                            ngestion=ngestion,
+                            fecha=gestion["fecha"],
+                            cliente=gestion["cliente"],
+                            dominio=dominio_normalizado,
+                            poliza=gestion["poliza"],
+                            tipo=gestion["tipo"],
+                            motivo=gestion["motivo"],
+                            ncaso=gestion["ncaso"],
+                            usuariocarga=gestion["usuariocarga"],
+                            usuariorespuesta=gestion["usuariorespuesta"],
+                            estado=gestion["estado"],
+                            itr=gestion["itr"],
+                            totalfactura=gestion["totalfactura"],
+                            terminado=gestion["terminado"],
+                            obs=gestion["obs"],
+                            activa=gestion["activa"],
+                        )
+                        gestion_id = gestion["id"]
                     else:
-                        fallos_pagos.append(
-                            f"Pago para gestión {gestion_info['id']}: {mensaje}"
+                        # Crear nueva gestión
+                        exito, mensaje = database.crear_gestion(
+                            ngestion=ngestion,
+                            fecha=gestion["fecha"],
+                            cliente=gestion["cliente"],
+                            dominio=dominio_normalizado,
+                            poliza=gestion["poliza"],
+                            tipo=gestion["tipo"],
+                            motivo=gestion["motivo"],
+                            ncaso=gestion["ncaso"],
+                            usuariocarga=gestion["usuariocarga"],
+                            usuariorespuesta=gestion["usuariorespuesta"],
+                            estado=gestion["estado"],
+                            itr=gestion["itr"],
+                            totalfactura=gestion["totalfactura"],
+                            terminado=gestion["terminado"],
+                            obs=gestion["obs"],
+                            activa=gestion["activa"],
                         )
+                        gestion_id = database.cursor.lastrowid
 
-        # Asociar documentos a todas las gestiones creadas
-        if documentos_pendientes and gestiones_creadas:
-            progreso_label.text = "Asociando documentos..."
-
-            for doc in documentos_pendientes:
-                # Verificar si el documento ya existe en la BD
-                existe = database.cursor.execute(
-                    "SELECT id FROM documentos WHERE hash = :hash",
-                    {"hash": doc["hash"]},
-                ).fetchone()
-
-                if existe:
-                    documento_id = existe["id"]
-                else:
-                    # Crear el documento
-                    database.cursor.execute(
-                        """INSERT INTO documentos 
-                           (titulo, descripcion, nombre_archivo, mime_type, tamano, hash, ruta, creado_por)
-                           VALUES (:titulo, :descripcion, :nombre_archivo, :mime_type, :tamano, :hash, :ruta, :creado_por)""",
-                        {
-                            "titulo": doc["titulo"],
-                            "descripcion": doc.get(
-                                "descripcion", ""
-                            ),
-                            "nombre_archivo": doc[
-                                "nombre_archivo"
-                            ],
-                            "mime_type": doc["mime_type"],
-                            "tamano": doc["tamano"],
-                            "hash": doc["hash"],
-                            "ruta": doc["ruta"],
-                            "creado_por": None,
-                        },
-                    )
-                    documento_id = database.cursor.lastrowid
-
-                # Asociar a todas las gestiones creadas
-                for gestion_id in gestiones_creadas:
-                    try:
-                        database.cursor.execute(
-                            """INSERT INTO gestion_documento (gestion_id, documento_id)
-                               VALUES (:gestion_id, :documento_id)""",
+                    if exito:
+                        gestiones_creadas.append(gestion_id)
+                        gestiones_info.append(
                             {
-                                "gestion_id": gestion_id,
-                                "documento_id": documento_id,
-                            },
+                                "id": gestion_id,
+                                "fecha": gestion["fecha"],
+                                "totalfactura": gestion["totalfactura"],
+                            }
+                        )
+                    else:
+                        fallos.append(f"Gestión #{idx + 1}: {mensaje}")
+
+                # Generar pagos si se solicitó
+                pagos_creados = 0
+                fallos_pagos = []
+                if generar_pagos and gestiones_info:
+                    progreso_label.text = "Generando pagos..."
+
+                    # Usar valores específicos: SOS -> PRESTADOR por TRANSFERENCIA
+                    pagador = "SOS"
+                    destinatario = "PRESTADOR"
+                    formapago = "TRANSFERENCIA"
+
+                    # Verificar que existan en la BD
+                    pagador_id = database.obtener_agente_id_por_nombre(
+                        pagador
+                    )
+                    destinatario_id = (
+                        database.obtener_agente_id_por_nombre(
+                            destinatario
+                        )
+                    )
+                    formapago_id = (
+                        database.obtener_formapago_id_por_nombre(
+                            formapago
+                        )
+                    )
+
+                    if not pagador_id:
+                        fallos_pagos.append(
+                            f"No existe el agente '{pagador}' en la base de datos"
                         )
-                    except Exception as e:
-                        print(
-                            f"Error asociando documento a gestión {gestion_id}: {e}"
+                    if not destinatario_id:
+                        fallos_pagos.append(
+                            f"No existe el agente '{destinatario}' en la base de datos"
+                        )
+                    if not formapago_id:
+                        fallos_pagos.append(
+                            f"No existe la forma de pago '{formapago}' en la base de datos"
                         )
 
-            database.conn.commit()
+                    if pagador_id and destinatario_id and formapago_id:
+                        # Crear pagos para cada gestión
+                        for gestion_info in gestiones_info:
+                            exito, mensaje = database.crear_pago(
+                                gestion_id=gestion_info["id"],
+                                fecha=gestion_info["fecha"],
+                                pagador=pagador,
+                                destinatario=destinatario,
+                                formapago=formapago,
+                                importe=gestion_info["totalfactura"],
+                            )
+
+                            if exito:
+                                pagos_creados += 1
+                            else:
+                                fallos_pagos.append(
+                                    f"Pago para gestión {gestion_info['id']}: {mensaje}"
+                                )
+
+                # Asociar documentos a todas las gestiones creadas
+                if documentos_pendientes and gestiones_creadas:
+                    progreso_label.text = "Asociando documentos..."
+
+                    with database.escritura():
+                        for doc in documentos_pendientes:
+                            # Verificar si el documento ya existe en la BD
+                            existe = database.cursor.execute(
+                                "SELECT id FROM documentos WHERE hash = :hash",
+                                {"hash": doc["hash"]},
+                            ).fetchone()
+
+                            if existe:
+                                documento_id = existe["id"]
+                            else:
+                                # Crear el documento
+                                database.cursor.execute(
+                                    """INSERT INTO documentos 
+                                       (titulo, descripcion, nombre_archivo, mime_type, tamano, hash, ruta, creado_por)
+                                       VALUES (:titulo, :descripcion, :nombre_archivo, :mime_type, :tamano, :hash, :ruta, :creado_por)""",
+                                    {
+                                        "titulo": doc["titulo"],
+                                        "descripcion": doc.get(
+                                            "descripcion", ""
+                                        ),
+                                        "nombre_archivo": doc[
+                                            "nombre_archivo"
+                                        ],
+                                        "mime_type": doc["mime_type"],
+                                        "tamano": doc["tamano"],
+                                        "hash": doc["hash"],
+                                        "ruta": doc["ruta"],
+                                        "creado_por": None,
+                                    },
+                                )
+                                documento_id = database.cursor.lastrowid
+
+                            # Asociar a todas las gestiones creadas
+                            for gestion_id in gestiones_creadas:
+                                try:
+                                    database.cursor.execute(
+                                        """INSERT INTO gestion_documento (gestion_id, documento_id)
+                                           VALUES (:gestion_id, :documento_id)""",
+                                        {
+                                            "gestion_id": gestion_id,
+                                            "documento_id": documento_id,
+                                        },
+                                    )
+                                except Exception as e:
+                                    print(
+                                        f"Error asociando documento a gestión {gestion_id}: {e}"
+                                    )
+
+                        database.conn.commit()
+        except EscrituraOcupada as e:
+            progreso_dialog.close()
+            ui.notify(str(e), type="warning")
+            return
 
         progreso_dialog.close()
 
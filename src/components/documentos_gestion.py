@@ -3,14 +3,14 @@ import hashlib
 import tempfile
 from pathlib import Path
 from nicegui import ui
-from src.db.database import SQLiteDB
+from src.db.connection import get_database
 
 
 def crear_seccion_documentos(gestion_id: int):
     """
     Crea la sección de gestión de documentos para una gestión
     """
-    database = SQLiteDB()
+    database = get_database()
 
     # Directorio base para documentos
     docs_dir = Path("files/docs")
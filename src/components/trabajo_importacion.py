@@ -0,0 +1,85 @@
+"""Importación de gestiones ejecutada fuera del event loop"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from nicegui import run, ui
+
+from src.db.connection import get_database
+
+# Texto de cada etapa que informa importar_gestiones_desde_excel
+ETAPAS = {
+    "leidas": "filas leídas",
+    "combinadas": "gestiones escritas",
+}
+
+
+class TrabajoImportacion:
+    """
+    Una importación de gestiones desde Excel, CSV o Parquet.
+
+    El archivo subido se guarda en un temporal y la importación corre
+    en un hilo (run.io_bound) para no frenar al resto de los clientes.
+    El hilo deja su avance en etapa/filas, que el diálogo consulta con
+    un ui.timer, y revisa el pedido de cancelación entre bloques y
+    durante las sentencias SQL.
+    """
+
+    def __init__(self, archivo: Path):
+        self.archivo = archivo
+        self.etapa: str | None = None
+        self.filas = 0
+        self._cancelado = threading.Event()
+
+    @classmethod
+    async def desde_upload(
+        cls, upload: ui.upload.FileUpload
+    ) -> "TrabajoImportacion":
+        """Guarda el archivo subido en un temporal con su extensión"""
+        extension = Path(upload.name).suffix.lower()
+        fd, ruta = tempfile.mkstemp(suffix=extension)
+        os.close(fd)
+        await upload.save(ruta)
+        return cls(Path(ruta))
+
+    @property
+    def cancelado(self) -> bool:
+        """Si se pidió cancelar"""
+        return self._cancelado.is_set()
+
+    def cancelar(self):
+        """Pide cancelar; se deshace el bloque en curso y los
+        anteriores quedan guardados"""
+        self._cancelado.set()
+
+    def descripcion(self) -> str:
+        """Avance para mostrar en el diálogo"""
+        if self.cancelado:
+            return "Cancelando..."
+        if self.etapa is None:
+            return "Leyendo archivo..."
+        return f"{self.filas} {ETAPAS[self.etapa]}"
+
+    def _progreso(self, etapa: str, filas: int):
+        self.etapa = etapa
+        self.filas = filas
+
+    async def ejecutar(self) -> tuple[bool, dict]:
+        """Corre la importación en un hilo y retorna su resultado"""
+        try:
+            resultado = await run.io_bound(
+                get_database().importar_gestiones_desde_excel,
+                self.archivo,
+                progreso=self._progreso,
+                cancelar=self._cancelado.is_set,
+            )
+        finally:
+            self.archivo.unlink(missing_ok=True)
+        if resultado is None:
+            # La aplicación se está cerrando
+            return False, {
+                "errores": ["Importación interrumpida"]
+            }
+        return resultado
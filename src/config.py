@@ -3,6 +3,9 @@ from nicegui import ui
 APP_TITLE = "Gestiones SOS"
 APP_PORT = 8080
 
+# Espera (ms) desde la última tecla antes de lanzar una búsqueda
+BUSQUEDA_DEMORA_MS = 300
+
 
 def setup_theme():
     """Configura el tema de colores de la aplicación"""
@@ -0,0 +1,788 @@
+"""
+Migración desde la base Access (db.accdb).
+
+Las tablas de Access se leen como DataFrames y se insertan por tabla,
+con un solo executemany cada una. Los ids nuevos se asignan en Polars
+antes de insertar, de modo que las referencias entre tablas (gestión,
+agentes y forma de pago de cada pago, pago y factura de cada nota) se
+resuelven con joins en memoria en lugar de una consulta a las tablas
+aux_* por fila. Las tablas aux_* se siguen llenando con la
+correspondencia id viejo → id nuevo.
+
+La migración corre por etapas (catálogos → facturas → gestiones →
+pagos → notas), cada una en su transacción; migracion_etapas registra
+las terminadas para poder retomar una corrida interrumpida.
+
+Las tablas se exportan en paralelo y se guardan en Parquet
+(ACCESS_CACHE_DIR); mientras db.accdb no cambie, las corridas
+siguientes leen el cache en lugar de volver a exportar.
+"""
+
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import polars as pl
+import pyodbc
+
+from src.commons import ACCESS_CACHE_DIR, ACCESS_DB_PATH
+
+# Tablas de Access que usa la migración
+TABLAS = (
+    "Facturas",
+    "TresArroyos",
+    "catFormasDePago",
+    "catDestinatarios",
+    "catPagadores",
+    "catEstadoGestiones",
+    "NotasDeCredito",
+    "Gestiones",
+    "Pagos",
+)
+
+
+def leer_tabla(tabla: str) -> pl.DataFrame:
+    """Lee una tabla de Access como DataFrame"""
+    if os.name == "nt":
+        conn_str = (
+            r"Driver={Microsoft Access Driver (*.mdb, *.accdb)};"
+            rf"Dbq={ACCESS_DB_PATH};"
+        )
+        query: str = f"Select * from {tabla} ;"
+        with pyodbc.connect(conn_str) as cn:
+            cur = cn.cursor()
+            cur.execute(query)
+            rows = cur.execute(query).fetchall()
+            cols = [column[0] for column in cur.description]
+            data: list[dict] = [
+                dict(zip(cols, row)) for row in rows
+            ]
+            dataframe: pl.DataFrame = pl.from_dicts(data)
+    else:
+        # Polars lee el CSV directo de la salida de mdb-export, en
+        # bytes, sin decodificarlo a str
+        with subprocess.Popen(
+            ["mdb-export", ACCESS_DB_PATH, tabla],
+            stdout=subprocess.PIPE,
+        ) as proceso:
+            try:
+                dataframe: pl.DataFrame = pl.read_csv(
+                    proceso.stdout
+                )
+            except Exception:
+                # Si mdb-export falló, informar eso y no el CSV vacío
+                if proceso.wait():
+                    raise subprocess.CalledProcessError(
+                        proceso.returncode, proceso.args
+                    ) from None
+                raise
+        if proceso.returncode:
+            raise subprocess.CalledProcessError(
+                proceso.returncode, proceso.args
+            )
+
+    return dataframe
+
+
+def directorio_cache() -> Path:
+    """Directorio del cache para la versión actual de db.accdb"""
+    estado = os.stat(ACCESS_DB_PATH)
+    return (
+        ACCESS_CACHE_DIR
+        / f"{estado.st_size}-{estado.st_mtime_ns}"
+    )
+
+
+def leer_tablas(
+    tablas: tuple[str, ...] = TABLAS,
+) -> dict[str, pl.DataFrame]:
+    """
+    Lee las tablas de Access, todas a la vez.
+
+    Si db.accdb no cambió (mismo tamaño y fecha de modificación)
+    desde la última lectura, las toma del cache en Parquet.
+
+    Returns:
+        dict: {tabla: DataFrame}
+    """
+    directorio = directorio_cache()
+    if all(
+        (directorio / f"{t}.parquet").exists() for t in tablas
+    ):
+        print(f"Tablas de Access leídas del cache: {directorio}")
+        return {
+            t: pl.read_parquet(directorio / f"{t}.parquet")
+            for t in tablas
+        }
+
+    # Cada exportación es un proceso (o una conexión ODBC) aparte
+    with ThreadPoolExecutor(max_workers=len(tablas)) as executor:
+        dataframes = dict(
+            zip(tablas, executor.map(leer_tabla, tablas))
+        )
+
+    try:
+        # Se escribe en un directorio temporal y se renombra al
+        # final, para no dejar un cache a medias
+        shutil.rmtree(ACCESS_CACHE_DIR, ignore_errors=True)
+        temporal = directorio.with_name(directorio.name + ".tmp")
+        temporal.mkdir(parents=True)
+        for tabla, df in dataframes.items():
+            df.write_parquet(temporal / f"{tabla}.parquet")
+        temporal.rename(directorio)
+    except Exception as e:
+        print(f"No se pudo guardar el cache de Access: {e}")
+
+    return dataframes
+
+
+def insertar(
+    cursor: sqlite3.Cursor, tabla: str, df: pl.DataFrame
+):
+    """Inserta todas las filas de df (columnas = columnas de tabla)"""
+    columnas = ", ".join(df.columns)
+    marcas = ", ".join("?" for _ in df.columns)
+    cursor.executemany(
+        f"INSERT INTO {tabla} ({columnas}) VALUES ({marcas});",
+        df.iter_rows(),
+    )
+
+
+def con_ids(
+    cursor: sqlite3.Cursor, tabla: str, df: pl.DataFrame
+) -> pl.DataFrame:
+    """Agrega id_nuevo: el id que tomará cada fila de df en tabla"""
+    (ultimo,) = cursor.execute(
+        f"SELECT coalesce(max(id), 0) FROM {tabla};"
+    ).fetchone()
+    return df.with_row_index(
+        "id_nuevo", offset=ultimo + 1
+    ).with_columns(pl.col("id_nuevo").cast(pl.Int64))
+
+
+def primero_por(df: pl.DataFrame, clave: str) -> pl.DataFrame:
+    """Una fila por clave (la primera), descartando claves nulas o 0"""
+    return df.filter(
+        pl.col(clave).is_not_null() & (pl.col(clave) != 0)
+    ).unique(clave, keep="first", maintain_order=True)
+
+
+def migrar_formaspago(
+    cursor: sqlite3.Cursor, formas_pago: pl.DataFrame
+) -> pl.DataFrame:
+    """Inserta las formas de pago; retorna aux_formaspago"""
+    formas = con_ids(
+        cursor,
+        "formaspago",
+        formas_pago.select(
+            pl.col("Id").alias("id_viejo"),
+            # Catálogo de pocas filas: mismo title() que en Python
+            pl.Series(
+                "formapago",
+                [
+                    str(v).strip().title()
+                    for v in formas_pago["FormaDePago"]
+                ],
+            ),
+        ),
+    )
+    insertar(
+        cursor,
+        "formaspago",
+        formas.select(
+            pl.col("id_nuevo").alias("id"), "formapago"
+        ),
+    )
+    aux = formas.select("id_viejo", "id_nuevo")
+    insertar(cursor, "aux_formaspago", aux)
+    return aux
+
+
+def migrar_agentes(
+    cursor: sqlite3.Cursor,
+    destinatarios: pl.DataFrame,
+    pagadores: pl.DataFrame,
+) -> pl.DataFrame:
+    """Inserta destinatarios y pagadores como agentes; retorna aux_agentes"""
+    agentes = destinatarios.join(
+        pagadores,
+        how="left",
+        left_on="Destinatario",
+        right_on="Pagador",
+    ).select(
+        [
+            pl.col("ID").alias("id_destinatario"),
+            pl.when(pl.col("Destinatario").str.len_chars() > 3)
+            .then(pl.col("Destinatario").str.to_titlecase())
+            .otherwise(pl.col("Destinatario"))
+            .str.strip_chars()
+            .alias("agente"),
+            pl.col("Id").alias("id_pagador"),
+        ]
+    )
+    agentes = con_ids(cursor, "agentes", agentes)
+    insertar(
+        cursor,
+        "agentes",
+        agentes.select(pl.col("id_nuevo").alias("id"), "agente"),
+    )
+    aux = agentes.select(
+        "id_destinatario", "id_pagador", "id_nuevo"
+    )
+    insertar(cursor, "aux_agentes", aux)
+    return aux
+
+
+def migrar_facturas(
+    cursor: sqlite3.Cursor, facturas: pl.DataFrame
+) -> pl.DataFrame:
+    """Inserta las facturas; retorna aux_facturas"""
+    facturas_data = facturas.select(
+        [
+            pl.col(col).alias(col.lower())
+            for col in facturas.columns
+        ]
+    ).select(
+        [
+            "id",
+            pl.col("fechaemitida")
+            .str.to_date(format="%m/%d/%y %H:%M:%S")
+            .dt.strftime("%Y-%m-%d"),
+            pl.col("periodo")
+            .str.to_date(format="%m/%d/%y %H:%M:%S")
+            .dt.strftime("%Y%m"),
+            pl.col("importe").cast(pl.Float32),
+        ]
+    )
+    facturas_data = con_ids(
+        cursor,
+        "facturas",
+        facturas_data.with_columns(
+            pl.col("periodo").cast(pl.Int64)
+        ),
+    )
+    insertar(
+        cursor,
+        "facturas",
+        facturas_data.select(
+            pl.col("id_nuevo").alias("id"),
+            "fechaemitida",
+            "periodo",
+            "importe",
+        ),
+    )
+    aux = facturas_data.select(
+        pl.col("id").alias("id_viejo"), "id_nuevo"
+    )
+    insertar(cursor, "aux_facturas", aux)
+    return aux
+
+
+def migrar_gestiones(
+    cursor: sqlite3.Cursor,
+    gestiones: pl.DataFrame,
+    estados: pl.DataFrame,
+    tres_arr: pl.DataFrame,
+) -> pl.DataFrame:
+    """Inserta gestiones y Tres Arroyos; retorna aux_gestiones"""
+    colorder = gestiones.columns + ["IdGestion3A"]
+
+    # gestiones
+    gestiones_concatenado = pl.concat(
+        [
+            gestiones.join(
+                estados.with_columns(
+                    pl.col("Estado")
+                    .str.strip_chars()
+                    .str.to_titlecase()
+                ),
+                how="left",
+                left_on="Estado",
+                right_on="id",
+            )
+            .drop("Estado")
+            .rename({"Estado_right": "Estado"})
+            .with_columns(
+                [
+                    pl.col("Fecha")
+                    .str.to_date(format="%m/%d/%y %H:%M:%S")
+                    .dt.strftime("%Y-%m-%d"),
+                    pl.col("Poliza")
+                    .cast(pl.Int64)
+                    .cast(pl.String),
+                    pl.col("TotalFactura").cast(pl.Float32),
+                    pl.col("FechaTerminado")
+                    .str.to_date(format="%m/%d/%y %H:%M:%S")
+                    .dt.strftime("%Y-%m-%d"),
+                    pl.col("Activa").cast(pl.Int64),
+                    pl.col("Terminado").cast(pl.Int64),
+                    pl.lit(None)
+                    .alias("IdGestion3A")
+                    .cast(pl.Int64),
+                ]
+            )
+            .select(colorder),
+            tres_arr.sort(["Fecha", "NroFactura"])
+            .select(
+                [
+                    pl.lit(0).alias("NGestion").cast(pl.Int64),
+                    pl.col("Fecha")
+                    .str.to_date(format="%m/%d/%y %H:%M:%S")
+                    .dt.strftime("%Y-%m-%d"),
+                    pl.lit("").alias("Cliente").cast(pl.String),
+                    "Dominio",
+                    pl.col("Poliza")
+                    .cast(pl.Int64)
+                    .cast(pl.String),
+                    pl.lit("Especial")
+                    .alias("Tipo")
+                    .cast(pl.String),
+                    pl.lit("").alias("Motivo").cast(pl.String),
+                    pl.lit(0).alias("NCaso").cast(pl.Int64),
+                    pl.lit("")
+                    .alias("UsuarioCarga")
+                    .cast(pl.String),
+                    pl.lit("")
+                    .alias("UsuarioRespuesta")
+                    .cast(pl.String),
+                    pl.lit("Cerrado")
+                    .alias("Estado")
+                    .cast(pl.String),
+                    pl.lit(0).alias("ITR").cast(pl.Int64),
+                    pl.lit("")
+                    .alias("RutaCarpeta")
+                    .cast(pl.String),
+                    pl.col("Importe")
+                    .alias("TotalFactura")
+                    .cast(pl.Float32),
+                    pl.lit(1).cast(pl.Int64).alias("Terminado"),
+                    pl.col("Fecha")
+                    .str.to_date(format="%m/%d/%y %H:%M:%S")
+                    .dt.strftime("%Y-%m-%d")
+                    .alias("FechaTerminado"),
+                    "Obs",
+                    pl.lit(1).cast(pl.Int64).alias("Activa"),
+                    pl.col("Id").alias("IdGestion3A"),
+                ]
+            )
+            .select(colorder),
+        ]
+    )
+    gestiones_concatenado = (
+        gestiones_concatenado.select(
+            [
+                pl.col(col).alias(col.lower())
+                for col in gestiones_concatenado.columns
+            ]
+        )
+        .with_columns(
+            [
+                pl.col("dominio").str.replace_all(" ", ""),
+            ]
+        )
+        .select(pl.exclude("fechaterminado"))
+    )
+    gestiones_concatenado = con_ids(
+        cursor, "gestiones", gestiones_concatenado
+    )
+    cols = [
+        c
+        for c in gestiones_concatenado.columns
+        if c not in ["id_nuevo", "idgestion3a", "rutacarpeta"]
+    ]
+    # validar_ngestion busca cada ngestion nuevo en la tabla: con el
+    # índice (el mismo de 001_indices.sql) no la recorre por fila
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_gestiones_ngestion ON gestiones (ngestion);"
+    )
+    insertar(
+        cursor,
+        "gestiones",
+        gestiones_concatenado.select(
+            pl.col("id_nuevo").alias("id"), *cols
+        ),
+    )
+    aux = gestiones_concatenado.select(
+        pl.col("ngestion").fill_null(0),
+        pl.col("idgestion3a").fill_null(0).alias("id_viejo"),
+        "id_nuevo",
+    )
+    insertar(cursor, "aux_gestiones", aux)
+    return aux
+
+
+def migrar_pagos(
+    cursor: sqlite3.Cursor,
+    pagos: pl.DataFrame,
+    tres_arr: pl.DataFrame,
+    aux_gestiones: pl.DataFrame,
+    aux_formaspago: pl.DataFrame,
+    aux_agentes: pl.DataFrame,
+) -> pl.DataFrame:
+    """
+    Inserta los pagos; retorna aux_pagos.
+
+    Los pagos cuya gestión, agentes o forma de pago no se encuentran
+    (o con importe 0) se informan y se omiten.
+    """
+    pagos_data = pl.concat(
+        [
+            (
+                pagos.filter(pl.col("NGestion") > 0)
+                .with_columns(
+                    pl.col("Fecha")
+                    .str.to_date(format="%m/%d/%y %H:%M:%S")
+                    .dt.strftime("%Y-%m-%d")
+                )
+                .with_columns(
+                    pl.lit(0).alias("id_gestion").cast(pl.Int64)
+                )
+            ),
+            pagos.join(
+                tres_arr.select(
+                    [
+                        pl.col("Id").alias("id_gestion"),
+                        "IdPago",
+                    ]
+                ),
+                how="inner",
+                left_on="id",
+                right_on="IdPago",
+            ).with_columns(
+                pl.col("Fecha")
+                .str.to_date(format="%m/%d/%y %H:%M:%S")
+                .dt.strftime("%Y-%m-%d")
+            ),
+        ]
+    )
+
+    pagos_data = (
+        pagos_data.select(
+            [
+                pl.col(col).alias(col.lower())
+                for col in pagos_data.columns
+            ]
+        )
+        .sort("fecha")
+        .with_columns(
+            [
+                pl.col("formadepago").fill_null(1),
+                pl.col("importe").cast(pl.Float64).abs(),
+            ]
+        )
+    )
+
+    # Ids nuevos por join: la gestión se busca por ngestion y, si no
+    # tiene, por el id de Tres Arroyos
+    por_ngestion = primero_por(aux_gestiones, "ngestion").select(
+        "ngestion", pl.col("id_nuevo").alias("gestion_ngestion")
+    )
+    por_id_viejo = primero_por(aux_gestiones, "id_viejo").select(
+        pl.col("id_viejo").alias("id_gestion"),
+        pl.col("id_nuevo").alias("gestion_id_viejo"),
+    )
+    pagadores = primero_por(aux_agentes, "id_pagador").select(
+        pl.col("id_pagador").alias("pagador"),
+        pl.col("id_nuevo").alias("pagador_id"),
+    )
+    destinatarios = primero_por(
+        aux_agentes, "id_destinatario"
+    ).select(
+        pl.col("id_destinatario").alias("destinatario"),
+        pl.col("id_nuevo").alias("destinatario_id"),
+    )
+    formas = primero_por(aux_formaspago, "id_viejo").select(
+        pl.col("id_viejo").alias("formadepago"),
+        pl.col("id_nuevo").alias("formapago_id"),
+    )
+    pagos_data = pagos_data.with_columns(
+        pl.col("ngestion").fill_null(0),
+        pl.col("id_gestion").fill_null(0),
+    )
+    for mapa, clave in (
+        (por_ngestion, "ngestion"),
+        (por_id_viejo, "id_gestion"),
+        (pagadores, "pagador"),
+        (destinatarios, "destinatario"),
+        (formas, "formadepago"),
+    ):
+        pagos_data = pagos_data.join(
+            mapa, on=clave, how="left", maintain_order="left"
+        )
+    pagos_data = pagos_data.with_columns(
+        pl.when(pl.col("ngestion") > 0)
+        .then(pl.col("gestion_ngestion"))
+        .when(pl.col("id_gestion") > 0)
+        .then(pl.col("gestion_id_viejo"))
+        .alias("gestion_id")
+    )
+
+    validos = (
+        pl.col("gestion_id").is_not_null()
+        & pl.col("pagador_id").is_not_null()
+        & pl.col("destinatario_id").is_not_null()
+        & pl.col("formapago_id").is_not_null()
+        & (pl.col("importe") > 0)
+    )
+    errores = pagos_data.filter(~validos)
+    if len(errores) > 0:
+        print(
+            f"Error procesando pagos: {len(errores)} sin gestión, "
+            "agentes o forma de pago, o con importe 0"
+        )
+        print(
+            errores.select(
+                "id", "ngestion", "id_gestion", "fecha"
+            )
+        )
+
+    pagos_data = con_ids(
+        cursor, "pagos", pagos_data.filter(validos)
+    )
+    insertar(
+        cursor,
+        "pagos",
+        pagos_data.select(
+            pl.col("id_nuevo").alias("id"),
+            "gestion_id",
+            "fecha",
+            "pagador_id",
+            "destinatario_id",
+            "formapago_id",
+            "importe",
+        ),
+    )
+    aux = pagos_data.select(
+        pl.col("id").alias("id_viejo"), "id_nuevo"
+    )
+    insertar(cursor, "aux_pagos", aux)
+    return aux
+
+
+def migrar_notas(
+    cursor: sqlite3.Cursor,
+    notas: pl.DataFrame,
+    aux_pagos: pl.DataFrame,
+    aux_facturas: pl.DataFrame,
+) -> int:
+    """
+    Inserta las notas de crédito; retorna la cantidad insertada.
+
+    Las notas cuyo pago no se migró se informan y se omiten; si la
+    factura no existe, la nota queda sin factura.
+    """
+    notas_data = notas.with_columns(
+        pl.col("FechaPasada")
+        .str.to_date(format="%m/%d/%y %H:%M:%S")
+        .dt.strftime("%Y-%m-%d")
+    ).sort("IdPago")
+    notas_data = notas_data.select(
+        [
+            pl.col(col).alias(col.lower())
+            for col in notas_data.columns
+        ]
+    ).select(pl.exclude("pasada"))
+    notas_data = notas_data.join(
+        primero_por(aux_pagos, "id_viejo").select(
+            pl.col("id_viejo").alias("idpago"),
+            pl.col("id_nuevo").alias("pago_id"),
+        ),
+        on="idpago",
+        how="left",
+        maintain_order="left",
+    ).join(
+        primero_por(aux_facturas, "id_viejo").select(
+            pl.col("id_viejo").alias("idfactura"),
+            pl.col("id_nuevo").alias("factura_id"),
+        ),
+        on="idfactura",
+        how="left",
+        maintain_order="left",
+    )
+
+    errores = notas_data.filter(pl.col("pago_id").is_null())
+    if len(errores) > 0:
+        print(f"Error procesando notas: {len(errores)} sin pago")
+        print(errores.select("idpago", "idfactura"))
+
+    # Una nota por pago (notas.pago_id es UNIQUE)
+    notas_data = notas_data.filter(
+        pl.col("pago_id").is_not_null()
+    ).unique("pago_id", keep="first", maintain_order=True)
+    insertar(
+        cursor,
+        "notas",
+        notas_data.select("pago_id", "factura_id"),
+    )
+    return len(notas_data)
+
+
+def crear_tabla_etapas(cursor: sqlite3.Cursor):
+    """Crea la tabla de etapas terminadas de la migración"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS migracion_etapas (
+            etapa TEXT NOT NULL PRIMARY KEY,
+            filas INTEGER NOT NULL,
+            segundos REAL NOT NULL,
+            terminada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+
+
+def etapas_terminadas(cursor: sqlite3.Cursor) -> set[str] | None:
+    """
+    Etapas ya migradas, o None si la base no viene de una migración.
+    """
+    existe = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'migracion_etapas'"
+    ).fetchone()
+    if not existe:
+        return None
+    return {
+        etapa
+        for (etapa,) in cursor.execute(
+            "SELECT etapa FROM migracion_etapas;"
+        )
+    }
+
+
+def migracion_pendiente(cursor: sqlite3.Cursor) -> bool:
+    """True si una migración quedó a medias"""
+    terminadas = etapas_terminadas(cursor)
+    return (
+        terminadas is not None and not set(ETAPAS) <= terminadas
+    )
+
+
+def leer_aux(cursor: sqlite3.Cursor, tabla: str) -> pl.DataFrame:
+    """Lee una tabla aux_* (ids viejos → nuevos) como DataFrame"""
+    cursor.execute(f"SELECT * FROM aux_{tabla};")
+    columnas = [c[0] for c in cursor.description]
+    return pl.DataFrame(
+        [tuple(fila) for fila in cursor.fetchall()],
+        schema={c: pl.Int64 for c in columnas},
+        orient="row",
+    )
+
+
+# Etapas de la migración, en orden. Cada una recibe las tablas de
+# Access y los aux de las etapas anteriores (agrega los suyos) y
+# retorna la cantidad de filas insertadas.
+def etapa_catalogos(cursor, tablas, aux) -> int:
+    aux["formaspago"] = migrar_formaspago(
+        cursor, tablas["catFormasDePago"]
+    )
+    aux["agentes"] = migrar_agentes(
+        cursor, tablas["catDestinatarios"], tablas["catPagadores"]
+    )
+    return len(aux["formaspago"]) + len(aux["agentes"])
+
+
+def etapa_facturas(cursor, tablas, aux) -> int:
+    aux["facturas"] = migrar_facturas(cursor, tablas["Facturas"])
+    return len(aux["facturas"])
+
+
+def etapa_gestiones(cursor, tablas, aux) -> int:
+    aux["gestiones"] = migrar_gestiones(
+        cursor,
+        tablas["Gestiones"],
+        tablas["catEstadoGestiones"],
+        tablas["TresArroyos"],
+    )
+    return len(aux["gestiones"])
+
+
+def etapa_pagos(cursor, tablas, aux) -> int:
+    aux["pagos"] = migrar_pagos(
+        cursor,
+        tablas["Pagos"],
+        tablas["TresArroyos"],
+        aux["gestiones"],
+        aux["formaspago"],
+        aux["agentes"],
+    )
+    return len(aux["pagos"])
+
+
+def etapa_notas(cursor, tablas, aux) -> int:
+    return migrar_notas(
+        cursor,
+        tablas["NotasDeCredito"],
+        aux["pagos"],
+        aux["facturas"],
+    )
+
+
+# Por etapa: (función, tablas aux_* que deja llenas)
+ETAPAS = {
+    "catalogos": (etapa_catalogos, ("formaspago", "agentes")),
+    "facturas": (etapa_facturas, ("facturas",)),
+    "gestiones": (etapa_gestiones, ("gestiones",)),
+    "pagos": (etapa_pagos, ("pagos",)),
+    "notas": (etapa_notas, ()),
+}
+
+
+def migrar_desde_access(conn: sqlite3.Connection) -> list[dict]:
+    """
+    Copia los datos de Access a la base, por etapas.
+
+    Cada etapa corre en su propia transacción y, al terminar, queda
+    registrada en migracion_etapas con sus filas y su duración. Si una
+    corrida se interrumpe, la siguiente retoma desde la primera etapa
+    sin terminar, usando los aux_* de las anteriores.
+
+    Returns:
+        list[dict]: Etapas terminadas (etapa, filas, segundos)
+    """
+    cursor = conn.cursor()
+    crear_tabla_etapas(cursor)
+    terminadas = etapas_terminadas(cursor) or set()
+
+    tablas = None
+    aux: dict[str, pl.DataFrame] = {}
+    for etapa, (ejecutar, tablas_aux) in ETAPAS.items():
+        if etapa in terminadas:
+            print(f"Etapa {etapa}: ya migrada")
+            for tabla in tablas_aux:
+                aux[tabla] = leer_aux(cursor, tabla)
+            continue
+
+        if tablas is None:
+            inicio = time.perf_counter()
+            tablas = leer_tablas()
+            print(
+                f"Tablas de Access leídas en {time.perf_counter() - inicio:.2f} s"
+            )
+
+        inicio = time.perf_counter()
+        try:
+            cursor.execute("BEGIN")
+            filas = ejecutar(cursor, tablas, aux)
+            segundos = time.perf_counter() - inicio
+            cursor.execute(
+                "INSERT INTO migracion_etapas (etapa, filas, segundos) VALUES (?, ?, ?);",
+                (etapa, filas, segundos),
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(
+                f"Etapa {etapa}: error, la próxima corrida retoma desde aquí\n{e}"
+            )
+            raise
+        print(f"Etapa {etapa}: {filas} filas en {segundos:.2f} s")
+
+    return [
+        {"etapa": etapa, "filas": filas, "segundos": segundos}
+        for etapa, filas, segundos in cursor.execute(
+            "SELECT etapa, filas, segundos FROM migracion_etapas ORDER BY rowid;"
+        )
+    ]
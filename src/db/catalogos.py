@@ -0,0 +1,63 @@
+"""
+Cache en memoria de los catálogos.
+
+Agentes, formas de pago, tipos y estados cambian muy poco pero se leen en
+cada render de página, en cada apertura de diálogo y en cada alta de
+pago. Se cargan una vez y se guardan junto con los mapas nombre↔id; las
+escrituras que pueden modificarlos incrementan la versión y fuerzan una
+recarga en la próxima lectura.
+"""
+
+import functools
+import threading
+from collections.abc import Callable
+
+
+class CacheCatalogos:
+    """Catálogos versionados, compartidos por todos los clientes"""
+
+    def __init__(self, cargar: Callable[[], dict]):
+        self._cargar = cargar
+        self._lock = threading.Lock()
+        self._version = 0
+        self._datos: dict | None = None
+
+    @property
+    def version(self) -> int:
+        """Versión actual; cambia con cada invalidación"""
+        return self._version
+
+    def obtener(self) -> dict:
+        """Catálogos vigentes, recargándolos si fueron invalidados"""
+        datos = self._datos
+        if datos is not None:
+            return datos
+
+        with self._lock:
+            version = self._version
+        datos = self._cargar()
+        with self._lock:
+            # Si hubo una escritura durante la carga, no guardar:
+            # la próxima lectura vuelve a cargar
+            if version == self._version:
+                self._datos = datos
+        return datos
+
+    def invalidar(self):
+        """Descarta los catálogos cargados"""
+        with self._lock:
+            self._version += 1
+            self._datos = None
+
+
+def invalida_catalogos(metodo):
+    """Decorador: invalida los catálogos al terminar el método"""
+
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        try:
+            return metodo(self, *args, **kwargs)
+        finally:
+            self.catalogos.invalidar()
+
+    return envoltura
@@ -1,11 +1,13 @@
 """
 Gestión centralizada de conexiones a la base de datos.
 
-Proporciona una única instancia de base de datos para toda la aplicación,
-optimizando el uso de recursos y facilitando la futura migración a PostgreSQL.
+Proporciona una única instancia de base de datos para toda la aplicación.
+La instancia delega en un pool de conexiones (src/db/pool.py): cada hilo
+usa su propia conexión y las escrituras se serializan en un único camino.
 """
 
 from typing import Optional
+from src.commons import DB_PATH
 from src.db.database import SQLiteDB
 
 
@@ -17,9 +19,9 @@ def get_database() -> SQLiteDB:
     Retorna la instancia única de base de datos (Singleton).
 
     Esta función centraliza el acceso a la base de datos, lo que permite:
-    - Reutilizar una única conexión en toda la aplicación
-    - Reducir overhead de crear/destruir conexiones
-    - Facilitar la migración futura a PostgreSQL con connection pooling
+    - Compartir un único pool de conexiones en toda la aplicación
+    - Que cada hilo lea con su propia conexión y cursor
+    - Serializar las escrituras de todos los clientes
 
     Ejemplo de uso:
         ```python
@@ -29,17 +31,6 @@ def get_database() -> SQLiteDB:
         pagos = database.filtrar_pagos(...)
         ```
 
-    Para migrar a PostgreSQL en el futuro, solo necesitas modificar
-    esta función para retornar conexiones de un pool:
-        ```python
-        # Futuro con PostgreSQL
-        def get_database() -> PostgresDB:
-            global _pool
-            if _pool is None:
-                _pool = SimpleConnectionPool(...)
-            return _pool.getconn()
-        ```
-
     Returns:
         SQLiteDB: Instancia única de la base de datos
     """
@@ -47,10 +38,17 @@ def get_database() -> SQLiteDB:
 
     if _db_instance is None:
         _db_instance = SQLiteDB()
+        _db_instance.aplicar_migraciones()
+        print(f"SQLite {DB_PATH}: {_db_instance.pool.perfil()}")
 
     return _db_instance
 
 
+def obtener_metricas_pool() -> dict:
+    """Retorna las métricas del pool de conexiones compartido"""
+    return get_database().pool.metricas()
+
+
 def reset_database():
     """
     Reinicia la instancia de base de datos.
@@ -65,11 +63,7 @@ def reset_database():
     global _db_instance
 
     if _db_instance is not None:
-        # Cerrar conexión existente si es posible
-        if hasattr(_db_instance, "conn"):
-            try:
-                _db_instance.conn.close()
-            except Exception:
-                pass
+        # Cerrar todas las conexiones del pool
+        _db_instance.pool.cerrar()
 
     _db_instance = None
@@ -1,521 +1,313 @@
-import os
 import sqlite3
+from collections.abc import Callable
 from pathlib import Path
 import datetime
-from src.commons import SQL_CREATE_FILE, DB_PATH, ACCESS_DB_PATH
-import pyodbc
+from src.commons import (
+    SQL_CREATE_FILE,
+    SQL_MIGRACIONES_DIR,
+    DB_PATH,
+    SQLITE_PRAGMAS,
+    ESCRITURA_ESPERA_EVENT_LOOP,
+    IMPORTACION_FILAS_POR_BLOQUE,
+    IMPORTACION_FILAS_POR_ESCRITURA,
+)
+from src.db.pool import (
+    ConnectionPool,
+    EscrituraOcupada,
+    escritura_serializada,
+)
+from src.db.catalogos import CacheCatalogos, invalida_catalogos
+
+
+# Columnas por las que se puede ordenar la tabla de gestiones
+ORDEN_GESTIONES = {
+    "id",
+    "fecha",
+    "ngestion",
+    "poliza",
+    "cliente",
+    "totalfactura",
+    "terminado",
+    "activa",
+}
+
+# Mensaje cuando el ngestion ya pertenece a otra gestión
+NGESTION_REPETIDO = "El valor de ngestion ya existe en la tabla"
+
+# (éxito, mensaje) de una escritura con el camino de escritura tomado
+ESCRITURA_OCUPADA = (False, EscrituraOcupada.MENSAJE)
+
+# Columnas (expresiones SQL) por las que se puede ordenar la tabla de pagos
+ORDEN_PAGOS = {
+    "id": "p.id",
+    "fecha": "p.fecha",
+    "pagador": "ap.agente",
+    "destinatario": "ad.agente",
+    "formapago": "fp.formapago",
+    "importe": "p.importe",
+    "tipo": "g.tipo",
+    "ngestion": "g.ngestion",
+    "dominio": "g.dominio",
+    "poliza": "g.poliza",
+    "cliente": "g.cliente",
+    "es_nota_credito_no_pasada": "es_nota_credito_no_pasada",
+}
 
 
 class SQLiteDB:
-    def __init__(self):
-        self.conn = sqlite3.connect(
-            DB_PATH, check_same_thread=False
+    def __init__(self, pool: ConnectionPool | None = None):
+        self.pool = pool or ConnectionPool(
+            DB_PATH, SQLITE_PRAGMAS, ESCRITURA_ESPERA_EVENT_LOOP
         )
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+        self.catalogos = CacheCatalogos(self._cargar_catalogos)
 
-    def migrar(self):
-        try:
-            self.cursor.execute("Select * from gestiones")
-            print("Ya existe la DB")
-            return
-        except Exception:
-            import polars as pl
-
-            # Crear base de datos
-            with open(SQL_CREATE_FILE, "r") as f:
-                sentencias = f.read()
-                for s in sentencias.split("--"):
-                    try:
-                        self.cursor.execute("--" + s)
-                    except Exception as e:
-                        print(s)
-                        print(e)
-            conn_str = (
-                r"Driver={Microsoft Access Driver (*.mdb, *.accdb)};"
-                rf"Dbq={ACCESS_DB_PATH};"
-            )
-
-            # Leer dataframes
-            def get_polars_from_table(
-                tabla: str,
-            ) -> pl.DataFrame:
-                if os.name == "nt":
-                    query: str = f"Select * from {tabla} ;"
-                    with pyodbc.connect(conn_str) as cn:
-                        cur = cn.cursor()
-                        cur.execute(query)
-                        rows = cur.execute(query).fetchall()
-                        cols = [
-                            column[0]
-                            for column in cur.description
-                        ]
-                        data: list[dict] = [
-                            dict(zip(cols, row)) for row in rows
-                        ]
-                        dataframe: pl.DataFrame = pl.from_dicts(
-                            data
-                        )
-                else:
-                    import subprocess
-                    from io import StringIO
-
-                    result = subprocess.run(
-                        ["mdb-export", ACCESS_DB_PATH, tabla],
-                        capture_output=True,
-                        text=True,
-                        check=True,
-                    )
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Conexión del hilo actual"""
+        return self.pool.conexion()
 
-                    # Leer CSV directamente con Polars
-                    dataframe: pl.DataFrame = pl.read_csv(
-                        StringIO(result.stdout)
-                    )
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """Cursor del hilo actual"""
+        return self.pool.cursor()
 
-                return dataframe
+    def escritura(self):
+        """Context manager para escrituras hechas fuera de esta clase"""
+        return self.pool.escritura()
 
-            facturas = get_polars_from_table("Facturas")
-            tres_arr = get_polars_from_table("TresArroyos")
-            formas_pago = get_polars_from_table("catFormasDePago")
-            # cat_gestiones = get_polars_from_table("catEstadoGestiones")
-            destinatarios = get_polars_from_table(
-                "catDestinatarios"
-            )
-            pagadores = get_polars_from_table("catPagadores")
-            estados = get_polars_from_table("catEstadoGestiones")
+    def version_datos(self) -> int:
+        """Versión de los datos, para invalidar resultados cacheados"""
+        return self.pool.version
 
-            notas = get_polars_from_table("NotasDeCredito")
-            gestiones = get_polars_from_table("Gestiones")
-            pagos = get_polars_from_table("Pagos")
+    @escritura_serializada
+    def aplicar_migraciones(self) -> int:
+        """
+        Aplica los scripts pendientes de sql/migraciones.
 
-            # INserciones
-            #  Formas de Pago
+        Cada script se llama NNN_descripcion.sql y se ejecuta en su
+        propia transacción; PRAGMA user_version guarda el número del
+        último script aplicado.
 
-            for row in formas_pago.to_dicts():
-                self.cursor.execute(
-                    "Insert into formaspago (formapago) values (:formapago);",
-                    {
-                        "formapago": str(row["FormaDePago"])
-                        .strip()
-                        .title(),
-                    },
+        Returns:
+            int: Versión del esquema tras aplicar las migraciones
+        """
+        existe = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'gestiones'"
+        ).fetchone()
+        if not existe:
+            # La base todavía no fue creada: migrar() las aplicará
+            return 0
+
+        version = self.cursor.execute(
+            "PRAGMA user_version"
+        ).fetchone()[0]
+        for script in sorted(SQL_MIGRACIONES_DIR.glob("*.sql")):
+            numero = int(script.name.split("_", 1)[0])
+            if numero <= version:
+                continue
+            try:
+                self._verificar_migracion(numero)
+                self.conn.executescript(
+                    "BEGIN;\n"
+                    + script.read_text(encoding="utf-8")
+                    + f"\nPRAGMA user_version = {numero};\nCOMMIT;"
                 )
-                ewid = self.cursor.lastrowid
-                aux_sql = "Insert into aux_formaspago (id_viejo,id_nuevo) values (:id_viejo, :id_nuevo);"
-                self.cursor.execute(
-                    aux_sql,
-                    {
-                        "id_viejo": row["Id"],
-                        "id_nuevo": ewid,
-                    },
+            except Exception as e:
+                self.conn.rollback()
+                print(
+                    f"Error aplicando migración {script.name}: {e}"
                 )
+                raise
+            print(f"Migración aplicada: {script.name}")
+            version = numero
+        return version
 
-            # Agentes
-            agentes = destinatarios.join(
-                pagadores,
-                how="left",
-                left_on="Destinatario",
-                right_on="Pagador",
-            ).select(
-                [
-                    pl.col("ID").alias("id_destinatario"),
-                    pl.when(
-                        pl.col("Destinatario").str.len_chars() > 3
-                    )
-                    .then(
-                        pl.col("Destinatario").str.to_titlecase()
-                    )
-                    .otherwise(pl.col("Destinatario"))
-                    .str.strip_chars()
-                    .alias("agente"),
-                    pl.col("Id").alias("id_pagador"),
-                ]
-            )
-            for row in agentes.to_dicts():
-                self.cursor.execute(
-                    "Insert into agentes (agente) values (:agente);",
-                    {"agente": str(row["agente"])},
+    def _verificar_migracion(self, numero: int):
+        """
+        Verifica que los datos admitan la migración `numero`.
+
+        Raises:
+            sqlite3.IntegrityError: Si hay datos que la migración no
+                puede aplicar, con los valores a corregir
+        """
+        if numero == 5:
+            # 005_ngestion_unico.sql: el trigger validar_ngestion solo
+            # revisaba los INSERT, así que actualizar_gestion pudo
+            # dejar números repetidos
+            repetidos = [
+                str(row["ngestion"])
+                for row in self.cursor.execute(
+                    """
+                    SELECT ngestion FROM gestiones
+                    WHERE ngestion != 0
+                    GROUP BY ngestion
+                    HAVING count(*) > 1
+                    ORDER BY ngestion
+                    """
                 )
-                ewid = self.cursor.lastrowid
-                aux_sql = "Insert into aux_agentes (id_destinatario,id_pagador,id_nuevo) values (:id_destinatario,:id_pagador,:id_nuevo);"
-                self.cursor.execute(
-                    aux_sql,
-                    {
-                        "id_destinatario": row["id_destinatario"],
-                        "id_pagador": row["id_pagador"],
-                        "id_nuevo": ewid,
-                    },
+            ]
+            if repetidos:
+                raise sqlite3.IntegrityError(
+                    "Hay gestiones con el mismo N° Gestión"
+                    f" ({', '.join(repetidos)}); corregilos para que"
+                    " cada número sea único y volvé a iniciar la"
+                    " aplicación"
                 )
 
-            # facturas
-            facturas_data = facturas.select(
-                [
-                    pl.col(col).alias(col.lower())
-                    for col in facturas.columns
-                ]
-            ).select(
-                [
-                    "id",
-                    pl.col("fechaemitida")
-                    .str.to_date(format="%m/%d/%y %H:%M:%S")
-                    .dt.strftime("%Y-%m-%d"),
-                    pl.col("periodo")
-                    .str.to_date(format="%m/%d/%y %H:%M:%S")
-                    .dt.strftime("%Y%m"),
-                    pl.col("importe").cast(pl.Float32),
-                ]
-            )
+    @escritura_serializada
+    def reconstruir_pagos_mensuales(self) -> int:
+        """
+        Rehace desde cero el resumen pagos_mensuales.
 
-            for row in facturas_data.to_dicts():
-                self.cursor.execute(
-                    "Insert into facturas (fechaemitida,periodo,importe) values (:fechaemitida,:periodo,:importe);",
-                    {
-                        "fechaemitida": str(row["fechaemitida"]),
-                        "periodo": str(row["periodo"]),
-                        "importe": row["importe"],
-                    },
-                )
-                ewid = self.cursor.lastrowid
-                aux_sql = "Insert into aux_facturas (id_viejo,id_nuevo) values (:id_viejo,:id_nuevo);"
-                self.cursor.execute(
-                    aux_sql,
-                    {
-                        "id_viejo": row["id"],
-                        "id_nuevo": ewid,
-                    },
-                )
+        Los triggers lo mantienen al día; esto es para repararlo si se
+        cargaron pagos con los triggers deshabilitados o a mano.
 
-            colorder = gestiones.columns + ["IdGestion3A"]
-
-            # gestiones
-            gestiones_concatenado = pl.concat(
-                [
-                    gestiones.join(
-                        estados.with_columns(
-                            pl.col("Estado")
-                            .str.strip_chars()
-                            .str.to_titlecase()
-                        ),
-                        how="left",
-                        left_on="Estado",
-                        right_on="id",
-                    )
-                    .drop("Estado")
-                    .rename({"Estado_right": "Estado"})
-                    .with_columns(
-                        [
-                            pl.col("Fecha")
-                            .str.to_date(
-                                format="%m/%d/%y %H:%M:%S"
-                            )
-                            .dt.strftime("%Y-%m-%d"),
-                            pl.col("Poliza")
-                            .cast(pl.Int64)
-                            .cast(pl.String),
-                            pl.col("TotalFactura").cast(
-                                pl.Float32
-                            ),
-                            pl.col("FechaTerminado")
-                            .str.to_date(
-                                format="%m/%d/%y %H:%M:%S"
-                            )
-                            .dt.strftime("%Y-%m-%d"),
-                            pl.col("Activa").cast(pl.Int64),
-                            pl.col("Terminado").cast(pl.Int64),
-                            pl.lit(None)
-                            .alias("IdGestion3A")
-                            .cast(pl.Int64),
-                        ]
-                    )
-                    .select(colorder),
-                    tres_arr.sort(["Fecha", "NroFactura"])
-                    .select(
-                        [
-                            pl.lit(0)
-                            .alias("NGestion")
-                            .cast(pl.Int64),
-                            pl.col("Fecha")
-                            .str.to_date(
-                                format="%m/%d/%y %H:%M:%S"
-                            )
-                            .dt.strftime("%Y-%m-%d"),
-                            pl.lit("")
-                            .alias("Cliente")
-                            .cast(pl.String),
-                            "Dominio",
-                            pl.col("Poliza")
-                            .cast(pl.Int64)
-                            .cast(pl.String),
-                            pl.lit("Especial")
-                            .alias("Tipo")
-                            .cast(pl.String),
-                            pl.lit("")
-                            .alias("Motivo")
-                            .cast(pl.String),
-                            pl.lit(0)
-                            .alias("NCaso")
-                            .cast(pl.Int64),
-                            pl.lit("")
-                            .alias("UsuarioCarga")
-                            .cast(pl.String),
-                            pl.lit("")
-                            .alias("UsuarioRespuesta")
-                            .cast(pl.String),
-                            pl.lit("Cerrado")
-                            .alias("Estado")
-                            .cast(pl.String),
-                            pl.lit(0).alias("ITR").cast(pl.Int64),
-                            pl.lit("")
-                            .alias("RutaCarpeta")
-                            .cast(pl.String),
-                            pl.col("Importe")
-                            .alias("TotalFactura")
-                            .cast(pl.Float32),
-                            pl.lit(1)
-                            .cast(pl.Int64)
-                            .alias("Terminado"),
-                            pl.col("Fecha")
-                            .str.to_date(
-                                format="%m/%d/%y %H:%M:%S"
-                            )
-                            .dt.strftime("%Y-%m-%d")
-                            .alias("FechaTerminado"),
-                            "Obs",
-                            pl.lit(1)
-                            .cast(pl.Int64)
-                            .alias("Activa"),
-                            pl.col("Id").alias("IdGestion3A"),
-                        ]
-                    )
-                    .select(colorder),
-                ]
-            )
-            gestiones_concatenado = (
-                gestiones_concatenado.select(
-                    [
-                        pl.col(col).alias(col.lower())
-                        for col in gestiones_concatenado.columns
-                    ]
-                )
-                .with_columns(
-                    [
-                        pl.col("dominio").str.replace_all(
-                            " ", ""
-                        ),
-                    ]
+        Returns:
+            int: Cantidad de filas del resumen
+        """
+        try:
+            self.cursor.execute("DELETE FROM pagos_mensuales")
+            self.cursor.execute(
+                """
+                INSERT INTO pagos_mensuales (
+                    periodo, formapago_id, pagador_id,
+                    destinatario_id, activa, importe, pagos
                 )
-                .select(pl.exclude("fechaterminado"))
+                SELECT
+                    substr(p.fecha, 1, 7),
+                    p.formapago_id,
+                    p.pagador_id,
+                    p.destinatario_id,
+                    g.activa,
+                    sum(p.importe),
+                    count(*)
+                FROM pagos p
+                JOIN gestiones g ON g.id = p.gestion_id
+                GROUP BY 1, 2, 3, 4, 5
+                """
             )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Error reconstruyendo pagos_mensuales: {e}")
+            raise
+        return self.cursor.execute(
+            "SELECT count(*) FROM pagos_mensuales"
+        ).fetchone()[0]
+
+    @escritura_serializada
+    @invalida_catalogos
+    def migrar(self) -> list[dict]:
+        """
+        Crea la base y copia los datos desde Access.
 
-            cols = [
-                c
-                for c in list(gestiones_concatenado.columns)
-                if c not in ["idgestion3a", "rutacarpeta"]
-            ]
-            col_list = ", ".join(cols)
-            placeholders = ",".join(f":{c}" for c in cols)
-            sql = f"Insert Into gestiones ({col_list}) Values ({placeholders});"
-            for row in gestiones_concatenado.to_dicts():
-                params = {c: row.get(c) for c in cols}
-                self.cursor.execute(sql, params)
-                newid = self.cursor.lastrowid
-                aux_sql = "Insert into aux_gestiones (ngestion,id_viejo,id_nuevo) values (:ngestion, :id_viejo, :id_nuevo);"
-                self.cursor.execute(
-                    aux_sql,
-                    {
-                        "ngestion": row["ngestion"] or 0,
-                        "id_viejo": row["idgestion3a"] or 0,
-                        "id_nuevo": newid or 0,
-                    },
-                )
-
-            # Pagos
-            pagos_data = pl.concat(
-                [
-                    (
-                        pagos.filter(pl.col("NGestion") > 0)
-                        .with_columns(
-                            pl.col("Fecha")
-                            .str.to_date(
-                                format="%m/%d/%y %H:%M:%S"
-                            )
-                            .dt.strftime("%Y-%m-%d")
-                        )
-                        .with_columns(
-                            pl.lit(0)
-                            .alias("id_gestion")
-                            .cast(pl.Int64)
-                        )
-                    ),
-                    pagos.join(
-                        tres_arr.select(
-                            [
-                                pl.col("Id").alias("id_gestion"),
-                                "IdPago",
-                            ]
-                        ),
-                        how="inner",
-                        left_on="id",
-                        right_on="IdPago",
-                    ).with_columns(
-                        pl.col("Fecha")
-                        .str.to_date(format="%m/%d/%y %H:%M:%S")
-                        .dt.strftime("%Y-%m-%d")
-                    ),
-                ]
-            )
+        Si una migración anterior quedó a medias, la retoma desde la
+        primera etapa sin terminar (ver src/db/access.py).
 
-            pagos_data = (
-                pagos_data.select(
-                    [
-                        pl.col(col).alias(col.lower())
-                        for col in pagos_data.columns
-                    ]
-                )
-                .sort("fecha")
-                .with_columns(
-                    [
-                        pl.col("formadepago").fill_null(1),
-                        pl.col("importe").cast(pl.Float64).abs(),
-                    ]
-                )
-            )
-            for row in pagos_data.to_dicts():
-                ngestion = row["ngestion"] or 0
-                idgestion = row["id_gestion"] or 0
-                try:
-                    if ngestion > 0:
-                        gid = self.cursor.execute(
-                            "Select id_nuevo from aux_gestiones where ngestion = :ngestion;",
-                            {"ngestion": ngestion},
-                        ).fetchone()[0]
-                    elif idgestion > 0:
-                        gid = self.cursor.execute(
-                            "Select id_nuevo from aux_gestiones where id_viejo = :id_viejo;",
-                            {"id_viejo": idgestion},
-                        ).fetchone()[0]
-                    else:
-                        gid = None
-
-                    if gid is None:
-                        raise ValueError(
-                            f"Error: No se encontró ngestion ni id_gestion -- {row}"
-                        )
+        Returns:
+            list[dict]: Etapas migradas con sus filas y segundos
+        """
+        from src.db.access import (
+            crear_tabla_etapas,
+            migracion_pendiente,
+            migrar_desde_access,
+        )
 
-                    fpid = self.cursor.execute(
-                        "Select id_nuevo from aux_formaspago where id_viejo = :id_viejo;",
-                        {"id_viejo": row["formadepago"]},
-                    ).fetchone()[0]
-                    agpagid = self.cursor.execute(
-                        "Select id_nuevo from aux_agentes where id_pagador = :id_pagador;",
-                        {"id_pagador": row["pagador"]},
-                    ).fetchone()[0]
-                    agdestid = self.cursor.execute(
-                        "Select id_nuevo from aux_agentes where id_destinatario = :id_destinatario;",
-                        {"id_destinatario": row["destinatario"]},
-                    ).fetchone()[0]
-
-                    d = {
-                        "gestion_id": gid,
-                        "fecha": row["fecha"],
-                        "pagador_id": agpagid,
-                        "destinatario_id": agdestid,
-                        "formapago_id": fpid,
-                        "importe": row["importe"],
-                    }
-                    self.cursor.execute(
-                        """Insert into pagos 
-                            (gestion_id,fecha,pagador_id,destinatario_id,formapago_id,importe) 
-                            values (:gestion_id,:fecha,:pagador_id,:destinatario_id,:formapago_id,:importe);""",
-                        d,
-                    )
-                    newid = self.cursor.lastrowid
-                    self.cursor.execute(
-                        "Insert into aux_pagos (id_viejo,id_nuevo) values (:id_viejo, :id_nuevo);",
-                        {
-                            "id_viejo": row["id"],
-                            "id_nuevo": newid,
-                        },
-                    )
+        existe = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'gestiones'"
+        ).fetchone()
+        if existe and not migracion_pendiente(self.cursor):
+            print("Ya existe la DB")
+            return []
 
-                except Exception as e:
-                    print(f"Error procesando pago: {row}\n{e}")
-                    break
-
-            # Notas
-            notas_data = notas.with_columns(
-                pl.col("FechaPasada")
-                .str.to_date(format="%m/%d/%y %H:%M:%S")
-                .dt.strftime("%Y-%m-%d")
-            ).sort("IdPago")
-            notas_data = notas_data.select(
-                [
-                    pl.col(col).alias(col.lower())
-                    for col in notas_data.columns
-                ]
-            ).select(pl.exclude("pasada"))
-
-            for row in notas_data.to_dicts():
+        if not existe:
+            # La tabla de etapas va primero: si el esquema queda a
+            # medias, la próxima corrida sabe que debe seguir
+            crear_tabla_etapas(self.cursor)
+            self.crear_esquema()
+
+        etapas = migrar_desde_access(self.conn)
+        self.aplicar_migraciones()
+        return etapas
+
+    @escritura_serializada
+    def crear_esquema(self):
+        """Crea las tablas de sql/create.sql, sin migraciones ni datos"""
+        with open(SQL_CREATE_FILE, "r") as f:
+            sentencias = f.read()
+            for s in sentencias.split("--"):
                 try:
-                    pagoid = 0
-                    factid = None
-                    pagoid = self.cursor.execute(
-                        "Select id_nuevo from aux_pagos where id_viejo = :id_viejo;",
-                        {"id_viejo": row["idpago"]},
-                    ).fetchone()[0]
-                    try:
-                        factid = self.cursor.execute(
-                            "Select id_nuevo from aux_facturas where id_viejo = :id_viejo;",
-                            {"id_viejo": row["idfactura"]},
-                        ).fetchone()[0]
-                    except Exception:
-                        factid = None
-
-                    self.cursor.execute(
-                        "Insert into notas (pago_id,factura_id) values (:pago_id,:factura_id);",
-                        {
-                            "pago_id": pagoid,
-                            "factura_id": factid,
-                        },
-                    )
+                    self.cursor.execute("--" + s)
                 except Exception as e:
-                    print(
-                        f"Error procesando nota: {row}\n {(pagoid, factid)} \n{e}"
-                    )
-                    continue
-
-        self.conn.commit()
+                    print(s)
+                    print(e)
 
     # Get functions
-    def obtener_tipos(self) -> list[str]:
-        self.cursor.execute(
+    def _cargar_catalogos(self) -> dict:
+        """Lee de la base los catálogos y sus mapas nombre↔id"""
+        agentes = self.cursor.execute(
+            "SELECT id, agente FROM agentes ORDER BY agente;"
+        ).fetchall()
+        formaspago = self.cursor.execute(
+            "SELECT id, formapago FROM formaspago ORDER BY formapago;"
+        ).fetchall()
+        tipos = self.cursor.execute(
             "SELECT DISTINCT tipo FROM gestiones ORDER BY tipo;"
-        )
-        rows = self.cursor.fetchall()
-        return [dict(row).get("tipo", "") for row in rows]
+        ).fetchall()
+        estados = self.cursor.execute(
+            "SELECT DISTINCT estado FROM gestiones WHERE estado IS NOT NULL AND estado != '' ORDER BY estado;"
+        ).fetchall()
+        return {
+            "agentes": [row["agente"] for row in agentes],
+            "formaspago": [
+                row["formapago"] for row in formaspago
+            ],
+            "tipos": [row["tipo"] for row in tipos],
+            "estados": [row["estado"] for row in estados],
+            "agente_id": {
+                row["agente"]: row["id"] for row in agentes
+            },
+            "agente_nombre": {
+                row["id"]: row["agente"] for row in agentes
+            },
+            "formapago_id": {
+                row["formapago"]: row["id"] for row in formaspago
+            },
+            "formapago_nombre": {
+                row["id"]: row["formapago"] for row in formaspago
+            },
+        }
+
+    def obtener_tipos(self) -> list[str]:
+        return list(self.catalogos.obtener()["tipos"])
 
     def obtener_agentes(self) -> list[str]:
-        self.cursor.execute(
-            "SELECT agente FROM agentes ORDER BY agente;"
-        )
-        rows = self.cursor.fetchall()
-        return [dict(row).get("agente", "") for row in rows]
+        return list(self.catalogos.obtener()["agentes"])
 
     def obtener_formaspago(self) -> list[str]:
-        self.cursor.execute(
-            "SELECT formapago FROM formaspago ORDER BY formapago;"
-        )
-        rows = self.cursor.fetchall()
-        return [dict(row).get("formapago", "") for row in rows]
+        return list(self.catalogos.obtener()["formaspago"])
 
     def obtener_estados(self) -> list[str]:
-        self.cursor.execute(
-            "SELECT DISTINCT estado FROM gestiones WHERE estado IS NOT NULL AND estado != '' ORDER BY estado;"
-        )
-        rows = self.cursor.fetchall()
-        return [dict(row).get("estado", "") for row in rows]
+        return list(self.catalogos.obtener()["estados"])
 
-    def filter_gestiones(
+    def _consulta_fts(
+        self, texto: str, columnas: list[str] | None = None
+    ) -> str | None:
+        """
+        Arma la expresión MATCH de gestiones_fts para una búsqueda
+        por subcadena.
+
+        El tokenizador trigram necesita al menos 3 caracteres; con
+        textos más cortos retorna None y se usa LIKE.
+        """
+        if len(texto) < 3:
+            return None
+        frase = '"' + texto.replace('"', '""') + '"'
+        if columnas:
+            return "{" + " ".join(columnas) + "} : " + frase
+        return frase
+
+    def _where_gestiones(
         self,
         texto_busqueda: str,
         tipo: str,
@@ -528,23 +320,39 @@ class SQLiteDB:
         con_nota: bool,
         sin_nota: bool,
         con_nota_pasada: bool,
-    ) -> list[dict[str, any]]:
-        query = "Select * from gestiones g Where 1=1"
+    ) -> tuple[str, dict]:
+        """
+        Condiciones (y parámetros) de los filtros de gestiones.
+
+        El texto de búsqueda se usa sin los espacios de los extremos,
+        tanto con FTS como con LIKE.
+        """
+        query = ""
         params: dict = {}
+        texto_busqueda = (texto_busqueda or "").strip()
 
         if tipo and tipo != "all":
             query += " AND g.tipo = :tipo"
             params.update({"tipo": tipo})
 
         if texto_busqueda:
-            query += """ AND (
-                    g.ngestion LIKE :t
-                    OR g.cliente LIKE :t
-                    OR g.dominio LIKE :t
-                    OR g.poliza LIKE :t
-                    OR g.obs LIKE :t
+            fts = self._consulta_fts(texto_busqueda)
+            if fts:
+                query += """ AND g.id IN (
+                        SELECT rowid
+                        FROM gestiones_fts
+                        WHERE gestiones_fts MATCH :fts
                     )"""
-            params.update({"t": f"%{texto_busqueda}%"})
+                params.update({"fts": fts})
+            else:
+                query += """ AND (
+                        g.ngestion LIKE :t
+                        OR g.cliente LIKE :t
+                        OR g.dominio LIKE :t
+                        OR g.poliza LIKE :t
+                        OR g.obs LIKE :t
+                        )"""
+                params.update({"t": f"%{texto_busqueda}%"})
 
         if activa and (not no_activa):
             query += " AND g.activa = 1"
@@ -605,11 +413,237 @@ class SQLiteDB:
                         )
             )"""
 
-        query += " ORDER BY g.fecha DESC"
+        return query, params
+
+    def filter_gestiones(
+        self,
+        texto_busqueda: str,
+        tipo: str,
+        terminado: bool,
+        no_terminado: bool,
+        activa: bool,
+        no_activa: bool,
+        con_pagos: bool,
+        sin_pagos: bool,
+        con_nota: bool,
+        sin_nota: bool,
+        con_nota_pasada: bool,
+        limite: int | None = None,
+        offset: int = 0,
+        orden: str = "fecha",
+        descendente: bool = True,
+        despues_de: tuple | None = None,
+    ) -> list[dict[str, any]]:
+        """
+        Filtra gestiones, opcionalmente de a una página.
+
+        Args:
+            limite: Filas por página (None = todas)
+            offset: Filas a saltear cuando no hay cursor
+            orden: Columna de orden (ver ORDEN_GESTIONES)
+            descendente: Dirección del orden
+            despues_de: Cursor (fecha, id) de la última fila de la
+                página anterior; con orden por fecha reemplaza al
+                OFFSET y recorre el índice sin saltear filas
+        """
+        where, params = self._where_gestiones(
+            texto_busqueda=texto_busqueda,
+            tipo=tipo,
+            terminado=terminado,
+            no_terminado=no_terminado,
+            activa=activa,
+            no_activa=no_activa,
+            con_pagos=con_pagos,
+            sin_pagos=sin_pagos,
+            con_nota=con_nota,
+            sin_nota=sin_nota,
+            con_nota_pasada=con_nota_pasada,
+        )
+        query = "Select * from gestiones g Where 1=1" + where
+
+        columna = orden if orden in ORDEN_GESTIONES else "fecha"
+        direccion = "DESC" if descendente else "ASC"
+
+        if despues_de and columna == "fecha":
+            return self._gestiones_despues_de(
+                query, params, despues_de, descendente, limite
+            )
+
+        query += (
+            f" ORDER BY g.{columna} {direccion}, g.id {direccion}"
+        )
+
+        if limite:
+            query += " LIMIT :limite OFFSET :offset"
+            params.update({"limite": limite, "offset": offset})
 
         self.cursor.execute(query, params)
         return [dict(row) for row in self.cursor.fetchall()]
 
+    def _gestiones_despues_de(
+        self,
+        query: str,
+        params: dict,
+        despues_de: tuple,
+        descendente: bool,
+        limite: int | None,
+    ) -> list[dict[str, any]]:
+        """
+        Página de gestiones que sigue al cursor (fecha, id), en orden
+        por fecha.
+
+        fecha admite NULL (la migración desde Access puede dejarla
+        vacía) y SQLite ordena los NULL antes que cualquier fecha: van
+        al final en DESC y al principio en ASC. Con ellos la
+        comparación de tuplas da NULL, así que el orden se recorre en
+        dos tramos, con fecha y sin fecha, cada uno con su rango sobre
+        el índice. El tramo siguiente solo se consulta si el del
+        cursor no completa la página.
+        """
+        k_fecha, k_id = despues_de
+        comparador = "<" if descendente else ">"
+        direccion = "DESC" if descendente else "ASC"
+        if k_fecha is None:
+            tramos = [
+                f"g.fecha IS NULL AND g.id {comparador} :k_id"
+            ]
+            if not descendente:
+                tramos.append("g.fecha IS NOT NULL")
+        else:
+            tramos = [
+                f"(g.fecha, g.id) {comparador} (:k_fecha, :k_id)"
+            ]
+            if descendente:
+                tramos.append("g.fecha IS NULL")
+        params.update({"k_fecha": k_fecha, "k_id": k_id})
+
+        filas = []
+        for tramo in tramos:
+            consulta = (
+                f"{query} AND {tramo}"
+                f" ORDER BY g.fecha {direccion}, g.id {direccion}"
+            )
+            if limite:
+                consulta += " LIMIT :limite"
+                params["limite"] = limite - len(filas)
+            self.cursor.execute(consulta, params)
+            filas += [dict(row) for row in self.cursor.fetchall()]
+            if limite and len(filas) >= limite:
+                break
+        return filas
+
+    def contar_gestiones(
+        self,
+        texto_busqueda: str,
+        tipo: str,
+        terminado: bool,
+        no_terminado: bool,
+        activa: bool,
+        no_activa: bool,
+        con_pagos: bool,
+        sin_pagos: bool,
+        con_nota: bool,
+        sin_nota: bool,
+        con_nota_pasada: bool,
+    ) -> int:
+        """Cantidad de gestiones que cumplen los filtros"""
+        where, params = self._where_gestiones(
+            texto_busqueda=texto_busqueda,
+            tipo=tipo,
+            terminado=terminado,
+            no_terminado=no_terminado,
+            activa=activa,
+            no_activa=no_activa,
+            con_pagos=con_pagos,
+            sin_pagos=sin_pagos,
+            con_nota=con_nota,
+            sin_nota=sin_nota,
+            con_nota_pasada=con_nota_pasada,
+        )
+        return self.cursor.execute(
+            "Select COUNT(*) from gestiones g Where 1=1" + where,
+            params,
+        ).fetchone()[0]
+
+    def _where_pagos(
+        self,
+        texto_busqueda: str,
+        pagador: str,
+        destinatario: str,
+        formapago: str,
+        es_nota_credito_no_pasada: bool,
+    ) -> tuple[str, dict]:
+        """
+        Condiciones (y parámetros) de los filtros de pagos.
+
+        El texto de búsqueda se usa sin los espacios de los extremos,
+        tanto con FTS como con LIKE.
+        """
+        query = ""
+        params = {}
+        texto_busqueda = (texto_busqueda or "").strip()
+
+        if texto_busqueda:
+            fts = self._consulta_fts(
+                texto_busqueda,
+                columnas=[
+                    "ngestion",
+                    "dominio",
+                    "poliza",
+                    "cliente",
+                ],
+            )
+            if fts:
+                # Cada rama usa su índice: FTS para la gestión y
+                # los catálogos (pocas filas) para agentes y formas
+                query += """ AND (
+                    p.gestion_id IN (
+                        SELECT rowid
+                        FROM gestiones_fts
+                        WHERE gestiones_fts MATCH :fts
+                    )
+                    OR p.pagador_id IN (
+                        SELECT id FROM agentes WHERE agente LIKE :texto
+                    )
+                    OR p.destinatario_id IN (
+                        SELECT id FROM agentes WHERE agente LIKE :texto
+                    )
+                    OR p.formapago_id IN (
+                        SELECT id FROM formaspago WHERE formapago LIKE :texto
+                    )
+                    )"""
+                params.update({"fts": fts})
+            else:
+                query += """ AND (
+                    g.ngestion LIKE :texto 
+                    OR g.dominio LIKE :texto 
+                    OR g.poliza LIKE :texto
+                    OR g.cliente LIKE :texto
+                    OR ap.agente LIKE :texto
+                    OR ad.agente LIKE :texto
+                    OR fp.formapago LIKE :texto
+                    )"""
+            params.update({"texto": f"%{texto_busqueda}%"})
+
+        if pagador and pagador != "all":
+            query += " AND ap.agente = :pagador"
+            params.update({"pagador": pagador})
+
+        if destinatario and destinatario != "all":
+            query += " AND ad.agente = :destinatario"
+            params.update({"destinatario": destinatario})
+
+        if formapago and formapago != "all":
+            query += " AND fp.formapago = :formapago"
+            params.update({"formapago": formapago})
+
+        if es_nota_credito_no_pasada:
+            query += (
+                " AND ((n.id IS NOT NULL) AND (f.id IS NULL))"
+            )
+
+        return query, params
+
     def filtrar_pagos(
         self,
         texto_busqueda: str,
@@ -618,20 +652,53 @@ class SQLiteDB:
         formapago: str,
         es_nota_credito_no_pasada: bool,
     ) -> list[dict[str, any]]:
-        query = """SELECT
-                        p.id,
-                        p.fecha,
-                        ap.agente AS pagador,
-                        ad.agente AS destinatario,
-                        fp.formapago,
-                        p.importe,
-                        g.tipo,
-                        g.ngestion,
-                        g.dominio ,
-                        g.poliza ,
-                        g.cliente ,
-                        ((n.id IS NOT NULL) and
-                        (f.id IS NULL)) AS es_nota_credito_no_pasada
+        filas, _ = self.filtrar_pagos_paginado(
+            texto_busqueda=texto_busqueda,
+            pagador=pagador,
+            destinatario=destinatario,
+            formapago=formapago,
+            es_nota_credito_no_pasada=es_nota_credito_no_pasada,
+            contar=False,
+        )
+        return filas
+
+    def filtrar_pagos_paginado(
+        self,
+        texto_busqueda: str,
+        pagador: str,
+        destinatario: str,
+        formapago: str,
+        es_nota_credito_no_pasada: bool,
+        limite: int | None = None,
+        offset: int = 0,
+        orden: str = "fecha",
+        descendente: bool = True,
+        despues_de: tuple | None = None,
+        contar: bool = True,
+    ) -> tuple[list[dict[str, any]], int]:
+        """
+        Filtra pagos de a una página, con orden en SQL.
+
+        Args:
+            limite: Filas por página (None = todas)
+            offset: Filas a saltear cuando no hay cursor
+            orden: Columna de orden (ver ORDEN_PAGOS)
+            descendente: Dirección del orden
+            despues_de: Cursor (fecha, id) de la última fila de la
+                página anterior; con orden por fecha reemplaza al OFFSET
+            contar: Si False no ejecuta el COUNT(*)
+
+        Returns:
+            tuple[list[dict], int]: (filas de la página, total filtrado)
+        """
+        where, params = self._where_pagos(
+            texto_busqueda=texto_busqueda,
+            pagador=pagador,
+            destinatario=destinatario,
+            formapago=formapago,
+            es_nota_credito_no_pasada=es_nota_credito_no_pasada,
+        )
+        desde = """
                     FROM
                         pagos p
                     LEFT JOIN agentes ap ON
@@ -647,42 +714,55 @@ class SQLiteDB:
                     LEFT JOIN facturas f ON
                         n.factura_id = f.id 
                     WHERE 1=1"""
-        params = {}
-
-        if texto_busqueda:
-            query += """ AND (
-                ngestion LIKE :texto 
-                OR dominio LIKE :texto 
-                OR poliza LIKE :texto
-                OR cliente LIKE :texto
-                OR pagador LIKE :texto
-                OR destinatario LIKE :texto
-                OR formapago LIKE :texto
-                )"""
-            params.update({"texto": f"%{texto_busqueda}%"})
 
-        if pagador and pagador != "all":
-            query += " AND pagador = :pagador"
-            params.update({"pagador": pagador})
+        total = 0
+        if contar:
+            total = self.cursor.execute(
+                "SELECT COUNT(*)" + desde + where, params
+            ).fetchone()[0]
 
-        if destinatario and destinatario != "all":
-            query += " AND destinatario = :destinatario"
-            params.update({"destinatario": destinatario})
+        query = (
+            """SELECT
+                        p.id,
+                        p.fecha,
+                        ap.agente AS pagador,
+                        ad.agente AS destinatario,
+                        fp.formapago,
+                        p.importe,
+                        g.tipo,
+                        g.ngestion,
+                        g.dominio ,
+                        g.poliza ,
+                        g.cliente ,
+                        ((n.id IS NOT NULL) and
+                        (f.id IS NULL)) AS es_nota_credito_no_pasada"""
+            + desde
+            + where
+        )
 
-        if formapago and formapago != "all":
-            query += " AND formapago = :formapago"
-            params.update({"formapago": formapago})
+        columna = ORDEN_PAGOS.get(orden, "p.fecha")
+        direccion = "DESC" if descendente else "ASC"
 
-        if es_nota_credito_no_pasada:
-            query += (
-                " AND ((n.id IS NOT NULL) AND (f.id IS NULL))"
+        if despues_de and columna == "p.fecha":
+            comparador = "<" if descendente else ">"
+            query += f" AND (p.fecha, p.id) {comparador} (:k_fecha, :k_id)"
+            params.update(
+                {"k_fecha": despues_de[0], "k_id": despues_de[1]}
             )
+            offset = 0
+
+        query += (
+            f" ORDER BY {columna} {direccion}, p.id {direccion}"
+        )
 
-        query += " ORDER BY p.fecha DESC"
+        if limite:
+            query += " LIMIT :limite OFFSET :offset"
+            params.update({"limite": limite, "offset": offset})
 
         self.cursor.execute(query, params)
-        rows = self.cursor.fetchall()
-        return [dict(row) for row in rows]
+        return [
+            dict(row) for row in self.cursor.fetchall()
+        ], total
 
     def obtener_pagos_por_gestion(
         self, gestion_id: int
@@ -771,6 +851,7 @@ class SQLiteDB:
 
     # Do functions
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def actualizar_pago(
         self,
         pago_id: int,
@@ -970,6 +1051,7 @@ class SQLiteDB:
             print(f"Error actualizando pago: {e}")
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def crear_pago(
         self,
         gestion_id: int,
@@ -1128,6 +1210,7 @@ class SQLiteDB:
             print(f"Error creando pago: {e}")
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=False)
     def eliminar_pago(self, pago_id: int) -> bool:
         """Elimina un pago de la base de datos"""
         try:
@@ -1145,30 +1228,18 @@ class SQLiteDB:
         self, nombre: str
     ) -> int | None:
         """Obtiene el ID de un agente por su nombre"""
-        try:
-            result = self.cursor.execute(
-                "SELECT id FROM agentes WHERE agente = :agente",
-                {"agente": nombre},
-            ).fetchone()
-            return result[0] if result else None
-        except Exception as e:
-            print(f"Error obteniendo agente: {e}")
-            return None
+        return self.catalogos.obtener()["agente_id"].get(nombre)
 
     def obtener_formapago_id_por_nombre(
         self, nombre: str
     ) -> int | None:
         """Obtiene el ID de una forma de pago por su nombre"""
-        try:
-            result = self.cursor.execute(
-                "SELECT id FROM formaspago WHERE formapago = :formapago",
-                {"formapago": nombre},
-            ).fetchone()
-            return result[0] if result else None
-        except Exception as e:
-            print(f"Error obteniendo forma de pago: {e}")
-            return None
+        return self.catalogos.obtener()["formapago_id"].get(
+            nombre
+        )
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
+    @invalida_catalogos
     def crear_gestion(
         self,
         ngestion: int,
@@ -1253,10 +1324,19 @@ class SQLiteDB:
             self.conn.commit()
             return True, "Gestión creada correctamente"
 
+        except sqlite3.IntegrityError as e:
+            print(f"Error creando gestión: {e}")
+            if "gestiones.ngestion" in str(e):
+                # Índice único de 005_ngestion_unico.sql
+                return False, f"Error: {NGESTION_REPETIDO}"
+            return False, f"Error: {str(e)}"
+
         except Exception as e:
             print(f"Error creando gestión: {e}")
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
+    @invalida_catalogos
     def actualizar_gestion(
         self,
         gestion_id: int,
@@ -1352,10 +1432,19 @@ class SQLiteDB:
             self.conn.commit()
             return True, "Gestión actualizada correctamente"
 
+        except sqlite3.IntegrityError as e:
+            print(f"Error actualizando gestión: {e}")
+            if "gestiones.ngestion" in str(e):
+                # Índice único de 005_ngestion_unico.sql
+                return False, f"Error: {NGESTION_REPETIDO}"
+            return False, f"Error: {str(e)}"
+
         except Exception as e:
             print(f"Error actualizando gestión: {e}")
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=False)
+    @invalida_catalogos
     def eliminar_gestion(self, gestion_id: int) -> bool:
         """Elimina una gestión de la base de datos"""
         try:
@@ -1420,6 +1509,7 @@ class SQLiteDB:
             print(f"Error obteniendo factura: {e}")
             return {}
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def crear_factura(
         self,
         periodo: int,
@@ -1491,6 +1581,7 @@ class SQLiteDB:
             print(f"Error creando factura: {e}")
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def actualizar_factura(
         self,
         factura_id: int,
@@ -1568,6 +1659,7 @@ class SQLiteDB:
             print(f"Error actualizando factura: {e}")
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def eliminar_factura(
         self, factura_id: int
     ) -> tuple[bool, str]:
@@ -1632,6 +1724,7 @@ class SQLiteDB:
             print(f"Error obteniendo notas sin factura: {e}")
             return []
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def asignar_notas_a_factura(
         self, nota_ids: list[int], factura_id: int
     ) -> tuple[bool, str]:
@@ -1669,6 +1762,7 @@ class SQLiteDB:
             self.conn.rollback()
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def crear_factura_con_notas(
         self,
         periodo: int,
@@ -1741,6 +1835,7 @@ class SQLiteDB:
             print(f"Error obteniendo notas de factura: {e}")
             return []
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def desasociar_nota_de_factura(
         self, nota_id: int
     ) -> tuple[bool, str]:
@@ -1811,6 +1906,7 @@ class SQLiteDB:
             print(f"Error obteniendo gestiones relacionadas: {e}")
             return []
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def crear_documento(
         self,
         gestion_id: int,
@@ -1903,6 +1999,7 @@ class SQLiteDB:
             self.conn.rollback()
             return False, f"Error: {str(e)}"
 
+    @escritura_serializada(ocupada=ESCRITURA_OCUPADA)
     def desasociar_documento(
         self, gestion_id: int, documento_id: int
     ) -> tuple[bool, str]:
@@ -1945,226 +2042,176 @@ class SQLiteDB:
         return mime or "application/octet-stream"
 
     def importar_gestiones_desde_excel(
-        self, file_path: str
+        self,
+        archivo: str | Path,
+        progreso: Callable[[str, int], None] | None = None,
+        cancelar: Callable[[], bool] | None = None,
     ) -> tuple[bool, dict]:
         """
-        Importa gestiones desde un archivo Excel.
+        Importa gestiones desde un archivo Excel, CSV o Parquet.
         Actualiza las existentes e inserta las nuevas.
 
+        El archivo se lee en bloques de IMPORTACION_FILAS_POR_BLOQUE
+        filas (ver src/db/importacion.py) y cada bloque se combina en
+        partes de IMPORTACION_FILAS_POR_ESCRITURA filas, cada una en
+        su propia transacción. El camino de escritura del pool se
+        toma solo mientras se combina una parte, así las escrituras
+        de los demás clientes esperan a lo sumo una parte y no toda
+        la importación. Si una parte falla se deshace solo esa parte:
+        lo anterior queda guardado y el error se agrega a errores con
+        éxito False. Las gestiones cuyos valores ya coinciden con los
+        de la tabla no se escriben, y una parte sin cambios no toma el
+        camino de escritura: reimportar un archivo sin cambios no
+        mueve pool.version ni invalida los catálogos, así que los
+        caches de reportes y resultados siguen vigentes.
+
+        Pensado para correr en un hilo: progreso(etapa, filas) se
+        llama después de leer cada bloque (leidas) y de combinarlo
+        (combinadas), con los totales acumulados. Si cancelar()
+        devuelve True, la importación se interrumpe, incluso a mitad
+        de una sentencia: se deshace la parte en curso y lo anterior
+        queda guardado.
+
         Returns:
             tuple[bool, dict]: (éxito, estadísticas)
             estadísticas = {
                 'actualizadas': int,
                 'insertadas': int,
+                'sin_cambios': int,
                 'errores': list[str]
             }
+            Las cantidades cuentan gestiones por bloque: si un N°
+            Gestión se repite en un bloque vale la última fila, y si
+            aparece en varios bloques cuenta en cada uno.
         """
-        try:
-            import polars as pl
-
-            # Asegurar que file_path es una cadena
-            file_path_str = str(file_path)
-
-            # Leer Excel usando fastexcel como engine
-            df = pl.read_excel(
-                file_path_str,
-                engine="calamine",  # fastexcel usa calamine
-                schema_overrides={
-                    "N° Caso": pl.Int32,
-                },
-            )
-
-            # Mapeo de columnas Excel → DB
-            columnas_map = {
-                "Fecha": "fecha",
-                "N° Gestión": "ngestion",
-                "Cliente": "cliente",
-                "Dominio": "dominio",
-                "Póliza": "poliza",
-                "Tipo": "tipo",
-                "Motivo": "motivo",
-                "N° Caso": "ncaso",
-                "Usuario Carga": "usuariocarga",
-                "Usuario Respuesta": "usuariorespuesta",
-                "Estado": "estado",
-                "ITR": "itr",
-            }
+        from src.db.importacion import (
+            ImportacionCancelada,
+            combinar,
+            crear_tabla_importacion,
+            leer_bloques,
+            normalizar,
+            preparar,
+        )
 
-            # Renombrar columnas que existan
-            rename_dict = {
-                k: v
-                for k, v in columnas_map.items()
-                if k in df.columns
-            }
-            df = df.rename(rename_dict).select(
-                [
-                    "ngestion",
-                    "fecha",
-                    "cliente",
-                    "dominio",
-                    "poliza",
-                    "tipo",
-                    "motivo",
-                    "ncaso",
-                    "usuariocarga",
-                    "usuariorespuesta",
-                    "estado",
-                    "itr",
-                ]
+        def avanzar(etapa: str, filas: int):
+            """Informa el progreso y corta si se pidió cancelar"""
+            if cancelar is not None and cancelar():
+                raise ImportacionCancelada()
+            if progreso is not None:
+                progreso(etapa, filas)
+
+        if cancelar is not None:
+            # SQLite consulta cancelar() durante las sentencias largas
+            # y las interrumpe si devuelve True
+            self.conn.set_progress_handler(cancelar, 10_000)
+
+        estadisticas = {
+            "actualizadas": 0,
+            "insertadas": 0,
+            "sin_cambios": 0,
+            "errores": [],
+        }
+        escribio = False
+        try:
+            bloques = leer_bloques(
+                archivo, IMPORTACION_FILAS_POR_BLOQUE
             )
 
-            estadisticas = {
-                "actualizadas": 0,
-                "insertadas": 0,
-                "errores": [],
-            }
-
-            for row in df.to_dicts():
+            leidas = 0
+            combinadas = 0
+            while True:
+                primera_fila = leidas + 2
                 try:
-                    ngestion = int(row.get("ngestion", 0))
-                    if ngestion == 0:
-                        print(row)
-                        continue
-
-                    # Convertir fecha
-                    fecha = row.get("fecha")
-                    if fecha is None:
-                        fecha_formateada = (
-                            datetime.datetime.now().strftime(
-                                "%Y-%m-%d"
-                            )
-                        )
-                    elif isinstance(fecha, str):
-                        # Intentar diferentes formatos
-                        for fmt in [
-                            "%d/%m/%Y",
-                            "%Y-%m-%d",
-                            "%d/%m/%y",
-                        ]:
-                            try:
-                                fecha_formateada = (
-                                    datetime.datetime.strptime(
-                                        fecha, fmt
-                                    ).strftime("%Y-%m-%d")
-                                )
-                                break
-                            except ValueError:
-                                continue
-                        else:
-                            fecha_formateada = (
-                                datetime.datetime.now().strftime(
-                                    "%Y-%m-%d"
-                                )
-                            )
-                    else:
-                        # Es un objeto datetime
-                        fecha_formateada = fecha.strftime(
-                            "%Y-%m-%d"
-                        )
-
-                    # Obtener estado como texto
-                    estado = (
-                        str(row.get("estado", "")).strip().upper()
-                    )
-
-                    # Limpiar dominio (sin espacios)
-                    dominio = (
-                        str(row.get("dominio", ""))
-                        .replace(" ", "")
-                        .upper()
+                    df = next(bloques, None)
+                    if df is None:
+                        break
+                    leidas += df.height
+                    avanzar("leidas", leidas)
+
+                    # Las filas que fallan quedan en errores con su
+                    # número de fila
+                    df, errores = normalizar(df, primera_fila)
+                    estadisticas["errores"].extend(
+                        errores["error"].to_list()
                     )
 
-                    # Verificar si existe la gestión
-                    existe = self.cursor.execute(
-                        "SELECT id FROM gestiones WHERE ngestion = :ngestion",
-                        {"ngestion": ngestion},
-                    ).fetchone()
-
-                    params = {
-                        "ngestion": ngestion,
-                        "fecha": fecha_formateada,
-                        "cliente": str(
-                            row.get("cliente", "")
-                        ).strip(),
-                        "dominio": dominio,
-                        "poliza": str(
-                            row.get("poliza", "")
-                        ).strip(),
-                        "tipo": str(row.get("tipo", "VEHICULAR"))
-                        .strip()
-                        .upper(),
-                        "motivo": str(
-                            row.get("motivo", "")
-                        ).strip(),
-                        "ncaso": int(row.get("ncaso", 0) or 0),
-                        "usuariocarga": str(
-                            row.get("usuariocarga", "")
-                        ).strip(),
-                        "usuariorespuesta": str(
-                            row.get("usuariorespuesta", "")
-                        ).strip(),
-                        "estado": estado,
-                        "itr": int(row.get("itr", 0) or 0),
-                    }
-
-                    if existe:
-                        # UPDATE
-                        query = """
-                        UPDATE gestiones SET
-                            fecha = :fecha,
-                            cliente = :cliente,
-                            dominio = :dominio,
-                            poliza = :poliza,
-                            tipo = :tipo,
-                            motivo = :motivo,
-                            ncaso = :ncaso,
-                            usuariocarga = :usuariocarga,
-                            usuariorespuesta = :usuariorespuesta,
-                            estado = :estado,
-                            itr = :itr
-                        WHERE ngestion = :ngestion
-                        """
-                        self.cursor.execute(query, params)
-                        estadisticas["actualizadas"] += 1
-                    else:
-                        # INSERT
-                        params.update(
-                            {
-                                "totalfactura": 0.0,
-                                "terminado": 0,
-                                "obs": "",
-                                "activa": 1,
-                            }
-                        )
-
-                        query = """
-                        INSERT INTO gestiones (
-                            ngestion, fecha, cliente, dominio, poliza, tipo, motivo,
-                            ncaso, usuariocarga, usuariorespuesta, estado, itr,
-                            totalfactura, terminado, obs, activa
-                        ) VALUES (
-                            :ngestion, :fecha, :cliente, :dominio, :poliza, :tipo, :motivo,
-                            :ncaso, :usuariocarga, :usuariorespuesta, :estado, :itr,
-                            :totalfactura, :terminado, :obs, :activa
+                    # Una fila por gestión, en el orden en que aparece
+                    # por primera vez y con los valores de la última
+                    df = df.group_by(
+                        "ngestion", maintain_order=True
+                    ).last()
+
+                    # El camino de escritura se toma por partes:
+                    # entre una y otra pasan las escrituras de los
+                    # demás clientes
+                    for parte in df.iter_slices(
+                        IMPORTACION_FILAS_POR_ESCRITURA
+                    ):
+                        # Las filas sin cambios se descartan en la
+                        # tabla temporal, sin tomar el camino de
+                        # escritura: si no queda ninguna no cambia la
+                        # versión del pool y los caches siguen vigentes
+                        crear_tabla_importacion(self.cursor)
+                        try:
+                            sin_cambios = preparar(
+                                self.cursor, parte
+                            )
+                        except Exception:
+                            self.conn.rollback()
+                            raise
+                        self.conn.commit()
+                        insertadas = 0
+                        if sin_cambios < parte.height:
+                            with self.pool.escritura():
+                                self.cursor.execute("BEGIN")
+                                try:
+                                    insertadas = combinar(
+                                        self.cursor
+                                    )
+                                except Exception:
+                                    self.conn.rollback()
+                                    raise
+                                self.conn.commit()
+                            escribio = True
+
+                        estadisticas["insertadas"] += insertadas
+                        estadisticas["sin_cambios"] += sin_cambios
+                        estadisticas["actualizadas"] += (
+                            parte.height
+                            - sin_cambios
+                            - insertadas
                         )
-                        """
-                        self.cursor.execute(query, params)
-                        estadisticas["insertadas"] += 1
+                        combinadas += parte.height - sin_cambios
+                        avanzar("combinadas", combinadas)
 
                 except Exception as e:
-                    error_msg = f"Error en N° Gestión {ngestion}: {str(e)}"
-                    print(error_msg)
-                    estadisticas["errores"].append(error_msg)
-                    continue
-
-            self.conn.commit()
+                    if cancelar is not None and cancelar():
+                        raise
+                    # Solo la parte en curso quedó sin guardar
+                    error = f"Desde la fila {primera_fila}: {e}"
+                    print(f"Error importando bloque: {error}")
+                    estadisticas["errores"].append(error)
+                    return False, estadisticas
+
+            if estadisticas["errores"]:
+                print(
+                    f"Filas con errores: {len(estadisticas['errores'])}"
+                )
             return True, estadisticas
 
         except Exception as e:
-            print(f"Error importando Excel: {e}")
-            self.conn.rollback()
-            return False, {
-                "actualizadas": 0,
-                "insertadas": 0,
-                "errores": [str(e)],
-            }
+            if cancelar is not None and cancelar():
+                # ImportacionCancelada o sentencia interrumpida
+                mensaje = "Importación cancelada"
+            else:
+                mensaje = str(e)
+            print(f"Error importando Excel: {mensaje}")
+            estadisticas["errores"].append(mensaje)
+            return False, estadisticas
+
+        finally:
+            if cancelar is not None:
+                self.conn.set_progress_handler(None, 0)
+            if escribio:
+                # Tipos y estados nuevos
+                self.catalogos.invalidar()
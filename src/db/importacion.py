@@ -0,0 +1,372 @@
+"""
+Importación de gestiones desde Excel, CSV o Parquet.
+
+El archivo se lee en bloques de filas: CSV y Parquet se recorren con el
+motor streaming de Polars sin cargarlos enteros; la planilla Excel se
+carga una vez (calamine no lee por partes) y se recorre en porciones.
+Cada bloque se normaliza columna por columna: fechas en varios
+formatos, textos sin espacios en los extremos, dominio sin espacios y
+en mayúsculas, enteros con 0 por defecto. Las filas que no se pueden
+convertir quedan en un DataFrame de errores identificadas por su
+número de fila en el archivo. Las filas válidas pasan por una tabla
+temporal, donde se descartan las que no cambiaron, y el resto se
+combina con gestiones en un solo INSERT ... ON CONFLICT.
+"""
+
+import datetime
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+
+import polars as pl
+
+# Mapeo de columnas Excel → DB
+COLUMNAS_EXCEL = {
+    "Fecha": "fecha",
+    "N° Gestión": "ngestion",
+    "Cliente": "cliente",
+    "Dominio": "dominio",
+    "Póliza": "poliza",
+    "Tipo": "tipo",
+    "Motivo": "motivo",
+    "N° Caso": "ncaso",
+    "Usuario Carga": "usuariocarga",
+    "Usuario Respuesta": "usuariorespuesta",
+    "Estado": "estado",
+    "ITR": "itr",
+}
+
+# Columnas de gestiones que trae la importación
+COLUMNAS_IMPORTACION = (
+    "ngestion",
+    "fecha",
+    "cliente",
+    "dominio",
+    "poliza",
+    "tipo",
+    "motivo",
+    "ncaso",
+    "usuariocarga",
+    "usuariorespuesta",
+    "estado",
+    "itr",
+)
+
+# Extensiones de archivo aceptadas
+EXTENSIONES_EXCEL = (".xlsx", ".xls")
+EXTENSIONES = (*EXTENSIONES_EXCEL, ".csv", ".parquet")
+
+# Formatos de fecha aceptados en celdas de texto, en orden. %y va
+# antes que %Y porque Polars lee "05/03/24" con %Y como año 24. El
+# último es el de las celdas fecha de una columna con texto mezclado.
+FORMATOS_FECHA = (
+    "%d/%m/%y",
+    "%d/%m/%Y",
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+)
+
+
+class ImportacionCancelada(Exception):
+    """Se pidió cancelar la importación en curso"""
+
+
+def renombrar(frame: pl.DataFrame | pl.LazyFrame):
+    """
+    Columnas renombradas a las de la DB, en COLUMNAS_IMPORTACION.
+
+    Las columnas se validan en el momento, aunque frame sea lazy: solo
+    lee el encabezado (CSV) o los metadatos (Parquet).
+
+    Raises:
+        ValueError: Si al archivo le faltan columnas
+    """
+    columnas = frame.collect_schema().names()
+    faltantes = [
+        excel
+        for excel, db in COLUMNAS_EXCEL.items()
+        if excel not in columnas and db not in columnas
+    ]
+    if faltantes:
+        raise ValueError(
+            f"Faltan columnas en el archivo: {', '.join(faltantes)}"
+        )
+    return frame.rename(
+        {k: v for k, v in COLUMNAS_EXCEL.items() if k in columnas}
+    ).select(COLUMNAS_IMPORTACION)
+
+
+def leer_excel(archivo: str | Path) -> pl.DataFrame:
+    """Lee la planilla con las columnas renombradas a las de la DB"""
+    return renombrar(
+        pl.read_excel(
+            archivo,
+            engine="calamine",  # fastexcel usa calamine
+            # dtypes de fastexcel, no schema_overrides: este falla
+            # con KeyError si falta la columna, antes de renombrar
+            read_options={"dtypes": {"N° Caso": "int"}},
+        )
+    )
+
+
+def separador_csv(archivo: Path) -> str:
+    """';' si el encabezado lo usa (CSV de Excel en español), si no ','"""
+    with open(archivo, encoding="utf-8", errors="replace") as f:
+        encabezado = f.readline()
+    return (
+        ";"
+        if encabezado.count(";") > encabezado.count(",")
+        else ","
+    )
+
+
+def leer_bloques(
+    archivo: str | Path, filas: int
+) -> Iterator[pl.DataFrame]:
+    """
+    Bloques de a lo sumo `filas` filas, con las columnas de la DB.
+
+    El formato y las columnas se validan al llamarla; los bloques se
+    leen a medida que se recorren.
+    """
+    archivo = Path(archivo)
+    extension = archivo.suffix.lower()
+    if extension == ".csv":
+        # Todo como texto: normalizar convierte cada columna
+        frame = pl.scan_csv(
+            archivo,
+            separator=separador_csv(archivo),
+            infer_schema=False,
+        )
+    elif extension == ".parquet":
+        frame = pl.scan_parquet(archivo)
+    elif extension in EXTENSIONES_EXCEL:
+        return leer_excel(archivo).iter_slices(filas)
+    else:
+        raise ValueError(
+            f"Formato no soportado: {extension or archivo.name}"
+            f" (se aceptan {', '.join(EXTENSIONES)})"
+        )
+    return iter(
+        renombrar(frame).collect_batches(chunk_size=filas)
+    )
+
+
+def texto(columna: str) -> pl.Expr:
+    """Columna como texto sin espacios en los extremos; nulo → ''"""
+    return (
+        pl.col(columna)
+        .cast(pl.String)
+        .fill_null("")
+        .str.strip_chars()
+    )
+
+
+def entero(df: pl.DataFrame, columna: str) -> pl.Expr:
+    """Columna como entero; nulo si la celda está vacía o no es un
+    número entero"""
+    valor = pl.col(columna)
+    if df.schema[columna] == pl.String:
+        valor = valor.str.strip_chars()
+        valor = pl.when(valor != "").then(valor)
+    return valor.cast(pl.Int64, strict=False)
+
+
+def invalido(df: pl.DataFrame, columna: str) -> pl.Expr:
+    """Celdas con valor que no se pudo convertir a entero"""
+    original = pl.col(columna)
+    if df.schema[columna] == pl.String:
+        original = original.str.strip_chars() != ""
+    else:
+        original = original.is_not_null()
+    return original & entero(df, columna).is_null()
+
+
+def fecha(df: pl.DataFrame) -> pl.Expr:
+    """Fecha como YYYY-MM-DD; vacía o ilegible → hoy"""
+    dtype = df.schema["fecha"]
+    if dtype == pl.Date or dtype == pl.Datetime:
+        valor = pl.col("fecha").cast(pl.Date)
+    else:
+        celda = pl.col("fecha").cast(pl.String).str.strip_chars()
+        valor = pl.coalesce(
+            [
+                celda.str.to_date(formato, strict=False)
+                for formato in FORMATOS_FECHA
+            ]
+        )
+    return valor.fill_null(datetime.date.today()).dt.to_string(
+        "%Y-%m-%d"
+    )
+
+
+def normalizar(
+    df: pl.DataFrame, primera_fila: int = 2
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Normaliza un bloque leído con leer_bloques.
+
+    primera_fila es el número de fila en el archivo de la primera del
+    bloque (la 1 es el encabezado).
+
+    Returns:
+        tuple[pl.DataFrame, pl.DataFrame]: (filas, errores). filas
+        tiene COLUMNAS_IMPORTACION, sin las de N° Gestión 0; errores
+        tiene fila (número de fila en el archivo) y error.
+    """
+    ngestion = entero(df, "ngestion")
+    error = (
+        pl.when(invalido(df, "ngestion"))
+        .then(
+            pl.format(
+                "N° Gestión inválido ({})",
+                pl.col("ngestion").cast(pl.String),
+            )
+        )
+        .when(ngestion.is_null())
+        .then(pl.lit("N° Gestión vacío"))
+        .when(invalido(df, "ncaso"))
+        .then(
+            pl.format(
+                "N° Caso inválido ({})",
+                pl.col("ncaso").cast(pl.String),
+            )
+        )
+        .when(invalido(df, "itr"))
+        .then(
+            pl.format(
+                "ITR inválido ({})",
+                pl.col("itr").cast(pl.String),
+            )
+        )
+    )
+
+    df = df.with_row_index(
+        "fila", offset=primera_fila
+    ).with_columns(
+        ngestion=ngestion,
+        fecha=fecha(df),
+        cliente=texto("cliente"),
+        dominio=texto("dominio")
+        .str.replace_all(" ", "", literal=True)
+        .str.to_uppercase(),
+        poliza=texto("poliza"),
+        tipo=pl.col("tipo")
+        .cast(pl.String)
+        .fill_null("VEHICULAR")
+        .str.strip_chars()
+        .str.to_uppercase(),
+        motivo=texto("motivo"),
+        ncaso=entero(df, "ncaso").fill_null(0),
+        usuariocarga=texto("usuariocarga"),
+        usuariorespuesta=texto("usuariorespuesta"),
+        estado=texto("estado").str.to_uppercase(),
+        itr=entero(df, "itr").fill_null(0),
+        error=error,
+    )
+
+    errores = df.filter(pl.col("error").is_not_null()).select(
+        "fila",
+        pl.format("Fila {}: {}", "fila", "error").alias("error"),
+    )
+    filas = df.filter(
+        pl.col("error").is_null() & (pl.col("ngestion") != 0)
+    ).select(COLUMNAS_IMPORTACION)
+    return filas, errores
+
+
+def crear_tabla_importacion(cursor: sqlite3.Cursor):
+    """Tabla temporal donde se cargan las filas de cada bloque"""
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE IF NOT EXISTS importacion_gestiones (
+            orden INTEGER PRIMARY KEY,
+            {", ".join(COLUMNAS_IMPORTACION)}
+        )
+        """
+    )
+
+
+def preparar(cursor: sqlite3.Cursor, df: pl.DataFrame) -> int:
+    """
+    Carga en la tabla temporal las filas normalizadas de df, una por
+    ngestion, y descarta las que ya coinciden con gestiones.
+
+    Solo escribe en la base temp de la conexión: no necesita el
+    camino de escritura del pool.
+
+    Returns:
+        int: Filas sin cambios
+    """
+    cursor.execute("DELETE FROM importacion_gestiones")
+    cursor.executemany(
+        f"""
+        INSERT INTO importacion_gestiones (
+            {", ".join(COLUMNAS_IMPORTACION)}
+        )
+        VALUES ({", ".join("?" for _ in COLUMNAS_IMPORTACION)})
+        """,
+        df.iter_rows(),
+    )
+
+    iguales = " AND ".join(
+        f"g.{c} IS importacion_gestiones.{c}"
+        for c in COLUMNAS_IMPORTACION
+        if c != "ngestion"
+    )
+    return cursor.execute(
+        f"""
+        DELETE FROM importacion_gestiones
+        WHERE EXISTS (
+            SELECT 1 FROM gestiones g
+            WHERE g.ngestion = importacion_gestiones.ngestion
+                AND {iguales}
+        )
+        """
+    ).rowcount
+
+
+def combinar(cursor: sqlite3.Cursor) -> int:
+    """
+    Combina con gestiones las filas que preparar dejó en la tabla
+    temporal.
+
+    Inserta las nuevas y actualiza el resto con un solo INSERT ...
+    ON CONFLICT (ngestion), apoyado en el índice único de ngestion.
+
+    Returns:
+        int: Gestiones insertadas
+    """
+    (insertadas,) = cursor.execute(
+        """
+        SELECT count(*)
+        FROM importacion_gestiones i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM gestiones g
+            WHERE g.ngestion = i.ngestion
+        )
+        """
+    ).fetchone()
+
+    columnas = ", ".join(COLUMNAS_IMPORTACION)
+    actualizar = ",\n".join(
+        f"{c} = excluded.{c}"
+        for c in COLUMNAS_IMPORTACION
+        if c != "ngestion"
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO gestiones (
+            {columnas},
+            totalfactura, terminado, obs, activa
+        )
+        SELECT {columnas}, 0.0, 0, '', 1
+        FROM importacion_gestiones
+        WHERE true
+        ORDER BY orden
+        ON CONFLICT (ngestion) WHERE ngestion != 0 DO UPDATE SET
+            {actualizar}
+        """
+    )
+    cursor.execute("DELETE FROM importacion_gestiones")
+    return insertadas
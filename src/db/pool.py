@@ -0,0 +1,218 @@
+"""
+Pool de conexiones SQLite.
+
+Cada hilo obtiene su propia conexión y su propio cursor, de modo que dos
+clientes nunca comparten estado de cursor ni leen filas de otra consulta.
+Las escrituras pasan por un único camino serializado (un lock reentrante
+por pool), evitando que dos hilos compitan por el lock de escritura de
+SQLite.
+
+Quien escribe desde el hilo del event loop de NiceGUI espera el lock
+a lo sumo unos instantes: si otro hilo lo tiene (p. ej. una
+importación) se levanta EscrituraOcupada en lugar de congelar el
+servidor para todos los clientes. Los métodos de escritura que usan
+las páginas la convierten en su resultado de error (ver
+escritura_serializada).
+"""
+
+import asyncio
+import functools
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+
+class EscrituraOcupada(sqlite3.OperationalError):
+    """El camino de escritura está tomado por otro hilo"""
+
+    MENSAJE = (
+        "La base está ocupada con otra escritura;"
+        " intentá de nuevo en unos segundos"
+    )
+
+    def __init__(self):
+        super().__init__(self.MENSAJE)
+
+
+def _en_event_loop() -> bool:
+    """Si el hilo actual está corriendo un event loop de asyncio"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """Conexiones por hilo con un único escritor serializado"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        pragmas: dict | None = None,
+        espera_event_loop: float = 1.0,
+    ):
+        self.db_path = db_path
+        self.pragmas = pragmas or {}
+        # Segundos que una escritura hecha desde el event loop espera
+        # el lock antes de levantar EscrituraOcupada
+        self.espera_event_loop = espera_event_loop
+        self._local = threading.local()
+        self._conexiones: dict[int, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+        self._escritor = threading.RLock()
+
+        self._creadas = 0
+        self._escrituras = 0
+        self._esperas_escritura = 0
+        self._tiempo_espera_escritura = 0.0
+        self._escrituras_rechazadas = 0
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre una conexión nueva configurada para el pool"""
+        # check_same_thread=False solo para que el pool pueda cerrar
+        # conexiones de hilos ya terminados; cada conexión se usa
+        # únicamente desde el hilo que la creó.
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        for nombre, valor in self.pragmas.items():
+            conn.execute(f"PRAGMA {nombre} = {valor}")
+        return conn
+
+    def _purgar(self):
+        """Cierra las conexiones de hilos que ya no existen"""
+        vivos = {t.ident for t in threading.enumerate()}
+        for ident in list(self._conexiones):
+            if ident not in vivos:
+                with suppress(sqlite3.Error):
+                    self._conexiones.pop(ident).close()
+
+    def conexion(self) -> sqlite3.Connection:
+        """Retorna la conexión del hilo actual, creándola si hace falta"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._conectar()
+            with self._lock:
+                self._purgar()
+                self._conexiones[threading.get_ident()] = conn
+                self._creadas += 1
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+        return conn
+
+    def cursor(self) -> sqlite3.Cursor:
+        """Retorna el cursor del hilo actual"""
+        self.conexion()
+        return self._local.cursor
+
+    @contextmanager
+    def escritura(self):
+        """
+        Serializa las escrituras del proceso.
+
+        Es reentrante: un método de escritura puede llamar a otro
+        (p. ej. crear_factura_con_notas → crear_factura) sin bloquearse.
+        Desde el event loop espera a lo sumo espera_event_loop segundos.
+
+        Raises:
+            EscrituraOcupada: Si se llamó desde el event loop y otro
+                hilo no liberó el lock a tiempo
+        """
+        if not self._escritor.acquire(blocking=False):
+            inicio = time.perf_counter()
+            if _en_event_loop():
+                tomado = self._escritor.acquire(
+                    timeout=self.espera_event_loop
+                )
+            else:
+                tomado = self._escritor.acquire()
+            with self._lock:
+                if not tomado:
+                    self._escrituras_rechazadas += 1
+                    raise EscrituraOcupada()
+                self._esperas_escritura += 1
+                self._tiempo_espera_escritura += (
+                    time.perf_counter() - inicio
+                )
+        profundidad = getattr(self._local, "profundidad", 0)
+        self._local.profundidad = profundidad + 1
+        try:
+            yield self.conexion()
+        finally:
+            self._local.profundidad = profundidad
+            if profundidad == 0:
+                with self._lock:
+                    self._escrituras += 1
+            self._escritor.release()
+
+    @property
+    def version(self) -> int:
+        """Escrituras completadas; cambia cada vez que cambian los datos"""
+        return self._escrituras
+
+    def perfil(self) -> dict:
+        """Valores efectivos de los PRAGMA configurados"""
+        conn = self.conexion()
+        return {
+            nombre: conn.execute(f"PRAGMA {nombre}").fetchone()[0]
+            for nombre in self.pragmas
+        }
+
+    def metricas(self) -> dict:
+        """Tamaño del pool y esperas del camino de escritura"""
+        with self._lock:
+            return {
+                "conexiones_abiertas": len(self._conexiones),
+                "conexiones_creadas": self._creadas,
+                "escrituras": self._escrituras,
+                "esperas_escritura": self._esperas_escritura,
+                "tiempo_espera_escritura": round(
+                    self._tiempo_espera_escritura, 4
+                ),
+                "escrituras_rechazadas": self._escrituras_rechazadas,
+            }
+
+    def cerrar(self):
+        """Cierra todas las conexiones del pool"""
+        with self._lock:
+            for conn in self._conexiones.values():
+                with suppress(sqlite3.Error):
+                    conn.close()
+            self._conexiones.clear()
+        self._local = threading.local()
+
+
+# Valor por defecto de `ocupada`: levantar EscrituraOcupada
+_LEVANTAR = object()
+
+
+def escritura_serializada(metodo=None, *, ocupada=_LEVANTAR):
+    """
+    Decorador: ejecuta el método dentro del camino de escritura del
+    pool.
+
+    Los métodos que informan el resultado con su valor de retorno
+    (p. ej. (éxito, mensaje)) pasan en `ocupada` el que corresponde
+    cuando el camino está tomado; sin `ocupada` se levanta
+    EscrituraOcupada.
+    """
+
+    def decorar(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            try:
+                with self.pool.escritura():
+                    return metodo(self, *args, **kwargs)
+            except EscrituraOcupada as e:
+                if ocupada is _LEVANTAR:
+                    raise
+                print(f"{metodo.__name__}: {e}")
+                return ocupada
+
+        return envoltura
+
+    return decorar if metodo is None else decorar(metodo)
@@ -0,0 +1,498 @@
+"""
+Datos de la página de reportes.
+
+Las consultas usan la conexión del pool compartido (src/db/pool.py) en
+lugar de abrir una conexión propia. Las de cada panel corren dentro de
+una transacción de lectura, de modo que ven la misma instantánea de los
+datos, y el cursor se cierra al terminar.
+
+Los resultados (datos y figuras) se guardan en CacheReportes, compartido
+por todos los clientes, hasta que cambie la versión de datos del pool o
+venza REPORTES_CACHE_TTL.
+
+Cada servicio puede limitarse a un rango de meses ('YYYY-MM'): los
+límites se agregan como condiciones de cada consulta (sobre
+pagos_mensuales.periodo y gestiones.fecha, ambos indexados) y forman
+parte de la clave del cache.
+"""
+
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import polars as pl
+
+from src.commons import REPORTES_CACHE_TTL
+from src.db.database import SQLiteDB
+
+
+# Esquemas de los DataFrames de reportes: los tipos se fijan de antemano
+# en lugar de inferirlos fila por fila
+ESQUEMA_PAGOS = {
+    "periodo": pl.Utf8,
+    "forma_pago": pl.Utf8,
+    "importe_total": pl.Float64,
+    "cantidad_pagos": pl.Int64,
+}
+ESQUEMA_AGENTES = {
+    "periodo": pl.Utf8,
+    "pagador": pl.Utf8,
+    "destinatario": pl.Utf8,
+    "importe_total": pl.Float64,
+    "cantidad_pagos": pl.Int64,
+}
+ESQUEMA_FLUJOS = {
+    "agente": pl.Utf8,
+    "tipo": pl.Utf8,
+    "periodo": pl.Utf8,
+    "importe_total": pl.Float64,
+    "cantidad_pagos": pl.Int64,
+}
+ESQUEMA_FORMAS = {
+    "forma_pago": pl.Utf8,
+    "importe_total": pl.Float64,
+    "cantidad_pagos": pl.Int64,
+}
+
+
+def a_polars(
+    cursor: sqlite3.Cursor,
+    query: str,
+    esquema: dict,
+    params: dict | None = None,
+) -> pl.DataFrame:
+    """
+    Ejecuta la consulta y carga el resultado en un DataFrame.
+
+    Las filas llegan como tuplas (el cursor de la instantánea no usa
+    sqlite3.Row) y Polars las arma con el esquema dado, sin pasar por
+    un dict por fila.
+    """
+    return pl.DataFrame(
+        cursor.execute(query, params or {}).fetchall(),
+        schema=esquema,
+        orient="row",
+    )
+
+
+class CacheReportes:
+    """Resultados de reportes por nombre y parámetros"""
+
+    def __init__(self, ttl: float = REPORTES_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas: dict[tuple, tuple] = {}
+
+    def obtener(
+        self,
+        nombre: str,
+        params: tuple,
+        version: int,
+        calcular: Callable[[], Any],
+    ) -> Any:
+        """
+        Retorna el resultado cacheado o lo calcula.
+
+        Args:
+            nombre: Nombre del reporte o figura
+            params: Parámetros que distinguen el resultado
+            version: Versión de datos leída antes de calcular
+            calcular: Función que produce el resultado
+        """
+        clave = (nombre, params)
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+        if (
+            entrada is not None
+            and entrada[0] == version
+            and ahora - entrada[1] < self.ttl
+        ):
+            return entrada[2]
+
+        valor = calcular()
+        with self._lock:
+            # Descartar lo calculado con versiones anteriores. Las
+            # entradas más nuevas se conservan: un cálculo que empezó
+            # antes de una escritura no debe borrar los resultados que
+            # otro cliente ya calculó con los datos nuevos
+            self._entradas = {
+                c: e
+                for c, e in self._entradas.items()
+                if e[0] >= version
+            }
+            actual = self._entradas.get(clave)
+            if actual is None or actual[0] <= version:
+                self._entradas[clave] = (version, ahora, valor)
+        return valor
+
+    def limpiar(self):
+        """Descarta todos los resultados"""
+        with self._lock:
+            self._entradas.clear()
+
+
+# Cache compartido por todas las instancias del servicio
+cache_reportes = CacheReportes()
+
+
+def mes_siguiente(mes: str) -> str:
+    """Mes ('YYYY-MM') siguiente al dado"""
+    anio, numero = int(mes[:4]), int(mes[5:7])
+    if numero == 12:
+        return f"{anio + 1}-01"
+    return f"{anio}-{numero + 1:02d}"
+
+
+def mes_de_factura(periodo: int) -> str:
+    """Período de factura (YYYYMM) como mes 'YYYY-MM'"""
+    return f"{periodo // 100}-{periodo % 100:02d}"
+
+
+class ServicioReportes:
+    """Consultas de /reportes sobre el pool compartido"""
+
+    def __init__(
+        self,
+        db: SQLiteDB,
+        desde: str | None = None,
+        hasta: str | None = None,
+        cache: CacheReportes | None = None,
+    ):
+        """
+        Args:
+            db: Base de datos
+            desde: Primer mes incluido ('YYYY-MM'), o None
+            hasta: Último mes incluido ('YYYY-MM'), o None
+            cache: Cache de resultados (por defecto el compartido)
+        """
+        self.db = db
+        self.desde = desde
+        self.hasta = hasta
+        self.cache = cache or cache_reportes
+        # Versión leída una sola vez: datos y figuras de una misma
+        # vista quedan cacheados bajo la misma versión
+        self.version = db.version_datos()
+
+    def cacheado(
+        self, nombre: str, calcular: Callable[[], Any], *params
+    ) -> Any:
+        """Resultado de calcular(), cacheado hasta la próxima escritura"""
+        return self.cache.obtener(
+            nombre,
+            (self.desde, self.hasta, *params),
+            self.version,
+            calcular,
+        )
+
+    def _where_periodo(self) -> tuple[str, dict]:
+        """Condiciones del rango sobre pagos_mensuales (pm)"""
+        # periodo es la primera columna de la clave de
+        # pagos_mensuales: el rango se resuelve por índice
+        query = ""
+        params = {}
+        if self.desde:
+            query += " AND pm.periodo >= :desde"
+            params.update({"desde": self.desde})
+        if self.hasta:
+            query += " AND pm.periodo <= :hasta"
+            params.update({"hasta": self.hasta})
+        return query, params
+
+    def _where_fecha(self) -> tuple[str, dict]:
+        """Condiciones del rango sobre gestiones.fecha"""
+        query = ""
+        params = {}
+        if self.desde:
+            query += " AND fecha >= :fecha_desde"
+            params.update({"fecha_desde": f"{self.desde}-01"})
+        if self.hasta:
+            query += " AND fecha < :fecha_hasta"
+            params.update(
+                {"fecha_hasta": f"{mes_siguiente(self.hasta)}-01"}
+            )
+        return query, params
+
+    @contextmanager
+    def instantanea(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Cursor dentro de una transacción de lectura.
+
+        Con WAL, todas las consultas hechas con este cursor ven los
+        mismos datos aunque otro cliente escriba mientras tanto. El
+        cursor devuelve tuplas, listas para a_polars.
+        """
+        conn = self.db.conn
+        propia = not conn.in_transaction
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        try:
+            if propia:
+                cursor.execute("BEGIN")
+            yield cursor
+        finally:
+            try:
+                if propia and conn.in_transaction:
+                    conn.rollback()
+            finally:
+                cursor.close()
+
+    def _leer(self, lector: Callable[[sqlite3.Cursor], Any]):
+        """Ejecuta lector con un cursor de una instantánea propia"""
+        with self.instantanea() as cursor:
+            return lector(cursor)
+
+    def obtener_meses(self) -> tuple[list[str], dict[str, int]]:
+        """
+        Meses que se pueden elegir como límites del rango.
+
+        Returns:
+            tuple: (meses con pagos o facturas, ordenados; {mes:
+                período de la factura de ese mes})
+        """
+        # No depende del rango del servicio
+        return self.cache.obtener(
+            "meses",
+            (),
+            self.version,
+            lambda: self._leer(self.meses),
+        )
+
+    # Cada panel de la página lee y cachea por separado, para poder
+    # cargarlo recién cuando se muestra
+    def obtener_estadisticas(self) -> dict:
+        return self.cacheado(
+            "estadisticas",
+            lambda: self._leer(self.estadisticas_generales),
+        )
+
+    def obtener_pagos_por_forma(self) -> pl.DataFrame:
+        return self.cacheado(
+            "pagos_por_forma",
+            lambda: self._leer(self.pagos_por_forma),
+        )
+
+    def obtener_pagos_por_agentes(self) -> pl.DataFrame:
+        return self.cacheado(
+            "pagos_por_agentes",
+            lambda: self._leer(self.pagos_por_agentes),
+        )
+
+    def obtener_flujos_agentes(self) -> pl.DataFrame:
+        return self.cacheado(
+            "flujos_agentes",
+            lambda: self._leer(self.flujos_agentes),
+        )
+
+    def obtener_comparacion_agente(
+        self, agente: str
+    ) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """
+        Pagos de un agente como pagador y como destinatario, por mes.
+
+        Sale de los flujos de todos los agentes (una sola consulta,
+        cacheada por rango); cada agente se cachea aparte.
+        """
+
+        def separar():
+            df = self.obtener_flujos_agentes().filter(
+                pl.col("agente") == agente
+            )
+            return tuple(
+                df.filter(pl.col("tipo") == tipo).drop("agente")
+                for tipo in ("Pagador", "Destinatario")
+            )
+
+        return self.cacheado(
+            "comparacion_agente", separar, agente
+        )
+
+    def pagos_por_forma(
+        self, cursor: sqlite3.Cursor
+    ) -> pl.DataFrame:
+        """Pagos agrupados por mes y forma de pago"""
+        # pagos_mensuales ya viene agrupado por período (YYYY-MM)
+        query = """
+            SELECT
+                pm.periodo,
+                fp.formapago AS forma_pago,
+                sum(pm.importe) AS importe_total,
+                sum(pm.pagos) AS cantidad_pagos
+            FROM
+                pagos_mensuales pm
+            LEFT JOIN formaspago fp ON
+                fp.id = pm.formapago_id
+            WHERE
+                pm.activa = 1{rango}
+            GROUP BY
+                pm.periodo,
+                fp.formapago
+            ORDER BY
+                pm.periodo;
+            """
+        rango, params = self._where_periodo()
+        return a_polars(
+            cursor,
+            query.format(rango=rango),
+            ESQUEMA_PAGOS,
+            params,
+        )
+
+    def pagos_por_agentes(
+        self, cursor: sqlite3.Cursor
+    ) -> pl.DataFrame:
+        """Pagos agrupados por mes, pagador y destinatario"""
+        query = """
+            SELECT
+                pm.periodo,
+                pag.agente AS pagador,
+                des.agente AS destinatario,
+                sum(pm.importe) AS importe_total,
+                sum(pm.pagos) AS cantidad_pagos
+            FROM
+                pagos_mensuales pm
+            LEFT JOIN agentes pag ON
+                pag.id = pm.pagador_id
+            LEFT JOIN agentes des ON
+                des.id = pm.destinatario_id
+            WHERE
+                pm.activa = 1{rango}
+            GROUP BY
+                pm.periodo,
+                pag.agente,
+                des.agente
+            ORDER BY
+                pm.periodo;
+            """
+        rango, params = self._where_periodo()
+        return a_polars(
+            cursor,
+            query.format(rango=rango),
+            ESQUEMA_AGENTES,
+            params,
+        )
+
+    def flujos_agentes(
+        self, cursor: sqlite3.Cursor
+    ) -> pl.DataFrame:
+        """
+        Pagos de cada agente como pagador y como destinatario, por mes.
+
+        Una sola pasada por pagos_mensuales: las dos puntas de cada
+        fila se unen (UNION ALL) y se agrupan juntas.
+        """
+        query = """
+            SELECT
+                a.agente,
+                f.tipo,
+                f.periodo,
+                sum(f.importe) AS importe_total,
+                sum(f.pagos) AS cantidad_pagos
+            FROM
+                (
+                SELECT
+                    pm.periodo,
+                    pm.pagador_id AS agente_id,
+                    'Pagador' AS tipo,
+                    pm.importe,
+                    pm.pagos
+                FROM
+                    pagos_mensuales pm
+                WHERE
+                    pm.activa = 1{rango}
+                UNION ALL
+                SELECT
+                    pm.periodo,
+                    pm.destinatario_id,
+                    'Destinatario',
+                    pm.importe,
+                    pm.pagos
+                FROM
+                    pagos_mensuales pm
+                WHERE
+                    pm.activa = 1{rango}
+                ) f
+            JOIN agentes a ON
+                a.id = f.agente_id
+            GROUP BY
+                a.agente,
+                f.tipo,
+                f.periodo
+            ORDER BY
+                f.periodo;
+            """
+        rango, params = self._where_periodo()
+        return a_polars(
+            cursor,
+            query.format(rango=rango),
+            ESQUEMA_FLUJOS,
+            params,
+        )
+
+    def estadisticas_generales(
+        self, cursor: sqlite3.Cursor
+    ) -> dict:
+        """Gestiones activas y totales de pagos por forma de pago"""
+        rango_fecha, params_fecha = self._where_fecha()
+        (gestiones_activas,) = cursor.execute(
+            "SELECT COUNT(*) FROM gestiones WHERE activa = 1"
+            + rango_fecha,
+            params_fecha,
+        ).fetchone()
+
+        query_formas_pago = """
+            SELECT
+                fp.formapago AS forma_pago,
+                sum(pm.importe) AS importe_total,
+                sum(pm.pagos) AS cantidad_pagos
+            FROM
+                pagos_mensuales pm
+            LEFT JOIN formaspago fp ON
+                fp.id = pm.formapago_id
+            WHERE
+                pm.activa = 1{rango}
+            GROUP BY
+                fp.formapago;
+            """
+        rango, params = self._where_periodo()
+        df_formas = a_polars(
+            cursor,
+            query_formas_pago.format(rango=rango),
+            ESQUEMA_FORMAS,
+            params,
+        )
+
+        return {
+            "gestiones_activas": gestiones_activas,
+            "total_pagos": int(df_formas["cantidad_pagos"].sum()),
+            "total_importe": float(
+                df_formas["importe_total"].sum()
+            ),
+            "formas_pago": df_formas.to_dicts(),
+        }
+
+    def meses(
+        self, cursor: sqlite3.Cursor
+    ) -> tuple[list[str], dict[str, int]]:
+        """Meses con pagos activos y períodos de facturas"""
+        meses = [
+            periodo
+            for (periodo,) in cursor.execute(
+                """
+                SELECT DISTINCT periodo
+                FROM pagos_mensuales
+                WHERE activa = 1
+                ORDER BY periodo;
+                """
+            )
+        ]
+        facturas = {
+            mes_de_factura(periodo): periodo
+            for (periodo,) in cursor.execute(
+                "SELECT periodo FROM facturas WHERE periodo IS NOT NULL;"
+            )
+        }
+        return sorted(set(meses) | set(facturas)), facturas
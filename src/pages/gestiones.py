@@ -1,34 +1,63 @@
 """Página principal de Gestiones"""
 
-from nicegui import ui
+from nicegui import app, ui
 from src.db.connection import get_database
-from src.state import filtros_gestiones
+from src.state import FiltrosStateGestiones, cache_de_pestana
 from src.components.navbar import crear_navbar
+from src.components.busqueda_diferida import BusquedaDiferida
+from src.components.trabajo_importacion import (
+    TrabajoImportacion,
+)
+from src.db.importacion import EXTENSIONES
 from src.components.dialog_gestion import crear_dialog_gestion
 from src.components.dialog_gestiones_masivas import (
     crear_dialog_gestiones_masivas,
 )
 
 
-def tabla_gestiones(refresh_callback=None):
-    """Tabla de gestiones con selección"""
+FILAS_POR_PAGINA = 8
+
+
+def consultar_gestiones(filtros: dict) -> tuple:
+    """
+    Total y primera página para los filtros dados.
+
+    Se ejecuta en un hilo desde la búsqueda diferida.
+
+    Returns:
+        tuple: (filtros, filas de la primera página, total)
+    """
+    db = get_database()
+    total = db.contar_gestiones(**filtros)
+    filas = (
+        db.filter_gestiones(**filtros, limite=FILAS_POR_PAGINA)
+        if total
+        else []
+    )
+    return filtros, filas, total
+
+
+def tabla_gestiones(
+    filtros_estado: FiltrosStateGestiones,
+    refresh_callback=None,
+    resultado=None,
+):
+    """
+    Tabla de gestiones con selección y paginación en el servidor.
+
+    Args:
+        filtros_estado: Filtros del cliente que muestra la tabla
+        refresh_callback: Función a llamar tras editar una gestión
+        resultado: Salida de consultar_gestiones ya calculada; si es
+            None se consulta con los filtros vigentes
+    """
     db = get_database()
-    gestiones: list[dict[str, any]] = db.filter_gestiones(
-        texto_busqueda=filtros_gestiones.texto_busqueda,
-        tipo=filtros_gestiones.tipo,
-        terminado=filtros_gestiones.terminado,
-        no_terminado=filtros_gestiones.no_terminado,
-        activa=filtros_gestiones.activa,
-        no_activa=filtros_gestiones.no_activa,
-        con_pagos=filtros_gestiones.con_pagos,
-        sin_pagos=filtros_gestiones.sin_pagos,
-        con_nota=filtros_gestiones.con_nota,
-        sin_nota=filtros_gestiones.sin_nota,
-        con_nota_pasada=filtros_gestiones.con_nota_pasada,
+    filtros, filas_iniciales, total = (
+        resultado or consultar_gestiones(filtros_estado.a_dict())
     )
 
     # Tabla
-    if not gestiones:
+    if not total:
         with ui.card().classes("w-full p-8 text-center"):
             ui.icon("search_off", size="4rem").classes(
                 "text-gray-400"
@@ -130,13 +159,64 @@ def tabla_gestiones(refresh_callback=None):
         },
     ]
 
+    # Cursor (fecha, id) de la última fila de cada página visitada,
+    # válido mientras no cambie el orden ni el tamaño de página
+    cursores: dict[int, tuple] = {}
+    clave_cursores = None
+
+    def cargar_pagina(pagination: dict) -> list[dict]:
+        """Consulta solo las filas de la página pedida"""
+        nonlocal clave_cursores
+        pagina = pagination.get("page", 1)
+        por_pagina = pagination.get(
+            "rowsPerPage", FILAS_POR_PAGINA
+        )
+        orden = pagination.get("sortBy") or "fecha"
+        descendente = bool(pagination.get("descending"))
+
+        clave = (orden, descendente, por_pagina)
+        if clave_cursores != clave:
+            cursores.clear()
+            clave_cursores = clave
+
+        filas = db.filter_gestiones(
+            **filtros,
+            limite=por_pagina or None,
+            offset=(pagina - 1) * por_pagina,
+            orden=orden,
+            descendente=descendente,
+            despues_de=cursores.get(pagina - 1),
+        )
+        if filas and orden == "fecha":
+            cursores[pagina] = (
+                filas[-1]["fecha"],
+                filas[-1]["id"],
+            )
+        return filas
+
+    pagination = {
+        "rowsPerPage": FILAS_POR_PAGINA,
+        "page": 1,
+        "sortBy": "fecha",
+        "descending": True,
+        "rowsNumber": total,
+    }
+    clave_cursores = ("fecha", True, FILAS_POR_PAGINA)
+    # total y la página se consultan por separado: la página puede
+    # venir vacía si otro cliente borró filas entre las dos consultas
+    if filas_iniciales:
+        cursores[1] = (
+            filas_iniciales[-1]["fecha"],
+            filas_iniciales[-1]["id"],
+        )
+
     table = (
         ui.table(
             columns=columns,
-            rows=gestiones,
+            rows=filas_iniciales,
             row_key="id",
             selection="single",
-            pagination={"rowsPerPage": 8},
+            pagination=pagination,
             title="Gestiones",
         )
         .classes("w-full")
@@ -145,6 +225,14 @@ def tabla_gestiones(refresh_callback=None):
         )
     )
 
+    def on_request(e):
+        """Pedido de página/orden de Quasar (modo servidor)"""
+        nueva = e.args["pagination"]
+        table.rows = cargar_pagina(nueva)
+        table.pagination = {**nueva, "rowsNumber": total}
+
+    table.on("request", on_request)
+
     # Color condicional para columna activa
     table.add_slot(
         "body-cell-activa",
@@ -273,69 +361,37 @@ async def importar_excel(refresh_callback=None):
         ui.separator()
 
         ui.label(
-            "Selecciona un archivo Excel con las columnas: Fecha, N° Gestion, Cliente, Dominio, Póliza, Tipo, Motivo, N° Caso, Usuario Carga, Usuario Respuesta, Estado, ITR"
+            "Selecciona un archivo Excel, CSV o Parquet con las columnas: Fecha, N° Gestion, Cliente, Dominio, Póliza, Tipo, Motivo, N° Caso, Usuario Carga, Usuario Respuesta, Estado, ITR"
         ).classes("text-caption text-grey-7 mb-4")
 
         result_container = ui.column().classes("w-full")
 
         async def handle_upload(e):
+            trabajo = await TrabajoImportacion.desde_upload(
+                e.file
+            )
+
             result_container.clear()
             with result_container:
-                ui.spinner(size="lg")
-                ui.label("Procesando archivo...").classes(
-                    "text-body2"
+                with ui.row().classes("items-center gap-4"):
+                    ui.spinner(size="lg")
+                    avance = ui.label(
+                        trabajo.descripcion()
+                    ).classes("text-body2")
+                    ui.button(
+                        "Cancelar", on_click=trabajo.cancelar
+                    ).props("outline color=negative")
+                # El hilo deja su avance en trabajo; el timer lo
+                # muestra hasta que se limpia el contenedor
+                ui.timer(
+                    0.3,
+                    lambda: avance.set_text(
+                        trabajo.descripcion()
+                    ),
                 )
 
-            temp_path = None
             try:
-                # En NiceGUI, e contiene información del archivo
-                import tempfile
-                import os
-                import shutil
-
-                # e.file es un objeto SmallFileUpload que contiene los bytes del archivo
-                # Opción 1: Si tiene _data (bytes), escribirlo a un archivo temporal
-                if hasattr(e.file, "_data"):
-                    temp_fd, temp_path = tempfile.mkstemp(
-                        suffix=".xlsx"
-                    )
-                    os.write(temp_fd, e.file._data)
-                    os.close(temp_fd)
-                # Opción 2: Buscar una ruta temporal que exista
-                else:
-                    source_file = None
-                    for attr in [
-                        "path",
-                        "_path",
-                        "file",
-                        "_file",
-                        "tmpfile",
-                    ]:
-                        if hasattr(e.file, attr):
-                            val = getattr(e.file, attr)
-                            if isinstance(
-                                val, str
-                            ) and os.path.exists(val):
-                                source_file = val
-                                break
-
-                    if not source_file:
-                        raise ValueError(
-                            f"No se pudo encontrar la ruta del archivo. Atributos: {[a for a in dir(e.file) if not a.startswith('__')]}"
-                        )
-
-                    # Copiar a temp_path
-                    temp_fd, temp_path = tempfile.mkstemp(
-                        suffix=".xlsx"
-                    )
-                    os.close(temp_fd)
-                    shutil.copy2(source_file, temp_path)
-
-                # Importar
-                db = get_database()
-                success, stats = (
-                    db.importar_gestiones_desde_excel(temp_path)
-                )
+                success, stats = await trabajo.ejecutar()
 
                 result_container.clear()
                 with result_container:
@@ -352,6 +408,9 @@ async def importar_excel(refresh_callback=None):
                             ui.label(
                                 f"➕ {stats['insertadas']} gestiones insertadas"
                             ).classes("text-body1")
+                            ui.label(
+                                f"➖ {stats['sin_cambios']} gestiones sin cambios"
+                            ).classes("text-body1")
 
                             if stats["errores"]:
                                 ui.separator()
@@ -380,6 +439,25 @@ async def importar_excel(refresh_callback=None):
                         # Refrescar tabla después de cerrar
                         if refresh_callback:
                             refresh_callback()
+                    elif trabajo.cancelado:
+                        ui.label(
+                            "⏹️ Importación cancelada"
+                        ).classes("text-h6 text-warning")
+                        # Bloques guardados antes de cancelar
+                        if stats.get("insertadas") or stats.get(
+                            "actualizadas"
+                        ):
+                            ui.label(
+                                f"Se guardaron las filas anteriores: {stats['insertadas']} gestiones insertadas y {stats['actualizadas']} actualizadas"
+                            ).classes("text-body2")
+                        else:
+                            ui.label(
+                                "No se modificó ninguna gestión"
+                            ).classes("text-body2")
+                        ui.notify(
+                            "Importación cancelada",
+                            type="warning",
+                        )
                     else:
                         ui.label(
                             "❌ Error en la importación"
@@ -387,9 +465,16 @@ async def importar_excel(refresh_callback=None):
                         with ui.card().classes(
                             "w-full bg-negative-1"
                         ):
+                            # Bloques guardados antes del error
+                            if stats.get(
+                                "insertadas"
+                            ) or stats.get("actualizadas"):
+                                ui.label(
+                                    f"Se guardaron las filas anteriores: {stats['insertadas']} gestiones insertadas y {stats['actualizadas']} actualizadas"
+                                ).classes("text-body2")
                             for error in stats.get(
                                 "errores", ["Error desconocido"]
-                            ):
+                            )[-10:]:
                                 ui.label(f"• {error}").classes(
                                     "text-body2"
                                 )
@@ -408,16 +493,14 @@ async def importar_excel(refresh_callback=None):
                         "text-caption text-grey-7"
                     )
                 ui.notify(f"Error: {str(e)}", type="negative")
-            finally:
-                # Limpiar archivo temporal
-                if temp_path and os.path.exists(temp_path):
-                    os.remove(temp_path)
 
         ui.upload(
-            label="Seleccionar archivo Excel",
+            label="Seleccionar archivo",
             on_upload=handle_upload,
             auto_upload=True,
-        ).props('accept=".xlsx,.xls"').classes("w-full")
+        ).props(f'accept="{",".join(EXTENSIONES)}"').classes(
+            "w-full"
+        )
 
         with ui.row().classes("w-full justify-end mt-4"):
             ui.button(
@@ -428,29 +511,77 @@ async def importar_excel(refresh_callback=None):
 
 
 @ui.page("/")
-def page_gestiones():
+async def page_gestiones():
     """Página principal de gestiones"""
+    # app.storage.tab solo está disponible con el cliente conectado
+    await ui.context.client.connected()
+
+    db = get_database()
+    # Filtros y resultados propios de esta pestaña
+    filtros = FiltrosStateGestiones.desde_dict(
+        app.storage.tab.get("filtros_gestiones")
+    )
+    cache = cache_de_pestana(
+        ui.context.client.tab_id, "gestiones"
+    )
+
     # Aplicar decorador ui.refreshable en scope local
     tabla_gestiones_refreshable = ui.refreshable(tabla_gestiones)
 
     def refresh_tabla():
         """Callback para refrescar la tabla desde dentro de tabla_gestiones"""
-        tabla_gestiones_refreshable.refresh()
+        # resultado=None: volver a consultar en lugar de reusar el
+        # último resultado de la búsqueda diferida
+        tabla_gestiones_refreshable.refresh(resultado=None)
+
+    def consultar(filtros_dict: dict, clave: str) -> tuple:
+        """Consulta anotando la versión de datos con la que se hizo"""
+        version = db.version_datos()
+        return clave, version, consultar_gestiones(filtros_dict)
+
+    def mostrar_resultado(salida: tuple):
+        """Cachea y muestra el resultado de la última búsqueda"""
+        clave, version, resultado = salida
+        cache.guardar(clave, version, resultado)
+        tabla_gestiones_refreshable.refresh(
+            refresh_callback=refresh_tabla, resultado=resultado
+        )
+
+    busqueda = BusquedaDiferida(
+        consultar=consultar, mostrar=mostrar_resultado
+    )
 
-    def aplicar_filtros():
-        """Aplica los filtros y actualiza la tabla"""
-        tabla_gestiones_refreshable.refresh()
+    def aplicar_filtros(inmediato: bool = True):
+        """Guarda los filtros de la pestaña y actualiza la tabla"""
+        app.storage.tab["filtros_gestiones"] = filtros.a_dict()
+        clave = filtros.clave()
+        resultado = cache.obtener(clave, db.version_datos())
+        if resultado is not None:
+            busqueda.cancelar()
+            tabla_gestiones_refreshable.refresh(
+                refresh_callback=refresh_tabla,
+                resultado=resultado,
+            )
+            return
+        busqueda.disparar(
+            filtros.a_dict(), clave, inmediato=inmediato
+        )
+
+    def buscar_texto(texto: str):
+        """Actualiza el texto de búsqueda con debounce"""
+        filtros.texto_busqueda = texto
+        aplicar_filtros(inmediato=False)
 
     def exportar_seleccionados():
         """Exporta gestiones seleccionados"""
-        if not filtros_gestiones.gestiones_seleccionados:
+        if not filtros.gestiones_seleccionados:
             ui.notify(
                 "No hay gestiones seleccionados", type="warning"
             )
             return
 
         ui.notify(
-            f"Exportando {len(filtros_gestiones.gestiones_seleccionados)} gestiones...",
+            f"Exportando {len(filtros.gestiones_seleccionados)} gestiones...",
             type="positive",
         )
 
@@ -459,7 +590,6 @@ def page_gestiones():
         primary="#1e88e5", secondary="#26a69a", accent="#66bb6a"
     )
 
-    db = get_database()
     dark = ui.dark_mode(value=True)
     crear_navbar(dark)
 
@@ -517,14 +647,15 @@ def page_gestiones():
             with ui.row().classes("w-full gap-4 mt-2"):
                 # Tipo
                 with ui.column().classes("w-48"):
-                    global tipo_select
                     tipos = ["all"] + db.obtener_tipos()
                     tipo_select = ui.select(
-                        options=tipos, value="all", label="Tipo"
+                        options=tipos,
+                        value=filtros.tipo,
+                        label="Tipo",
                     ).classes("w-full")
 
                     def on_tipo_change(e):
-                        filtros_gestiones.tipo = e.sender.value
+                        filtros.tipo = e.sender.value
                         aplicar_filtros()
 
                     tipo_select.on(
@@ -533,20 +664,15 @@ def page_gestiones():
 
                 # Búsqueda por texto
                 with ui.column().classes("w-120"):
-                    global texto_busqueda_input
-                    texto_busqueda_input = (
+                    (
                         ui.input(
                             "Búsqueda",
+                            value=filtros.texto_busqueda,
                             placeholder="Buscar por nombre o proveedor...",
                         )
                         .classes("w-full")
                         .on_value_change(
-                            lambda e: setattr(
-                                filtros_gestiones,
-                                "texto_busqueda",
-                                e.value,
-                            )
-                            or aplicar_filtros()
+                            lambda e: buscar_texto(e.value)
                         )
                     )
 
@@ -558,39 +684,30 @@ def page_gestiones():
 
             # Segunda fila de filtros
             with ui.row().classes("w-full gap-4 items-end"):
-                global \
-                    terminado_check, \
-                    no_terminado_check, \
-                    no_activa_check, \
-                    activa_check, \
-                    con_pagos_check, \
-                    sin_pagos_check, \
-                    con_nota_check, \
-                    sin_nota_check, \
-                    con_nota_pasada_check
-
                 ui.space()
                 with ui.column().classes("w-48"):
                     ui.label("Estado de la gestión").classes(
                         "text-subtitle2"
                     )
 
-                    terminado_check = ui.checkbox(
-                        "Terminados", value=False
+                    ui.checkbox(
+                        "Terminados",
+                        value=filtros.terminado,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "terminado",
                             e.value,
                         )
                         or aplicar_filtros()
                     )
 
-                    no_terminado_check = ui.checkbox(
-                        "NO Terminados", value=True
+                    ui.checkbox(
+                        "NO Terminados",
+                        value=filtros.no_terminado,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "no_terminado",
                             e.value,
                         )
@@ -600,22 +717,24 @@ def page_gestiones():
                 with ui.column().classes("w-48"):
                     ui.label("Activas").classes("text-subtitle2")
 
-                    activa_check = ui.checkbox(
-                        "Activas", value=True
+                    ui.checkbox(
+                        "Activas",
+                        value=filtros.activa,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "activa",
                             e.value,
                         )
                         or aplicar_filtros()
                     )
 
-                    no_activa_check = ui.checkbox(
-                        "NO Activas", value=False
+                    ui.checkbox(
+                        "NO Activas",
+                        value=filtros.no_activa,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "no_activa",
                             e.value,
                         )
@@ -625,22 +744,24 @@ def page_gestiones():
                 with ui.column().classes("w-48"):
                     ui.label("Pagos").classes("text-subtitle2")
 
-                    con_pagos_check = ui.checkbox(
-                        "Con Pagos", value=False
+                    ui.checkbox(
+                        "Con Pagos",
+                        value=filtros.con_pagos,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "con_pagos",
                             e.value,
                         )
                         or aplicar_filtros()
                     )
 
-                    sin_pagos_check = ui.checkbox(
-                        "Sin Pagos", value=False
+                    ui.checkbox(
+                        "Sin Pagos",
+                        value=filtros.sin_pagos,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "sin_pagos",
                             e.value,
                         )
@@ -652,33 +773,36 @@ def page_gestiones():
                         "text-subtitle2"
                     )
 
-                    con_nota_check = ui.checkbox(
-                        "Con Nota de Crédito", value=False
+                    ui.checkbox(
+                        "Con Nota de Crédito",
+                        value=filtros.con_nota,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "con_nota",
                             e.value,
                         )
                         or aplicar_filtros()
                     )
 
-                    sin_nota_check = ui.checkbox(
-                        "Sin Nota de Crédito", value=False
+                    ui.checkbox(
+                        "Sin Nota de Crédito",
+                        value=filtros.sin_nota,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "sin_nota",
                             e.value,
                         )
                         or aplicar_filtros()
                     )
 
-                    con_nota_pasada_check = ui.checkbox(
-                        "Con Nota de Crédito PASADA", value=False
+                    ui.checkbox(
+                        "Con Nota de Crédito PASADA",
+                        value=filtros.con_nota_pasada,
                     ).on_value_change(
                         lambda e: setattr(
-                            filtros_gestiones,
+                            filtros,
                             "con_nota_pasada",
                             e.value,
                         )
@@ -690,7 +814,11 @@ def page_gestiones():
         # TABLA
         # ====================
         tabla_gestiones_refreshable(
-            refresh_callback=refresh_tabla
+            filtros_estado=filtros,
+            refresh_callback=refresh_tabla,
+            resultado=cache.obtener(
+                filtros.clave(), db.version_datos()
+            ),
         )
 
     with ui.footer().classes("bg-transparent"):
@@ -1,25 +1,88 @@
 """Página de gestión de pagos"""
 
-from nicegui import ui
+from nicegui import app, ui
 from src.db.connection import get_database
-from src.state import filtros_pagos
+from src.state import FiltrosStatePagos, cache_de_pestana
 from src.components.navbar import crear_navbar
+from src.components.busqueda_diferida import BusquedaDiferida
 from src.components.dialog_pago import crear_dialog_pago
 
 
-def tabla_pagos(refresh_callback=None):
-    """Tabla de gestiones con selección"""
+FILAS_POR_PAGINA = 12
+
+
+def consultar_pagos(filtros: dict) -> tuple:
+    """
+    Total y primera página para los filtros dados.
+
+    Se ejecuta en un hilo desde la búsqueda diferida.
+
+    Returns:
+        tuple: (filtros, filas de la primera página, total)
+    """
+    filas, total = get_database().filtrar_pagos_paginado(
+        **filtros, limite=FILAS_POR_PAGINA
+    )
+    return filtros, filas, total
+
+
+def tabla_pagos(
+    filtros_estado: FiltrosStatePagos,
+    refresh_callback=None,
+    resultado=None,
+):
+    """
+    Tabla de pagos con selección y paginación en el servidor.
+
+    Args:
+        filtros_estado: Filtros del cliente que muestra la tabla
+        refresh_callback: Función a llamar tras editar un pago
+        resultado: Salida de consultar_pagos ya calculada; si es
+            None se consulta con los filtros vigentes
+    """
     database = get_database()
-    pagos: list[dict[str, any]] = database.filtrar_pagos(
-        texto_busqueda=filtros_pagos.texto_busqueda,
-        pagador=filtros_pagos.pagador,
-        destinatario=filtros_pagos.destinatario,
-        formapago=filtros_pagos.formapago,
-        es_nota_credito_no_pasada=filtros_pagos.es_nota_credito_no_pasada,
+    filtros, rows, total = resultado or consultar_pagos(
+        filtros_estado.a_dict()
     )
 
+    # Cursor (fecha, id) de la última fila de cada página visitada,
+    # válido mientras no cambie el orden ni el tamaño de página
+    cursores: dict[int, tuple] = {}
+    clave_cursores = None
+
+    def cargar_pagina(pagination: dict) -> list[dict]:
+        """Consulta solo las filas de la página pedida"""
+        nonlocal clave_cursores
+        pagina = pagination.get("page", 1)
+        por_pagina = pagination.get(
+            "rowsPerPage", FILAS_POR_PAGINA
+        )
+        orden = pagination.get("sortBy") or "fecha"
+        descendente = bool(pagination.get("descending"))
+
+        clave = (orden, descendente, por_pagina)
+        if clave_cursores != clave:
+            cursores.clear()
+            clave_cursores = clave
+
+        filas, _ = database.filtrar_pagos_paginado(
+            **filtros,
+            limite=por_pagina or None,
+            offset=(pagina - 1) * por_pagina,
+            orden=orden,
+            descendente=descendente,
+            despues_de=cursores.get(pagina - 1),
+            contar=False,
+        )
+        if filas and orden == "fecha":
+            cursores[pagina] = (
+                filas[-1]["fecha"],
+                filas[-1]["id"],
+            )
+        return filas
+
     # Tabla
-    if not pagos:
+    if not total:
         with ui.card().classes("w-full p-8 text-center"):
             ui.icon("search_off", size="4rem").classes(
                 "text-gray-400"
@@ -29,6 +92,19 @@ def tabla_pagos(refresh_callback=None):
             )
         return
 
+    pagination = {
+        "rowsPerPage": FILAS_POR_PAGINA,
+        "page": 1,
+        "sortBy": "fecha",
+        "descending": True,
+        "rowsNumber": total,
+    }
+    clave_cursores = ("fecha", True, FILAS_POR_PAGINA)
+    # total y la página se consultan por separado: la página puede
+    # venir vacía si otro cliente borró filas entre las dos consultas
+    if rows:
+        cursores[1] = (rows[-1]["fecha"], rows[-1]["id"])
+
     columns = [
         {
             "name": "id",
@@ -120,15 +196,13 @@ def tabla_pagos(refresh_callback=None):
         },
     ]
 
-    rows = [p for p in pagos]
-
     table = (
         ui.table(
             columns=columns,
             rows=rows,
             row_key="id",
             selection="single",
-            pagination={"rowsPerPage": 12},
+            pagination=pagination,
             title="Pagos",
         )
         .classes("w-full")
@@ -137,6 +211,14 @@ def tabla_pagos(refresh_callback=None):
         )
     )
 
+    def on_request(e):
+        """Pedido de página/orden de Quasar (modo servidor)"""
+        nueva = e.args["pagination"]
+        table.rows = cargar_pagina(nueva)
+        table.pagination = {**nueva, "rowsNumber": total}
+
+    table.on("request", on_request)
+
     # Función para mostrar el detalle del pago usando componente modularizado
     def mostrar_detalle_pago():
         """Muestra un dialog con los detalles del pago seleccionado"""
@@ -172,26 +254,74 @@ def tabla_pagos(refresh_callback=None):
 
 
 @ui.page("/pagos")
-def page_pagos():
+async def page_pagos():
     """Página de pagos"""
+    # app.storage.tab solo está disponible con el cliente conectado
+    await ui.context.client.connected()
+
+    database = get_database()
+    # Filtros y resultados propios de esta pestaña
+    filtros = FiltrosStatePagos.desde_dict(
+        app.storage.tab.get("filtros_pagos")
+    )
+    cache = cache_de_pestana(
+        ui.context.client.tab_id, "pagos"
+    )
+
     # Aplicar decorador ui.refreshable en scope local
     tabla_pagos_refreshable = ui.refreshable(tabla_pagos)
 
-    def aplicar_filtros():
-        """Aplica los filtros y actualiza la tabla"""
-        tabla_pagos_refreshable.refresh()
-
     def refresh_tabla():
         """Callback para refrescar la tabla desde dentro de tabla_pagos"""
-        tabla_pagos_refreshable.refresh()
+        # resultado=None: volver a consultar en lugar de reusar el
+        # último resultado de la búsqueda diferida
+        tabla_pagos_refreshable.refresh(resultado=None)
+
+    def consultar(filtros_dict: dict, clave: str) -> tuple:
+        """Consulta anotando la versión de datos con la que se hizo"""
+        version = database.version_datos()
+        return clave, version, consultar_pagos(filtros_dict)
+
+    def mostrar_resultado(salida: tuple):
+        """Cachea y muestra el resultado de la última búsqueda"""
+        clave, version, resultado = salida
+        cache.guardar(clave, version, resultado)
+        tabla_pagos_refreshable.refresh(
+            refresh_callback=refresh_tabla, resultado=resultado
+        )
+
+    busqueda = BusquedaDiferida(
+        consultar=consultar, mostrar=mostrar_resultado
+    )
+
+    def aplicar_filtros(inmediato: bool = True):
+        """Guarda los filtros de la pestaña y actualiza la tabla"""
+        app.storage.tab["filtros_pagos"] = filtros.a_dict()
+        clave = filtros.clave()
+        resultado = cache.obtener(clave, database.version_datos())
+        if resultado is not None:
+            busqueda.cancelar()
+            tabla_pagos_refreshable.refresh(
+                refresh_callback=refresh_tabla,
+                resultado=resultado,
+            )
+            return
+        busqueda.disparar(
+            filtros.a_dict(), clave, inmediato=inmediato
+        )
+
+    def buscar_texto(texto: str):
+        """Actualiza el texto de búsqueda con debounce"""
+        filtros.texto_busqueda = texto
+        aplicar_filtros(inmediato=False)
 
     def limpiar_filtros():
         """Limpia todos los filtros"""
-        filtros_pagos.texto_busqueda = ""
-        filtros_pagos.pagador = "all"
-        filtros_pagos.destinatario = "all"
-        filtros_pagos.formapago = "all"
-        filtros_pagos.es_nota_credito_no_pasada = False
+        filtros.texto_busqueda = ""
+        filtros.pagador = "all"
+        filtros.destinatario = "all"
+        filtros.formapago = "all"
+        filtros.es_nota_credito_no_pasada = False
 
         # Actualizar UI
         pagador_select.value = "all"
@@ -199,19 +329,19 @@ def page_pagos():
         formapago_select.value = "all"
         busqueda_input.value = ""
 
-        tabla_pagos_refreshable.refresh()
+        aplicar_filtros()
         ui.notify("Filtros limpiados", type="info")
 
     def exportar_seleccionados():
         """Exporta pagos seleccionados"""
-        if not filtros_pagos.pagos_seleccionados:
+        if not filtros.pagos_seleccionados:
             ui.notify(
                 "No hay pagos seleccionados", type="warning"
             )
             return
 
         ui.notify(
-            f"Exportando {len(filtros_pagos.pagos_seleccionados)} pagos...",
+            f"Exportando {len(filtros.pagos_seleccionados)} pagos...",
             type="positive",
         )
 
@@ -236,19 +366,17 @@ def page_pagos():
 
                 # Pagadores
                 with ui.column().classes("w-48"):
-                    global pagador_select
-                    database = get_database()
                     pagadores = [
                         "all"
                     ] + database.obtener_agentes()
                     pagador_select = ui.select(
                         options=pagadores,
-                        value="all",
+                        value=filtros.pagador or "all",
                         label="Pagador",
                     ).classes("w-full")
 
                     def on_pagador_change(e):
-                        filtros_pagos.pagador = e.sender.value
+                        filtros.pagador = e.sender.value
                         aplicar_filtros()
 
                     pagador_select.on(
@@ -257,20 +385,17 @@ def page_pagos():
 
                 # Destinatarios
                 with ui.column().classes("w-48"):
-                    global destinatario_select
                     destinatarios = [
                         "all"
                     ] + database.obtener_agentes()
                     destinatario_select = ui.select(
                         options=destinatarios,
-                        value="all",
+                        value=filtros.destinatario or "all",
                         label="Destinatario",
                     ).classes("w-full")
 
                     def on_destinatario_change(e):
-                        filtros_pagos.destinatario = (
-                            e.sender.value
-                        )
+                        filtros.destinatario = e.sender.value
                         aplicar_filtros()
 
                     destinatario_select.on(
@@ -280,18 +405,17 @@ def page_pagos():
 
                 # Formas de pago
                 with ui.column().classes("w-48"):
-                    global formapago_select
                     formaspago = [
                         "all"
                     ] + database.obtener_formaspago()
                     formapago_select = ui.select(
                         options=formaspago,
-                        value="all",
+                        value=filtros.formapago or "all",
                         label="Forma de Pago",
                     ).classes("w-full")
 
                     def on_formapago_change(e):
-                        filtros_pagos.formapago = e.sender.value
+                        filtros.formapago = e.sender.value
                         aplicar_filtros()
 
                     formapago_select.on(
@@ -306,29 +430,24 @@ def page_pagos():
 
                 # Búsqueda por texto
                 with ui.column().classes("w-120"):
-                    global busqueda_input
                     busqueda_input = (
                         ui.input(
                             "Búsqueda",
+                            value=filtros.texto_busqueda,
                             placeholder="Buscar por texto...",
                         )
                         .classes("w-full")
                         .on_value_change(
-                            lambda e: setattr(
-                                filtros_pagos,
-                                "texto_busqueda",
-                                e.value,
-                            )
-                            or aplicar_filtros()
+                            lambda e: buscar_texto(e.value)
                         )
                     )
 
-                global es_nota_credito_no_pasada_check
-                es_nota_credito_no_pasada_check = ui.checkbox(
-                    "Es Nota de Crédito NO pasada", value=False
+                ui.checkbox(
+                    "Es Nota de Crédito NO pasada",
+                    value=filtros.es_nota_credito_no_pasada,
                 ).on_value_change(
                     lambda e: setattr(
-                        filtros_pagos,
+                        filtros,
                         "es_nota_credito_no_pasada",
                         e.value,
                     )
@@ -352,7 +471,13 @@ def page_pagos():
         # ====================
         # TABLA
         # ====================
-        tabla_pagos_refreshable(refresh_callback=refresh_tabla)
+        tabla_pagos_refreshable(
+            filtros_estado=filtros,
+            refresh_callback=refresh_tabla,
+            resultado=cache.obtener(
+                filtros.clave(), database.version_datos()
+            ),
+        )
 
     with ui.footer().classes("bg-transparent"):
         ui.label(
@@ -1,89 +1,96 @@
 """Página de reportes"""
 
-from nicegui import ui
+from datetime import date
+import functools
+
+from nicegui import run, ui
 import polars as pl
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from src.components.navbar import crear_navbar
-from src.db.database import SQLiteDB
-
-
-def obtener_datos_pagos():
-    """Obtiene los datos de pagos agrupados por fecha y forma de pago"""
-    db = SQLiteDB()
-
-    query = """
-        SELECT
-            p.fecha,
-            fp.formapago AS forma_pago,
-            sum(p.importe) AS importe,
-            count(*) AS pagos
-        FROM
-            pagos p
-        LEFT JOIN gestiones g ON
-            g.id = p.gestion_id
-        LEFT JOIN formaspago fp ON
-            fp.id = p.formapago_id
-        WHERE
-            g.activa = 1
-        GROUP BY
-            p.fecha,
-            fp.formapago;
-        """
-
-    # Ejecutar query y obtener resultados
-    db.cursor.execute(query)
-    rows = db.cursor.fetchall()
-
-    # Convertir a lista de diccionarios
-    data = [dict(row) for row in rows]
-
-    # Crear DataFrame de Polars
-    df = pl.DataFrame(data)
-
-    # Convertir fecha a tipo datetime y agregar columnas de año y mes
-    df = df.with_columns(
-        [
-            pl.col("fecha").str.to_date().alias("fecha_dt"),
-        ]
-    ).with_columns(
-        [
-            pl.col("fecha_dt").dt.year().alias("anio"),
-            pl.col("fecha_dt").dt.month().alias("mes"),
-        ]
+from src.db.connection import get_database
+from src.db.reportes import ServicioReportes
+
+
+def calendario_mensual(periodos: pl.Series) -> pl.Series:
+    """Todos los meses ('YYYY-MM') entre el primer y el último período"""
+    primero, ultimo = periodos.min(), periodos.max()
+    return (
+        pl.date_range(
+            date(int(primero[:4]), int(primero[5:7]), 1),
+            date(int(ultimo[:4]), int(ultimo[5:7]), 1),
+            interval="1mo",
+            eager=True,
+        )
+        .dt.strftime("%Y-%m")
+        .alias("periodo")
     )
 
-    # Agrupar por año, mes y forma de pago
-    df_resumido = (
-        df.group_by(["anio", "mes", "forma_pago"])
-        .agg(
-            [
-                pl.col("importe").sum().alias("importe_total"),
-                pl.col("pagos").sum().alias("cantidad_pagos"),
-            ]
+
+def pivot_mensual(
+    df: pl.DataFrame, clave: str, valores: list[str]
+) -> tuple[list[str], list[str], dict[str, pl.DataFrame]]:
+    """
+    Pivotea df a período × clave en una sola pasada.
+
+    Los períodos se alinean a un calendario mensual continuo (los meses
+    sin datos quedan en 0) y las claves vacías se descartan. Las trazas
+    toman cada columna con to_list(): to_numpy() necesita NumPy, que no
+    es dependencia del proyecto, y la figura se serializa a JSON igual.
+
+    Returns:
+        tuple: (periodos, claves ordenadas, {valor: tabla período ×
+            clave con una columna por clave})
+    """
+    df = df.filter(
+        pl.col(clave).is_not_null() & (pl.col(clave) != "")
+    )
+    if len(df) == 0:
+        return [], [], {v: pl.DataFrame() for v in valores}
+
+    claves = df[clave].unique().sort().to_list()
+    calendario = calendario_mensual(df["periodo"])
+    tabla = (
+        calendario.to_frame()
+        .join(
+            df.pivot(
+                on=clave,
+                index="periodo",
+                values=valores,
+                aggregate_function="sum",
+                separator="|",
+            ),
+            on="periodo",
+            how="left",
         )
-        .sort(["anio", "mes"])
+        .fill_null(0)
     )
 
-    return df_resumido
+    def columna(valor: str, clave: str) -> str:
+        # Con un solo valor, pivot nombra las columnas solo por clave
+        return clave if len(valores) == 1 else f"{valor}|{clave}"
+
+    return (
+        calendario.to_list(),
+        claves,
+        {
+            valor: tabla.select(
+                [
+                    pl.col(columna(valor, c)).alias(c)
+                    for c in claves
+                ]
+            )
+            for valor in valores
+        },
+    )
 
 
 def crear_grafico_pagos_por_mes(df: pl.DataFrame):
     """Crea un gráfico de barras con los pagos por mes y forma de pago"""
-    # Crear columna de período (Año-Mes)
-    df = df.with_columns(
-        [
-            (
-                pl.col("anio").cast(pl.Utf8)
-                + "-"
-                + pl.col("mes").cast(pl.Utf8).str.zfill(2)
-            ).alias("periodo")
-        ]
+    periodos, formas_pago, tablas = pivot_mensual(
+        df, "forma_pago", ["importe_total", "cantidad_pagos"]
     )
 
-    # Obtener formas de pago únicas
-    formas_pago = df["forma_pago"].unique().sort().to_list()
-
     fig = make_subplots(
         rows=2,
         cols=1,
@@ -96,13 +103,10 @@ def crear_grafico_pagos_por_mes(df: pl.DataFrame):
 
     # Gráfico 1: Importe por forma de pago
     for forma in formas_pago:
-        df_forma = df.filter(pl.col("forma_pago") == forma).sort(
-            "periodo"
-        )
         fig.add_trace(
             go.Bar(
-                x=df_forma["periodo"].to_list(),
-                y=df_forma["importe_total"].to_list(),
+                x=periodos,
+                y=tablas["importe_total"][forma].to_list(),
                 name=forma,
                 legendgroup=forma,
             ),
@@ -112,13 +116,10 @@ def crear_grafico_pagos_por_mes(df: pl.DataFrame):
 
     # Gráfico 2: Cantidad de pagos por forma de pago
     for forma in formas_pago:
-        df_forma = df.filter(pl.col("forma_pago") == forma).sort(
-            "periodo"
-        )
         fig.add_trace(
             go.Bar(
-                x=df_forma["periodo"].to_list(),
-                y=df_forma["cantidad_pagos"].to_list(),
+                x=periodos,
+                y=tablas["cantidad_pagos"][forma].to_list(),
                 name=forma,
                 legendgroup=forma,
                 showlegend=False,
@@ -145,107 +146,8 @@ def crear_grafico_pagos_por_mes(df: pl.DataFrame):
     return fig
 
 
-def obtener_datos_pagos_agentes():
-    """Obtiene los datos de pagos agrupados por fecha, pagador y destinatario"""
-    db = SQLiteDB()
-
-    query = """
-        SELECT
-            p.fecha,
-            pag.agente AS pagador,
-            des.agente AS destinatario,
-            sum(p.importe) AS importe,
-            count(*) AS pagos
-        FROM
-            pagos p
-        LEFT JOIN gestiones g ON
-            g.id = p.gestion_id
-        LEFT JOIN agentes pag ON
-            pag.id = p.pagador_id 
-        LEFT JOIN agentes des ON
-            des.id = p.destinatario_id  
-        WHERE
-            g.activa = 1
-        GROUP BY
-            p.fecha,
-            pag.agente,
-            des.agente;
-        """
-
-    # Ejecutar query y obtener resultados
-    db.cursor.execute(query)
-    rows = db.cursor.fetchall()
-
-    # Convertir a lista de diccionarios
-    data = [dict(row) for row in rows]
-
-    # Crear DataFrame de Polars
-    df = pl.DataFrame(data)
-
-    # Convertir fecha a tipo datetime y agregar columnas de año y mes
-    df = df.with_columns(
-        [
-            pl.col("fecha").str.to_date().alias("fecha_dt"),
-        ]
-    ).with_columns(
-        [
-            pl.col("fecha_dt").dt.year().alias("anio"),
-            pl.col("fecha_dt").dt.month().alias("mes"),
-        ]
-    )
-
-    # Agrupar por año, mes, pagador y destinatario
-    df_resumido = (
-        df.group_by(["anio", "mes", "pagador", "destinatario"])
-        .agg(
-            [
-                pl.col("importe").sum().alias("importe_total"),
-                pl.col("pagos").sum().alias("cantidad_pagos"),
-            ]
-        )
-        .sort(["anio", "mes"])
-    )
-
-    return df_resumido
-
-
 def crear_grafico_pagos_agentes(df: pl.DataFrame):
     """Crea gráficos de pagos por pagador y destinatario"""
-    # Crear columna de período (Año-Mes)
-    df = df.with_columns(
-        [
-            (
-                pl.col("anio").cast(pl.Utf8)
-                + "-"
-                + pl.col("mes").cast(pl.Utf8).str.zfill(2)
-            ).alias("periodo")
-        ]
-    )
-
-    # Agrupar por período y pagador
-    df_pagador = (
-        df.group_by(["periodo", "pagador"])
-        .agg(
-            [
-                pl.col("importe_total").sum().alias("importe"),
-                pl.col("cantidad_pagos").sum().alias("pagos"),
-            ]
-        )
-        .sort("periodo")
-    )
-
-    # Agrupar por período y destinatario
-    df_destinatario = (
-        df.group_by(["periodo", "destinatario"])
-        .agg(
-            [
-                pl.col("importe_total").sum().alias("importe"),
-                pl.col("cantidad_pagos").sum().alias("pagos"),
-            ]
-        )
-        .sort("periodo")
-    )
-
     fig = make_subplots(
         rows=2,
         cols=2,
@@ -259,80 +161,33 @@ def crear_grafico_pagos_agentes(df: pl.DataFrame):
         horizontal_spacing=0.1,
     )
 
-    # Gráfico 1: Importe por pagador
-    pagadores = df_pagador["pagador"].unique().sort().to_list()
-    for pagador in pagadores:
-        if pagador:  # Evitar valores nulos
-            df_pag = df_pagador.filter(
-                pl.col("pagador") == pagador
-            ).sort("periodo")
-            fig.add_trace(
-                go.Bar(
-                    x=df_pag["periodo"].to_list(),
-                    y=df_pag["importe"].to_list(),
-                    name=pagador,
-                    legendgroup="pagador",
-                ),
-                row=1,
-                col=1,
-            )
-
-    # Gráfico 2: Importe por destinatario
-    destinatarios = (
-        df_destinatario["destinatario"].unique().sort().to_list()
-    )
-    for destinatario in destinatarios:
-        if destinatario:  # Evitar valores nulos
-            df_dest = df_destinatario.filter(
-                pl.col("destinatario") == destinatario
-            ).sort("periodo")
-            fig.add_trace(
-                go.Bar(
-                    x=df_dest["periodo"].to_list(),
-                    y=df_dest["importe"].to_list(),
-                    name=destinatario,
-                    legendgroup="destinatario",
-                    showlegend=True,
-                ),
-                row=1,
-                col=2,
-            )
-
-    # Gráfico 3: Cantidad por pagador
-    for pagador in pagadores:
-        if pagador:
-            df_pag = df_pagador.filter(
-                pl.col("pagador") == pagador
-            ).sort("periodo")
-            fig.add_trace(
-                go.Bar(
-                    x=df_pag["periodo"].to_list(),
-                    y=df_pag["pagos"].to_list(),
-                    name=pagador,
-                    legendgroup="pagador",
-                    showlegend=False,
-                ),
-                row=2,
-                col=1,
-            )
+    # Un pivot por dimensión; columna 1: pagadores, 2: destinatarios
+    pivots = {
+        clave: pivot_mensual(
+            df, clave, ["importe_total", "cantidad_pagos"]
+        )
+        for clave in ("pagador", "destinatario")
+    }
 
-    # Gráfico 4: Cantidad por destinatario
-    for destinatario in destinatarios:
-        if destinatario:
-            df_dest = df_destinatario.filter(
-                pl.col("destinatario") == destinatario
-            ).sort("periodo")
-            fig.add_trace(
-                go.Bar(
-                    x=df_dest["periodo"].to_list(),
-                    y=df_dest["pagos"].to_list(),
-                    name=destinatario,
-                    legendgroup="destinatario",
-                    showlegend=False,
-                ),
-                row=2,
-                col=2,
-            )
+    # Fila 1: importe, fila 2: cantidad de pagos
+    for row, valor in (
+        (1, "importe_total"),
+        (2, "cantidad_pagos"),
+    ):
+        for col, clave in ((1, "pagador"), (2, "destinatario")):
+            periodos, agentes, tablas = pivots[clave]
+            for agente in agentes:
+                fig.add_trace(
+                    go.Bar(
+                        x=periodos,
+                        y=tablas[valor][agente].to_list(),
+                        name=agente,
+                        legendgroup=clave,
+                        showlegend=row == 1,
+                    ),
+                    row=row,
+                    col=col,
+                )
 
     # Actualizar layout
     fig.update_layout(
@@ -355,202 +210,55 @@ def crear_grafico_pagos_agentes(df: pl.DataFrame):
     return fig
 
 
-def obtener_datos_sm_comparacion():
-    """Obtiene datos de SM como pagador y como destinatario para comparación"""
-    db = SQLiteDB()
-
-    # Query para SM como pagador
-    query_pagador = """
-    SELECT
-        p.fecha,
-        pag.agente AS agente,
-        sum(p.importe) AS importe,
-        count(*) AS pagos
-    FROM
-        pagos p
-    LEFT JOIN gestiones g ON
-        g.id = p.gestion_id
-    LEFT JOIN agentes pag ON
-        pag.id = p.pagador_id 
-    WHERE
-        g.activa = 1
-        AND pag.agente = 'SM'
-    GROUP BY
-        p.fecha,
-        pag.agente;
-    """
-
-    # Query para SM como destinatario (corregido el JOIN)
-    query_destinatario = """
-    SELECT
-        p.fecha,
-        des.agente AS agente,
-        sum(p.importe) AS importe,
-        count(*) AS pagos
-    FROM
-        pagos p
-    LEFT JOIN gestiones g ON
-        g.id = p.gestion_id
-    LEFT JOIN agentes des ON
-        des.id = p.destinatario_id 
-    WHERE
-        g.activa = 1
-        AND des.agente = 'SM'
-    GROUP BY
-        p.fecha,
-        des.agente;
-    """
-
-    # Obtener datos como pagador
-    db.cursor.execute(query_pagador)
-    rows_pagador = db.cursor.fetchall()
-    data_pagador = [dict(row) for row in rows_pagador]
-
-    # Obtener datos como destinatario
-    db.cursor.execute(query_destinatario)
-    rows_destinatario = db.cursor.fetchall()
-    data_destinatario = [dict(row) for row in rows_destinatario]
-
-    # Crear DataFrames de Polars
-    df_pagador = (
-        pl.DataFrame(data_pagador)
-        if data_pagador
-        else pl.DataFrame()
-    )
-    df_destinatario = (
-        pl.DataFrame(data_destinatario)
-        if data_destinatario
-        else pl.DataFrame()
-    )
-
-    # Procesar DataFrame de pagador
-    if len(df_pagador) > 0:
-        df_pagador = df_pagador.with_columns(
-            [
-                pl.col("fecha").str.to_date().alias("fecha_dt"),
-            ]
-        ).with_columns(
-            [
-                pl.col("fecha_dt").dt.year().alias("anio"),
-                pl.col("fecha_dt").dt.month().alias("mes"),
-            ]
-        )
-
-        df_pagador = (
-            df_pagador.group_by(["anio", "mes"])
-            .agg(
-                [
-                    pl.col("importe")
-                    .sum()
-                    .alias("importe_total"),
-                    pl.col("pagos").sum().alias("cantidad_pagos"),
-                ]
-            )
-            .sort(["anio", "mes"])
-            .with_columns([pl.lit("Pagador").alias("tipo")])
-        )
-
-    # Procesar DataFrame de destinatario
-    if len(df_destinatario) > 0:
-        df_destinatario = df_destinatario.with_columns(
-            [
-                pl.col("fecha").str.to_date().alias("fecha_dt"),
-            ]
-        ).with_columns(
-            [
-                pl.col("fecha_dt").dt.year().alias("anio"),
-                pl.col("fecha_dt").dt.month().alias("mes"),
-            ]
-        )
-
-        df_destinatario = (
-            df_destinatario.group_by(["anio", "mes"])
-            .agg(
-                [
-                    pl.col("importe")
-                    .sum()
-                    .alias("importe_total"),
-                    pl.col("pagos").sum().alias("cantidad_pagos"),
-                ]
-            )
-            .sort(["anio", "mes"])
-            .with_columns([pl.lit("Destinatario").alias("tipo")])
-        )
-
-    return df_pagador, df_destinatario
-
-
-def crear_grafico_comparacion_sm(
-    df_pagador: pl.DataFrame, df_destinatario: pl.DataFrame
+def crear_grafico_comparacion_agente(
+    df_pagador: pl.DataFrame,
+    df_destinatario: pl.DataFrame,
+    agente: str,
 ):
-    """Crea gráficos comparativos de SM como pagador vs destinatario"""
-
-    # Crear columna de período para ambos DataFrames
-    if len(df_pagador) > 0:
-        df_pagador = df_pagador.with_columns(
-            [
-                (
-                    pl.col("anio").cast(pl.Utf8)
-                    + "-"
-                    + pl.col("mes").cast(pl.Utf8).str.zfill(2)
-                ).alias("periodo")
-            ]
-        )
-
-    if len(df_destinatario) > 0:
-        df_destinatario = df_destinatario.with_columns(
-            [
-                (
-                    pl.col("anio").cast(pl.Utf8)
-                    + "-"
-                    + pl.col("mes").cast(pl.Utf8).str.zfill(2)
-                ).alias("periodo")
-            ]
-        )
-
+    """Crea gráficos comparativos de un agente como pagador vs destinatario"""
     fig = make_subplots(
         rows=2,
         cols=1,
         subplot_titles=(
-            "Comparación Importe: SM como Pagador vs Destinatario",
-            "Comparación Cantidad Pagos: SM como Pagador vs Destinatario",
+            f"Comparación Importe: {agente} como Pagador vs Destinatario",
+            f"Comparación Cantidad Pagos: {agente} como Pagador vs Destinatario",
         ),
         vertical_spacing=0.15,
     )
 
-    # Gráfico 1: Importe - SM como Pagador
+    # Gráfico 1: Importe - Pagador
     if len(df_pagador) > 0:
         fig.add_trace(
             go.Bar(
                 x=df_pagador["periodo"].to_list(),
                 y=df_pagador["importe_total"].to_list(),
-                name="SM como Pagador",
+                name=f"{agente} como Pagador",
                 marker_color="#dc2656",
             ),
             row=1,
             col=1,
         )
 
-    # Gráfico 1: Importe - SM como Destinatario
+    # Gráfico 1: Importe - Destinatario
     if len(df_destinatario) > 0:
         fig.add_trace(
             go.Bar(
                 x=df_destinatario["periodo"].to_list(),
                 y=df_destinatario["importe_total"].to_list(),
-                name="SM como Destinatario",
+                name=f"{agente} como Destinatario",
                 marker_color="#ea580c",
             ),
             row=1,
             col=1,
         )
 
-    # Gráfico 2: Cantidad - SM como Pagador
+    # Gráfico 2: Cantidad - Pagador
     if len(df_pagador) > 0:
         fig.add_trace(
             go.Bar(
                 x=df_pagador["periodo"].to_list(),
                 y=df_pagador["cantidad_pagos"].to_list(),
-                name="SM como Pagador",
+                name=f"{agente} como Pagador",
                 marker_color="#dc2656",
                 showlegend=False,
             ),
@@ -558,13 +266,13 @@ def crear_grafico_comparacion_sm(
             col=1,
         )
 
-    # Gráfico 2: Cantidad - SM como Destinatario
+    # Gráfico 2: Cantidad - Destinatario
     if len(df_destinatario) > 0:
         fig.add_trace(
             go.Bar(
                 x=df_destinatario["periodo"].to_list(),
                 y=df_destinatario["cantidad_pagos"].to_list(),
-                name="SM como Destinatario",
+                name=f"{agente} como Destinatario",
                 marker_color="#ea580c",
                 showlegend=False,
             ),
@@ -578,7 +286,7 @@ def crear_grafico_comparacion_sm(
         showlegend=True,
         barmode="group",
         template="plotly_dark",
-        title_text="Análisis Comparativo: SM como Pagador vs Destinatario",
+        title_text=f"Análisis Comparativo: {agente} como Pagador vs Destinatario",
         title_x=0.5,
         title_font_size=20,
     )
@@ -590,80 +298,136 @@ def crear_grafico_comparacion_sm(
     return fig
 
 
-def obtener_estadisticas_generales():
-    """Obtiene estadísticas generales de gestiones y pagos"""
-    db = SQLiteDB()
+# Agente que muestra la comparación al abrir la página
+AGENTE_INICIAL = "SM"
 
-    # Contar gestiones activas
-    query_gestiones = """
-    SELECT COUNT(*) as total
-    FROM gestiones
-    WHERE activa = 1;
-    """
 
-    db.cursor.execute(query_gestiones)
-    gestiones_activas = db.cursor.fetchone()["total"]
-
-    # Obtener suma y cantidad de pagos por forma de pago
-    query_formas_pago = """
-    SELECT
-        fp.formapago AS forma_pago,
-        sum(p.importe) AS importe_total,
-        count(*) AS cantidad_pagos
-    FROM
-        pagos p
-    LEFT JOIN gestiones g ON
-        g.id = p.gestion_id
-    LEFT JOIN formaspago fp ON
-        fp.id = p.formapago_id
-    WHERE
-        g.activa = 1
-    GROUP BY
-        fp.formapago;
-    """
+def figura_formas_pago(reportes: ServicioReportes) -> dict | None:
+    """Figura del panel de formas de pago, o None si no hay datos"""
+    df_pagos = reportes.obtener_pagos_por_forma()
+    if len(df_pagos) == 0:
+        return None
+    # Figuras cacheadas como JSON de Plotly
+    return reportes.cacheado(
+        "grafico_pagos_por_mes",
+        lambda: crear_grafico_pagos_por_mes(
+            df_pagos
+        ).to_plotly_json(),
+    )
 
-    db.cursor.execute(query_formas_pago)
-    rows = db.cursor.fetchall()
-    formas_pago_stats = [dict(row) for row in rows]
 
-    # Calcular totales generales
-    total_pagos = sum(
-        fp["cantidad_pagos"] for fp in formas_pago_stats
+def figura_agentes(reportes: ServicioReportes) -> dict | None:
+    """Figura del panel de pagadores y destinatarios"""
+    df_agentes = reportes.obtener_pagos_por_agentes()
+    if len(df_agentes) == 0:
+        return None
+    return reportes.cacheado(
+        "grafico_pagos_agentes",
+        lambda: crear_grafico_pagos_agentes(
+            df_agentes
+        ).to_plotly_json(),
     )
-    total_importe = sum(
-        fp["importe_total"] for fp in formas_pago_stats
-    )
-
-    return {
-        "gestiones_activas": gestiones_activas,
-        "total_pagos": total_pagos,
-        "total_importe": total_importe,
-        "formas_pago": formas_pago_stats,
-    }
 
 
-@ui.page("/reportes")
-def page_reportes():
-    """Página de reportes"""
-    ui.colors(
-        primary="#dc2656", secondary="#ea580c", accent="#fbbf24"
+def figura_comparacion_agente(
+    reportes: ServicioReportes, agente: str = AGENTE_INICIAL
+) -> dict | None:
+    """Figura del panel de comparación para el agente dado"""
+    df_pagador, df_destinatario = (
+        reportes.obtener_comparacion_agente(agente)
+    )
+    if len(df_pagador) == 0 and len(df_destinatario) == 0:
+        return None
+    return reportes.cacheado(
+        "grafico_comparacion_agente",
+        lambda: crear_grafico_comparacion_agente(
+            df_pagador, df_destinatario, agente
+        ).to_plotly_json(),
+        agente,
     )
-    dark = ui.dark_mode(value=True)
-    crear_navbar(dark)
 
-    with ui.column().classes(
-        "w-full max-w-7xl mx-auto p-4 gap-4"
-    ):
-        ui.label("📊 Reportes y Estadísticas").classes("text-h4")
 
-        # Obtener datos
+# Paneles de la página, por nombre: (título de la pestaña, ícono,
+# figura, título del gráfico, mensaje sin datos)
+PANELES = {
+    "formas_pago": (
+        "📋 Formas de Pago",
+        "payment",
+        figura_formas_pago,
+        "Análisis de Pagos por Forma de Pago",
+        "No hay datos de formas de pago",
+    ),
+    "agentes": (
+        "👥 Pagadores y Destinatarios",
+        "people",
+        figura_agentes,
+        "Análisis de Pagos por Pagador y Destinatario",
+        "No hay datos de agentes",
+    ),
+    "comparacion_agente": (
+        "🔍 Comparación por Agente",
+        "compare_arrows",
+        figura_comparacion_agente,
+        "Comparación por Agente: Pagador vs Destinatario",
+        "No hay datos del agente",
+    ),
+}
+PANEL_INICIAL = "formas_pago"
+# Panel con selector de agente
+PANEL_AGENTE = "comparacion_agente"
+
+
+async def cargar_panel(
+    contenedor: ui.element,
+    reportes: ServicioReportes,
+    figura,
+    titulo: str,
+    sin_datos: str,
+):
+    """Calcula la figura de un panel en un hilo y la muestra"""
+    try:
+        fig = await run.io_bound(figura, reportes)
+    except Exception as e:
+        contenedor.clear()
+        with contenedor:
+            with ui.card().classes("w-full p-8 text-center"):
+                ui.icon("error", size="3rem").classes(
+                    "text-negative"
+                )
+                ui.label("Error al cargar el reporte").classes(
+                    "text-h6 q-mt-md"
+                )
+                ui.label(f"Error: {str(e)}").classes(
+                    "text-gray-500"
+                )
+        return
+
+    contenedor.clear()
+    with contenedor:
+        if fig is not None:
+            with ui.card().classes("w-full p-4"):
+                ui.label(titulo).classes("text-h5 mb-4")
+                ui.plotly(fig).classes("w-full")
+        else:
+            with ui.card().classes("w-full p-8 text-center"):
+                ui.icon("info", size="3rem").classes(
+                    "text-warning"
+                )
+                ui.label(sin_datos).classes("text-h6 q-mt-md")
+
+
+def contenido_reportes(
+    desde: str | None = None, hasta: str | None = None
+):
+    """Tarjetas y paneles de reportes para el rango de meses dado"""
+    with ui.column().classes("w-full gap-4"):
+        # Las tarjetas salen de la consulta más barata; los gráficos
+        # se cargan recién al abrir cada pestaña
         try:
-            stats = obtener_estadisticas_generales()
-            df_pagos = obtener_datos_pagos()
-            df_agentes = obtener_datos_pagos_agentes()
-            df_sm_pagador, df_sm_destinatario = (
-                obtener_datos_sm_comparacion()
+            reportes = ServicioReportes(
+                get_database(), desde=desde, hasta=hasta
             )
+            stats = reportes.obtener_estadisticas()
 
             # Tarjetas de estadísticas generales
             with ui.row().classes("w-full gap-4 mb-4"):
@@ -741,101 +505,80 @@ def page_reportes():
 
             # Crear tabs
             with ui.tabs().classes("w-full") as tabs:
-                tab1 = ui.tab("📋 Formas de Pago", icon="payment")
-                tab2 = ui.tab(
-                    "👥 Pagadores y Destinatarios", icon="people"
-                )
-                tab3 = ui.tab(
-                    "🔍 Comparación SM", icon="compare_arrows"
-                )
+                for nombre, panel in PANELES.items():
+                    etiqueta, icono = panel[:2]
+                    ui.tab(nombre, label=etiqueta, icon=icono)
 
-            with ui.tab_panels(tabs, value=tab1).classes(
+            agentes = get_database().obtener_agentes()
+            contenedores = {}
+            with ui.tab_panels(tabs, value=PANEL_INICIAL).classes(
                 "w-full"
             ):
-                # Panel 1: Formas de Pago
-                with ui.tab_panel(tab1):
-                    if len(df_pagos) > 0:
-                        # Crear y mostrar gráfico de formas de pago
-                        fig = crear_grafico_pagos_por_mes(
-                            df_pagos
-                        )
-
-                        with ui.card().classes("w-full p-4"):
-                            ui.label(
-                                "Análisis de Pagos por Forma de Pago"
-                            ).classes("text-h5 mb-4")
-                            ui.plotly(fig).classes("w-full")
-                    else:
-                        with ui.card().classes(
-                            "w-full p-8 text-center"
-                        ):
-                            ui.icon("info", size="3rem").classes(
-                                "text-warning"
-                            )
-                            ui.label(
-                                "No hay datos de formas de pago"
-                            ).classes("text-h6 q-mt-md")
-
-                # Panel 2: Pagadores y Destinatarios
-                with ui.tab_panel(tab2):
-                    if len(df_agentes) > 0:
-                        # Crear y mostrar gráfico de agentes
-                        fig_agentes = crear_grafico_pagos_agentes(
-                            df_agentes
-                        )
-
-                        with ui.card().classes("w-full p-4"):
-                            ui.label(
-                                "Análisis de Pagos por Pagador y Destinatario"
-                            ).classes("text-h5 mb-4")
-                            ui.plotly(fig_agentes).classes(
-                                "w-full"
-                            )
-                    else:
-                        with ui.card().classes(
-                            "w-full p-8 text-center"
-                        ):
-                            ui.icon("info", size="3rem").classes(
-                                "text-warning"
-                            )
-                            ui.label(
-                                "No hay datos de agentes"
-                            ).classes("text-h6 q-mt-md")
-
-                # Panel 3: Comparación SM
-                with ui.tab_panel(tab3):
-                    if (
-                        len(df_sm_pagador) > 0
-                        or len(df_sm_destinatario) > 0
-                    ):
-                        # Crear y mostrar gráfico comparativo
-                        fig_sm = crear_grafico_comparacion_sm(
-                            df_sm_pagador, df_sm_destinatario
-                        )
-
-                        with ui.card().classes("w-full p-4"):
-                            ui.label(
-                                "Comparación SM: Pagador vs Destinatario"
-                            ).classes("text-h5 mb-4")
-                            ui.plotly(fig_sm).classes("w-full")
-                    else:
-                        with ui.card().classes(
-                            "w-full p-8 text-center"
-                        ):
-                            ui.icon("info", size="3rem").classes(
-                                "text-warning"
-                            )
-                            ui.label(
-                                "No hay datos de SM"
-                            ).classes("text-h6 q-mt-md")
+                for nombre in PANELES:
+                    with ui.tab_panel(nombre):
+                        if nombre == PANEL_AGENTE:
+                            select_agente = ui.select(
+                                agentes,
+                                label="Agente",
+                                value=(
+                                    AGENTE_INICIAL
+                                    if AGENTE_INICIAL in agentes
+                                    else next(iter(agentes), None)
+                                ),
+                                on_change=lambda: activar(
+                                    PANEL_AGENTE, recargar=True
+                                ),
+                            ).classes("w-56")
+                        with ui.column().classes(
+                            "w-full items-center"
+                        ) as contenedores[nombre]:
+                            ui.spinner(size="lg")
+
+            cargados = set()
+
+            async def activar(
+                nombre: str, recargar: bool = False
+            ):
+                """Carga el panel la primera vez que se muestra"""
+                if nombre in cargados and not recargar:
+                    return
+                cargados.add(nombre)
+                _, _, figura, titulo, sin_datos = PANELES[nombre]
+                if recargar:
+                    contenedores[nombre].clear()
+                    with contenedores[nombre]:
+                        ui.spinner(size="lg")
+                if nombre != PANEL_AGENTE:
+                    await cargar_panel(
+                        contenedores[nombre],
+                        reportes,
+                        figura,
+                        titulo,
+                        sin_datos,
+                    )
+                    return
+
+                # Un agente por vez: el selector queda deshabilitado
+                # hasta que llega su figura
+                select_agente.disable()
+                try:
+                    await cargar_panel(
+                        contenedores[nombre],
+                        reportes,
+                        functools.partial(
+                            figura, agente=select_agente.value
+                        ),
+                        titulo,
+                        sin_datos,
+                    )
+                finally:
+                    select_agente.enable()
+
+            tabs.on_value_change(lambda e: activar(e.value))
+            ui.timer(0, lambda: activar(PANEL_INICIAL), once=True)
 
             # Mostrar mensaje si no hay datos en ningún reporte
-            if (
-                len(df_pagos) == 0
-                and len(df_agentes) == 0
-                and len(df_sm_pagador) == 0
-                and len(df_sm_destinatario) == 0
-            ):
+            if stats["total_pagos"] == 0:
                 with ui.card().classes(
                     "w-full p-8 text-center mt-4"
                 ):
@@ -847,6 +590,8 @@ def page_reportes():
                     )
                     ui.label(
                         "Aún no hay pagos registrados en gestiones activas"
+                        if not (desde or hasta)
+                        else "No hay pagos de gestiones activas en el rango elegido"
                     ).classes("text-gray-500")
 
         except Exception as e:
@@ -860,3 +605,96 @@ def page_reportes():
                 ui.label(f"Error: {str(e)}").classes(
                     "text-gray-500"
                 )
+
+
+def selector_rango(
+    meses: list[str], facturas: dict[str, int], cambiar
+):
+    """
+    Selectores de mes inicial y final del rango de los reportes.
+
+    Los meses con factura muestran su período; cambiar recibe desde y
+    hasta, con None para un límite abierto.
+    """
+    opciones = {
+        mes: (
+            f"{mes} · Factura {facturas[mes]}"
+            if mes in facturas
+            else mes
+        )
+        for mes in meses
+    }
+
+    def aplicar():
+        desde, hasta = select_desde.value, select_hasta.value
+        if desde and hasta and desde > hasta:
+            desde, hasta = hasta, desde
+        cambiar(desde=desde, hasta=hasta)
+
+    def anio_actual():
+        # Desde el primer mes con datos del año en curso
+        anio = str(date.today().year)
+        del_anio = [m for m in meses if m.startswith(anio)]
+        if not del_anio:
+            ui.notify(f"No hay datos de {anio}", type="warning")
+            return
+        select_desde.set_value(del_anio[0])
+        select_hasta.set_value(None)
+
+    def todo():
+        select_desde.set_value(None)
+        select_hasta.set_value(None)
+
+    with ui.row().classes("w-full items-center gap-4"):
+        select_desde = ui.select(
+            opciones,
+            label="Desde",
+            clearable=True,
+            on_change=aplicar,
+        ).classes("w-56")
+        select_hasta = ui.select(
+            opciones,
+            label="Hasta",
+            clearable=True,
+            on_change=aplicar,
+        ).classes("w-56")
+        ui.button(
+            "Año actual", icon="today", on_click=anio_actual
+        ).props("flat")
+        ui.button("Todo", icon="history", on_click=todo).props(
+            "flat"
+        )
+
+
+@ui.page("/reportes")
+def page_reportes():
+    """Página de reportes"""
+    ui.colors(
+        primary="#dc2656", secondary="#ea580c", accent="#fbbf24"
+    )
+    dark = ui.dark_mode(value=True)
+    crear_navbar(dark)
+
+    # Aplicar decorador ui.refreshable en scope local
+    contenido_refreshable = ui.refreshable(contenido_reportes)
+
+    with ui.column().classes(
+        "w-full max-w-7xl mx-auto p-4 gap-4"
+    ):
+        ui.label("📊 Reportes y Estadísticas").classes("text-h4")
+
+        try:
+            meses, facturas = ServicioReportes(
+                get_database()
+            ).obtener_meses()
+            selector_rango(
+                meses,
+                facturas,
+                contenido_refreshable.refresh,
+            )
+        except Exception as e:
+            ui.label(
+                f"Error al cargar los meses: {str(e)}"
+            ).classes("text-negative")
+
+        contenido_refreshable()
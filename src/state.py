@@ -1,9 +1,53 @@
-"""Estado global de la aplicación"""
+"""
+Estado de la aplicación por cliente.
 
+Los filtros ya no son instancias globales del módulo: cada pestaña del
+navegador guarda los suyos en ``app.storage.tab`` en forma de dict
+(``a_dict``/``desde_dict``), de modo que dos usuarios no se pisan los
+filtros entre sí.
 
-class FiltrosStateGestiones:
+Los resultados cacheados no son serializables a JSON, así que no van
+en ``app.storage.tab`` (que puede vivir en Redis): quedan en memoria
+del proceso, en un dict por ``tab_id`` de la pestaña.
+"""
+
+import json
+from collections import OrderedDict
+
+
+class _FiltrosState:
+    """Serialización común de los estados de filtros"""
+
+    # Atributos que no forman parte de los filtros de la consulta
+    _no_filtros: tuple = ()
+
+    def a_dict(self) -> dict:
+        """Filtros como dict, listo para la consulta y para storage"""
+        return {
+            nombre: valor
+            for nombre, valor in vars(self).items()
+            if nombre not in self._no_filtros
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict | None):
+        """Reconstruye el estado desde un dict guardado"""
+        estado = cls()
+        for nombre, valor in (datos or {}).items():
+            if hasattr(estado, nombre):
+                setattr(estado, nombre, valor)
+        return estado
+
+    def clave(self) -> str:
+        """Clave estable de los filtros, para cachear resultados"""
+        return json.dumps(self.a_dict(), sort_keys=True)
+
+
+class FiltrosStateGestiones(_FiltrosState):
     """Estado de los filtros de gestiones"""
 
+    _no_filtros = ("gestiones_seleccionados",)
+
     def __init__(self):
         self.texto_busqueda: str = ""
         self.tipo: str = "all"
@@ -20,11 +64,7 @@ class FiltrosStateGestiones:
         self.gestiones_seleccionados: list = []
 
 
-# Instancia global de filtros
-filtros_gestiones = FiltrosStateGestiones()
-
-
-class FiltrosStatePagos:
+class FiltrosStatePagos(_FiltrosState):
     """Estado de los filtros de pagos"""
 
     def __init__(self):
@@ -35,4 +75,50 @@ class FiltrosStatePagos:
         self.es_nota_credito_no_pasada: bool = False
 
 
-filtros_pagos = FiltrosStatePagos()
+class CacheResultados:
+    """
+    Últimos resultados de consulta de un cliente.
+
+    Cada entrada recuerda la versión de datos con la que se calculó;
+    si hubo escrituras desde entonces la entrada se descarta.
+    """
+
+    def __init__(self, max_entradas: int = 16):
+        self.max_entradas = max_entradas
+        self._entradas: OrderedDict = OrderedDict()
+
+    def obtener(self, clave: str, version: int):
+        """Resultado cacheado para la clave, o None si no es vigente"""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if entrada[0] != version:
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada[1]
+
+    def guardar(self, clave: str, version: int, resultado):
+        """Guarda un resultado calculado con la versión dada"""
+        self._entradas[clave] = (version, resultado)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+
+# Pestañas con resultados cacheados; las menos usadas se descartan
+MAX_PESTANAS = 64
+
+_caches_por_pestana: OrderedDict = OrderedDict()
+
+
+def cache_de_pestana(tab_id: str, nombre: str) -> CacheResultados:
+    """CacheResultados `nombre` de la pestaña, creándolo si hace falta"""
+    clave = (tab_id, nombre)
+    cache = _caches_por_pestana.get(clave)
+    if cache is None:
+        cache = _caches_por_pestana[clave] = CacheResultados()
+    _caches_por_pestana.move_to_end(clave)
+    while len(_caches_por_pestana) > MAX_PESTANAS:
+        _caches_por_pestana.popitem(last=False)
+    return cache
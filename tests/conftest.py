@@ -0,0 +1,122 @@
+import os
+import sys
+from pathlib import Path
+
+import openpyxl
+import polars as pl
+import pytest
+
+from src.commons import SQLITE_PRAGMAS
+from src.db import connection
+from src.db.database import SQLiteDB
+from src.db.pool import ConnectionPool
+from src.db.reportes import cache_reportes
+
+# Tests de páginas con el usuario simulado de NiceGUI (fixture user);
+# la aplicación se levanta desde main.py
+pytest_plugins = ["nicegui.testing.user_plugin"]
+
+# Las rutas de src/commons.py (sql/, gestiones.db) son relativas a la
+# raíz del repositorio
+RAIZ = Path(__file__).resolve().parent.parent
+os.chdir(RAIZ)
+
+
+@pytest.fixture
+def database(tmp_path) -> SQLiteDB:
+    """Base vacía en un temporal, con el esquema y las migraciones"""
+    db = SQLiteDB(
+        ConnectionPool(tmp_path / "gestiones.db", SQLITE_PRAGMAS)
+    )
+    db.crear_esquema()
+    db.aplicar_migraciones()
+    yield db
+    db.pool.cerrar()
+
+
+@pytest.fixture
+def database_app(database, monkeypatch) -> SQLiteDB:
+    """La base temporal como la de la aplicación (get_database)"""
+    monkeypatch.setattr(connection, "_db_instance", database)
+    cache_reportes.limpiar()
+    yield database
+    cache_reportes.limpiar()
+
+
+@pytest.fixture
+def user(database_app, user):
+    """
+    Usuario simulado sobre la base temporal.
+
+    NiceGUI borra las rutas entre tests y main.py las registra al
+    importar src.pages, así que el usuario simulado (que ejecuta
+    main.py) necesita esos módulos sin importar.
+    """
+    return user
+
+
+@pytest.fixture(autouse=True)
+def _paginas_sin_importar(request):
+    if "user" in request.fixturenames:
+        for nombre in list(sys.modules):
+            if nombre == "src.pages" or nombre.startswith(
+                "src.pages."
+            ):
+                del sys.modules[nombre]
+
+
+@pytest.fixture
+def crear_gestion(database):
+    """Función que crea una gestión activa y retorna su id"""
+
+    def crear(ngestion: int, **datos) -> int:
+        exito, mensaje = database.crear_gestion(
+            **{
+                "ngestion": ngestion,
+                "fecha": "2024-05-01",
+                "cliente": f"CLIENTE {ngestion}",
+                "dominio": "",
+                "poliza": f"P{ngestion}",
+                "tipo": "VEHICULAR",
+                "motivo": "",
+                "ncaso": 0,
+                "usuariocarga": "",
+                "usuariorespuesta": "",
+                "estado": "",
+                "itr": 0,
+                "totalfactura": 0.0,
+                "terminado": 0,
+                "obs": "",
+                "activa": 1,
+                **datos,
+            }
+        )
+        assert exito, mensaje
+        return database.cursor.execute(
+            "SELECT id FROM gestiones WHERE ngestion = ?",
+            (ngestion,),
+        ).fetchone()[0]
+
+    return crear
+
+
+@pytest.fixture
+def guardar_archivo(tmp_path):
+    """Función que guarda un DataFrame como Excel, CSV o Parquet"""
+
+    def guardar(df: pl.DataFrame, extension: str) -> Path:
+        ruta = tmp_path / f"gestiones{extension}"
+        if extension == ".csv":
+            df.write_csv(ruta)
+        elif extension == ".parquet":
+            df.write_parquet(ruta)
+        else:
+            libro = openpyxl.Workbook()
+            hoja = libro.active
+            hoja.append(df.columns)
+            for fila in df.iter_rows():
+                hoja.append(list(fila))
+            libro.save(ruta)
+        return ruta
+
+    return guardar
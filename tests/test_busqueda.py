@@ -0,0 +1,85 @@
+"""Búsqueda de texto en gestiones y pagos (FTS y LIKE)"""
+
+import pytest
+
+FILTROS = {
+    "tipo": "all",
+    "terminado": False,
+    "no_terminado": False,
+    "activa": False,
+    "no_activa": False,
+    "con_pagos": False,
+    "sin_pagos": False,
+    "con_nota": False,
+    "sin_nota": False,
+    "con_nota_pasada": False,
+}
+
+
+@pytest.fixture
+def con_gestiones(database):
+    for ngestion, cliente in enumerate(
+        ["MARTINI", "INI SA", "LOPEZ INI", "PEREZ"], start=1
+    ):
+        exito, mensaje = database.crear_gestion(
+            ngestion=ngestion,
+            fecha="2024-05-01",
+            cliente=cliente,
+            dominio="",
+            poliza=f"P{ngestion}",
+            tipo="VEHICULAR",
+            motivo="",
+            ncaso=0,
+            usuariocarga="",
+            usuariorespuesta="",
+            estado="",
+            itr=0,
+            totalfactura=0.0,
+            terminado=0,
+            obs="",
+            activa=1,
+        )
+        assert exito, mensaje
+    return database
+
+
+def clientes(database, texto: str) -> set[str]:
+    return {
+        g["cliente"]
+        for g in database.filter_gestiones(
+            texto_busqueda=texto, **FILTROS
+        )
+    }
+
+
+@pytest.mark.parametrize(
+    "texto, esperado",
+    [
+        ("INI", {"MARTINI", "INI SA", "LOPEZ INI"}),  # FTS
+        ("IN", {"MARTINI", "INI SA", "LOPEZ INI"}),  # LIKE
+        ("PER", {"PEREZ"}),
+    ],
+)
+def test_espacios_en_los_extremos_no_cambian_el_resultado(
+    con_gestiones, texto, esperado
+):
+    assert clientes(con_gestiones, texto) == esperado
+    assert clientes(con_gestiones, f" {texto} ") == esperado
+    assert clientes(con_gestiones, f"{texto}  ") == esperado
+
+
+def test_solo_espacios_no_filtra(con_gestiones):
+    assert len(clientes(con_gestiones, "   ")) == 4
+    assert len(clientes(con_gestiones, None)) == 4
+
+
+@pytest.mark.parametrize("texto", [" ab ", " abcd "])
+def test_pagos_usan_el_texto_sin_espacios(database, texto):
+    _, params = database._where_pagos(
+        texto_busqueda=texto,
+        pagador="all",
+        destinatario="all",
+        formapago="all",
+        es_nota_credito_no_pasada=False,
+    )
+    assert params["texto"] == f"%{texto.strip()}%"
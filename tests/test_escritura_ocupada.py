@@ -0,0 +1,75 @@
+"""Escrituras desde el event loop con el camino de escritura tomado"""
+
+import threading
+
+import pytest
+
+from src.db.database import ESCRITURA_OCUPADA
+from src.db.pool import EscrituraOcupada
+
+# Métodos de escritura que usan las páginas y sus argumentos; ninguno
+# llega a ejecutarse
+ESCRITURAS = {
+    "actualizar_pago": (
+        1,
+        "2024-05-01",
+        "SOS",
+        "SOS",
+        "EFECTIVO",
+        1,
+    ),
+    "crear_pago": (1, "2024-05-01", "SOS", "SOS", "EFECTIVO", 1),
+    "crear_factura": (202405, "2024-05-01", 1.0),
+    "actualizar_factura": (1, 202405, "2024-05-01", 1.0),
+    "eliminar_factura": (1,),
+    "asignar_notas_a_factura": ([1], 1),
+    "crear_factura_con_notas": (202405, "2024-05-01", 1.0, [1]),
+    "desasociar_nota_de_factura": (1,),
+    "crear_documento": (1, "Título", "a.pdf", "a.pdf", "h", 1),
+    "desasociar_documento": (1, 1),
+}
+
+
+@pytest.fixture
+def ocupada(database):
+    """Otro hilo (p. ej. una importación) tiene el camino de
+    escritura"""
+    database.pool.espera_event_loop = 0.01
+    tomado, liberar = threading.Event(), threading.Event()
+
+    def escribir():
+        with database.pool.escritura():
+            tomado.set()
+            liberar.wait(10)
+
+    hilo = threading.Thread(target=escribir)
+    hilo.start()
+    tomado.wait(10)
+    yield database
+    liberar.set()
+    hilo.join()
+
+
+@pytest.mark.parametrize("metodo, args", ESCRITURAS.items())
+async def test_retorna_ocupada(ocupada, metodo, args):
+    assert getattr(ocupada, metodo)(*args) == ESCRITURA_OCUPADA
+    assert ocupada.pool.metricas()["escrituras_rechazadas"] == 1
+
+
+@pytest.mark.parametrize(
+    "metodo", ["eliminar_pago", "eliminar_gestion"]
+)
+async def test_eliminar_retorna_false(ocupada, metodo):
+    assert getattr(ocupada, metodo)(1) is False
+
+
+async def test_sin_valor_de_retorno_levanta(ocupada):
+    with pytest.raises(EscrituraOcupada):
+        ocupada.reconstruir_pagos_mensuales()
+
+
+async def test_libre_escribe(database):
+    exito, mensaje = database.crear_factura(
+        202405, "2024-05-01", 1.0
+    )
+    assert exito, mensaje
@@ -0,0 +1,124 @@
+"""Lectura y normalización de archivos de gestiones"""
+
+import polars as pl
+import pytest
+
+from src.db.importacion import leer_bloques, normalizar
+
+EXTENSIONES = [".xlsx", ".csv", ".parquet"]
+
+
+def planilla(**columnas) -> pl.DataFrame:
+    datos = {
+        "Fecha": ["05/03/24", "2024-03-06", ""],
+        "N° Gestión": ["1", "2", "x"],
+        "Cliente": [" ACME ", "", "Otro"],
+        "Dominio": ["ab 123 cd", "", ""],
+        "Póliza": ["P1", "P2", "P3"],
+        "Tipo": ["vehicular", None, "hogar"],
+        "Motivo": ["", "", ""],
+        "N° Caso": ["7", "", "1"],
+        "Usuario Carga": ["", "", ""],
+        "Usuario Respuesta": ["", "", ""],
+        "Estado": ["abierto", "", ""],
+        "ITR": ["", "3", "0"],
+    }
+    datos.update(columnas)
+    return pl.DataFrame(
+        {k: v for k, v in datos.items() if v is not None}
+    )
+
+
+@pytest.mark.parametrize("extension", EXTENSIONES)
+def test_faltan_columnas(guardar_archivo, extension):
+    archivo = guardar_archivo(
+        planilla(**{"N° Caso": None, "ITR": None}), extension
+    )
+    # Se valida al llamar, antes de recorrer los bloques
+    with pytest.raises(
+        ValueError,
+        match="^Faltan columnas en el archivo: N° Caso, ITR$",
+    ):
+        leer_bloques(archivo, 2)
+
+
+def test_formato_no_soportado(tmp_path):
+    with pytest.raises(ValueError, match="Formato no soportado"):
+        leer_bloques(tmp_path / "gestiones.txt", 2)
+
+
+@pytest.mark.parametrize("extension", EXTENSIONES)
+def test_normaliza_cada_formato_igual(guardar_archivo, extension):
+    archivo = guardar_archivo(planilla(), extension)
+    bloques = list(leer_bloques(archivo, 2))
+    assert [b.height for b in bloques] == [2, 1]
+
+    filas, errores = normalizar(pl.concat(bloques))
+    assert filas.to_dicts() == [
+        {
+            "ngestion": 1,
+            "fecha": "2024-03-05",
+            "cliente": "ACME",
+            "dominio": "AB123CD",
+            "poliza": "P1",
+            "tipo": "VEHICULAR",
+            "motivo": "",
+            "ncaso": 7,
+            "usuariocarga": "",
+            "usuariorespuesta": "",
+            "estado": "ABIERTO",
+            "itr": 0,
+        },
+        {
+            "ngestion": 2,
+            "fecha": "2024-03-06",
+            "cliente": "",
+            "dominio": "",
+            "poliza": "P2",
+            "tipo": "VEHICULAR",
+            "motivo": "",
+            "ncaso": 0,
+            "usuariocarga": "",
+            "usuariorespuesta": "",
+            "estado": "",
+            "itr": 3,
+        },
+    ]
+    assert errores["error"].to_list() == [
+        "Fila 4: N° Gestión inválido (x)"
+    ]
+
+
+def test_reimportar_sin_cambios_no_invalida_caches(
+    database, guardar_archivo
+):
+    archivo = guardar_archivo(planilla(), ".csv")
+    exito, estadisticas = database.importar_gestiones_desde_excel(
+        archivo
+    )
+    assert exito, estadisticas
+    version = database.pool.version
+    catalogos = database.catalogos.version
+
+    exito, estadisticas = database.importar_gestiones_desde_excel(
+        archivo
+    )
+    assert exito, estadisticas
+    assert estadisticas["sin_cambios"] == 2
+    assert estadisticas["insertadas"] == 0
+    assert estadisticas["actualizadas"] == 0
+    assert database.pool.version == version
+    assert database.catalogos.version == catalogos
+
+    # Con una fila cambiada se escribe y se invalida
+    archivo = guardar_archivo(
+        planilla(Estado=["cerrado", "", ""]), ".csv"
+    )
+    exito, estadisticas = database.importar_gestiones_desde_excel(
+        archivo
+    )
+    assert exito, estadisticas
+    assert estadisticas["actualizadas"] == 1
+    assert estadisticas["sin_cambios"] == 1
+    assert database.pool.version == version + 1
+    assert database.catalogos.version == catalogos + 1
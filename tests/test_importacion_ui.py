@@ -0,0 +1,139 @@
+"""Importación de gestiones desde el diálogo de la página principal"""
+
+import threading
+from pathlib import Path
+
+import polars as pl
+import pytest
+from nicegui import ui
+from nicegui.elements.upload_files import SmallFileUpload
+from nicegui.testing import User
+
+from src.db import database as modulo_database
+from src.db import importacion
+
+FILAS = 20
+
+
+def planilla(filas: int = FILAS) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "Fecha": ["05/03/24"] * filas,
+            "N° Gestión": [str(n) for n in range(1, filas + 1)],
+            "Cliente": [f"CLIENTE {n}" for n in range(filas)],
+            "Dominio": ["ab 123 cd"] * filas,
+            "Póliza": ["P1"] * filas,
+            "Tipo": ["vehicular"] * filas,
+            "Motivo": [""] * filas,
+            "N° Caso": ["0"] * filas,
+            "Usuario Carga": [""] * filas,
+            "Usuario Respuesta": [""] * filas,
+            "Estado": ["abierto"] * filas,
+            "ITR": ["0"] * filas,
+        }
+    )
+
+
+async def subir(user: User, archivo: Path):
+    await user.open("/")
+    await user.should_see("Importar Excel", retries=50)
+    user.find("Importar Excel").click()
+    await user.should_see("Importar Gestiones desde Excel")
+    upload = user.find(ui.upload).elements.pop()
+    await upload.handle_uploads(
+        [
+            SmallFileUpload(
+                archivo.name,
+                "application/octet-stream",
+                archivo.read_bytes(),
+            )
+        ]
+    )
+
+
+def gestiones(database) -> int:
+    return database.cursor.execute(
+        "SELECT count(*) FROM gestiones"
+    ).fetchone()[0]
+
+
+@pytest.mark.parametrize(
+    "extension", [".xlsx", ".csv", ".parquet"]
+)
+async def test_importa_cada_formato(
+    user: User, database_app, guardar_archivo, extension
+):
+    await subir(user, guardar_archivo(planilla(), extension))
+    await user.should_see("Importación completada", retries=100)
+    await user.should_see(f"➕ {FILAS} gestiones insertadas")
+    assert gestiones(database_app) == FILAS
+    fila = database_app.cursor.execute(
+        "SELECT fecha, dominio, tipo FROM gestiones WHERE ngestion = 1"
+    ).fetchone()
+    assert tuple(fila) == ("2024-03-05", "AB123CD", "VEHICULAR")
+
+
+async def test_rechaza_formato_no_soportado(
+    user: User, database_app, tmp_path
+):
+    archivo = tmp_path / "gestiones.txt"
+    archivo.write_text("x")
+    await subir(user, archivo)
+    await user.should_see("Error en la importación", retries=100)
+    await user.should_see("Formato no soportado")
+
+
+async def test_cancelar_guarda_lo_ya_escrito(
+    user: User, database_app, guardar_archivo, monkeypatch
+):
+    # Bloques de 10 filas; la lectura del segundo espera a que el
+    # test cancele, sin tener el camino de escritura
+    monkeypatch.setattr(
+        modulo_database, "IMPORTACION_FILAS_POR_BLOQUE", 10
+    )
+    monkeypatch.setattr(
+        modulo_database, "IMPORTACION_FILAS_POR_ESCRITURA", 5
+    )
+    continuar = threading.Event()
+    leer_bloques = importacion.leer_bloques
+
+    def leer_pausado(archivo, filas):
+        bloques = leer_bloques(archivo, filas)
+        yield next(bloques)
+        continuar.wait(10)
+        yield from bloques
+
+    monkeypatch.setattr(importacion, "leer_bloques", leer_pausado)
+
+    await subir(user, guardar_archivo(planilla(), ".csv"))
+    try:
+        await user.should_see(
+            "10 gestiones escritas", retries=100
+        )
+
+        # Entre bloques la importación no frena las demás escrituras
+        with database_app.escritura() as conn:
+            conn.execute("UPDATE gestiones SET obs = 'x'")
+            conn.commit()
+
+        user.find("Cancelar").click()
+    finally:
+        continuar.set()
+    await user.should_see("Importación cancelada", retries=100)
+    await user.should_see(
+        "Se guardaron las filas anteriores: 10 gestiones insertadas"
+        " y 0 actualizadas"
+    )
+    assert gestiones(database_app) == 10
+
+
+async def test_rechaza_un_archivo_sin_todas_las_columnas(
+    user: User, database_app, guardar_archivo
+):
+    df = planilla().drop("N° Caso", "ITR")
+    await subir(user, guardar_archivo(df, ".csv"))
+    await user.should_see("Error en la importación", retries=100)
+    await user.should_see(
+        "Faltan columnas en el archivo: N° Caso, ITR"
+    )
+    assert gestiones(database_app) == 0
@@ -0,0 +1,57 @@
+"""Migraciones versionadas de sql/migraciones"""
+
+import sqlite3
+
+import pytest
+
+
+def version(database) -> int:
+    return database.cursor.execute(
+        "PRAGMA user_version"
+    ).fetchone()[0]
+
+
+@pytest.fixture
+def antes_de_ngestion_unico(database, crear_gestion):
+    """Base en la versión 4, con N° Gestión repetidos por UPDATE"""
+    database.cursor.executescript(
+        """
+        DROP INDEX idx_gestiones_ngestion_unico;
+        PRAGMA user_version = 4;
+        """
+    )
+    for ngestion in range(1, 7):
+        crear_gestion(ngestion)
+    database.cursor.executescript(
+        """
+        UPDATE gestiones SET ngestion = 9 WHERE ngestion IN (1, 2);
+        UPDATE gestiones SET ngestion = 7 WHERE ngestion IN (3, 4, 5);
+        """
+    )
+    return database
+
+
+def test_ngestion_repetidos_se_listan(antes_de_ngestion_unico):
+    with pytest.raises(
+        sqlite3.IntegrityError,
+        match=r"mismo N° Gestión \(7, 9\)",
+    ):
+        antes_de_ngestion_unico.aplicar_migraciones()
+    assert version(antes_de_ngestion_unico) == 4
+
+
+def test_ngestion_corregidos_se_migra(antes_de_ngestion_unico):
+    database = antes_de_ngestion_unico
+    database.cursor.execute(
+        """
+        UPDATE gestiones SET ngestion = 100 + id
+        WHERE ngestion IN (7, 9)
+        """
+    )
+    database.conn.commit()
+
+    assert database.aplicar_migraciones() == 5
+    with pytest.raises(sqlite3.IntegrityError):
+        database.cursor.execute(
+            "UPDATE gestiones SET ngestion = 6 WHERE ngestion = 101"
+        )
@@ -0,0 +1,72 @@
+"""Paginación por cursor (fecha, id) de gestiones"""
+
+import pytest
+
+FILTROS = {
+    "texto_busqueda": "",
+    "tipo": "all",
+    "terminado": False,
+    "no_terminado": False,
+    "activa": True,
+    "no_activa": False,
+    "con_pagos": False,
+    "sin_pagos": False,
+    "con_nota": False,
+    "sin_nota": False,
+    "con_nota_pasada": False,
+}
+
+
+@pytest.fixture
+def con_fechas_nulas(database, crear_gestion):
+    # Como las deja la migración desde Access
+    fechas = [
+        "2024-05-01",
+        None,
+        "2024-05-03",
+        "2024-05-01",
+        None,
+        "2024-05-02",
+    ]
+    for ngestion, fecha in enumerate(fechas, start=1):
+        crear_gestion(ngestion)
+        database.cursor.execute(
+            "UPDATE gestiones SET fecha = ? WHERE ngestion = ?",
+            (fecha, ngestion),
+        )
+    database.conn.commit()
+    return database
+
+
+def recorrer(database, descendente: bool, por_pagina: int):
+    """Páginas que trae el cursor de la última fila de cada una"""
+    paginas, cursor = [], None
+    while True:
+        filas = database.filter_gestiones(
+            **FILTROS,
+            limite=por_pagina,
+            descendente=descendente,
+            despues_de=cursor,
+        )
+        if not filas:
+            return paginas
+        paginas.append([f["ngestion"] for f in filas])
+        cursor = (filas[-1]["fecha"], filas[-1]["id"])
+
+
+@pytest.mark.parametrize("descendente", [True, False])
+@pytest.mark.parametrize("por_pagina", [1, 2, 3, 4])
+def test_fechas_nulas_no_se_pierden(
+    con_fechas_nulas, descendente, por_pagina
+):
+    todas = [
+        f["ngestion"]
+        for f in con_fechas_nulas.filter_gestiones(
+            **FILTROS, descendente=descendente
+        )
+    ]
+    assert len(todas) == 6
+
+    paginas = recorrer(con_fechas_nulas, descendente, por_pagina)
+    assert [n for p in paginas for n in p] == todas
+    assert all(len(p) == por_pagina for p in paginas[:-1])
@@ -0,0 +1,142 @@
+"""
+Planes de las consultas de gestiones y pagos.
+
+Cada combinación de filtros tiene que traer su página con índices: un
+SCAN sin índice sobre gestiones, pagos o notas recorre la tabla
+entera. Los COUNT(*) quedan afuera: sin filtros cuentan todas las
+filas de cualquier modo.
+"""
+
+import itertools
+
+import pytest
+
+# Alias de las tablas grandes en las consultas
+TABLAS_GRANDES = {"g", "p", "n", "gestiones", "pagos", "notas"}
+
+TEXTOS = ["", "ab", "abc"]  # sin búsqueda, LIKE y FTS
+
+FLAGS_GESTIONES = [
+    "terminado",
+    "no_terminado",
+    "activa",
+    "no_activa",
+    "con_pagos",
+    "sin_pagos",
+    "con_nota",
+    "sin_nota",
+    "con_nota_pasada",
+]
+
+FILTROS_PAGOS = [
+    {},
+    {"pagador": "SOS"},
+    {"destinatario": "PRESTADOR"},
+    {"formapago": "TRANSFERENCIA"},
+    {"es_nota_credito_no_pasada": True},
+]
+
+
+def paginas(database, llamar) -> list[str]:
+    """Consultas de páginas (con LIMIT) que ejecuta llamar(), con los
+    parámetros puestos"""
+    sentencias = []
+    database.conn.set_trace_callback(sentencias.append)
+    try:
+        llamar()
+    finally:
+        database.conn.set_trace_callback(None)
+    return [s for s in sentencias if "LIMIT" in s]
+
+
+def plan(database, consulta: str) -> list[str]:
+    return [
+        fila["detail"]
+        for fila in database.cursor.execute(
+            "EXPLAIN QUERY PLAN " + consulta
+        )
+    ]
+
+
+def verificar_indices(database, sentencias: list[str]):
+    assert sentencias
+    for consulta in sentencias:
+        detalles = plan(database, consulta)
+        for detalle in detalles:
+            partes = detalle.split()
+            if (
+                partes[0] == "SCAN"
+                and partes[1] in TABLAS_GRANDES
+            ):
+                assert "USING" in partes, (detalle, consulta)
+        assert any(
+            "USING INDEX" in d
+            or "USING COVERING INDEX" in d
+            or "USING INTEGER PRIMARY KEY" in d
+            for d in detalles
+        ), (detalles, consulta)
+
+
+@pytest.mark.parametrize(
+    "texto, tipo, flag",
+    list(
+        itertools.product(
+            TEXTOS, ["all", "VEHICULAR"], [None, *FLAGS_GESTIONES]
+        )
+    ),
+)
+def test_filtros_gestiones_usan_indices(
+    database, texto, tipo, flag
+):
+    filtros = dict.fromkeys(FLAGS_GESTIONES, False)
+    if flag:
+        filtros[flag] = True
+    filtros.update(texto_busqueda=texto, tipo=tipo)
+
+    sentencias = paginas(
+        database,
+        lambda: [
+            database.filter_gestiones(**filtros, limite=50),
+            *(
+                database.filter_gestiones(
+                    **filtros,
+                    limite=50,
+                    descendente=descendente,
+                    despues_de=cursor,
+                )
+                for descendente in (True, False)
+                # Con fecha y sin fecha (NULL)
+                for cursor in (("2024-01-01", 1), (None, 1))
+            ),
+        ],
+    )
+    verificar_indices(database, sentencias)
+
+
+@pytest.mark.parametrize(
+    "texto, filtro",
+    list(itertools.product(TEXTOS, FILTROS_PAGOS)),
+)
+def test_filtros_pagos_usan_indices(database, texto, filtro):
+    filtros = {
+        "texto_busqueda": texto,
+        "pagador": "all",
+        "destinatario": "all",
+        "formapago": "all",
+        "es_nota_credito_no_pasada": False,
+        **filtro,
+    }
+
+    sentencias = paginas(
+        database,
+        lambda: (
+            database.filtrar_pagos_paginado(**filtros, limite=50),
+            database.filtrar_pagos_paginado(
+                **filtros,
+                limite=50,
+                despues_de=("2024-01-01", 1),
+                contar=False,
+            ),
+        ),
+    )
+    verificar_indices(database, sentencias)
@@ -0,0 +1,56 @@
+"""CacheReportes: vigencia de los resultados por versión de datos"""
+
+from src.db.reportes import CacheReportes
+
+
+def calculo(valor):
+    llamadas = []
+
+    def calcular():
+        llamadas.append(valor)
+        return valor
+
+    return calcular, llamadas
+
+
+def test_reusa_el_resultado_de_la_misma_version():
+    cache = CacheReportes()
+    calcular, llamadas = calculo("a")
+    assert cache.obtener("r", (), 1, calcular) == "a"
+    assert cache.obtener("r", (), 1, calcular) == "a"
+    assert llamadas == ["a"]
+
+
+def test_una_version_nueva_descarta_las_anteriores():
+    cache = CacheReportes()
+    cache.obtener("r", (), 1, lambda: "v1")
+    cache.obtener("otro", (), 1, lambda: "v1")
+    cache.obtener("r", (), 2, lambda: "v2")
+
+    calcular, llamadas = calculo("v2")
+    assert cache.obtener("otro", (), 2, calcular) == "v2"
+    assert llamadas == ["v2"]
+
+
+def test_un_calculo_viejo_no_descarta_resultados_nuevos():
+    cache = CacheReportes()
+    cache.obtener("r", (), 2, lambda: "v2")
+    cache.obtener("otro", (), 2, lambda: "v2")
+
+    # Un cliente que leyó la versión 1 antes de la escritura termina
+    # después
+    assert cache.obtener("r", (), 1, lambda: "v1") == "v1"
+    assert cache.obtener("otro", (), 1, lambda: "v1") == "v1"
+
+    calcular, llamadas = calculo("nuevo")
+    assert cache.obtener("r", (), 2, calcular) == "v2"
+    assert cache.obtener("otro", (), 2, calcular) == "v2"
+    assert llamadas == []
+
+
+def test_vence_con_el_ttl():
+    cache = CacheReportes(ttl=0)
+    calcular, llamadas = calculo("a")
+    cache.obtener("r", (), 1, calcular)
+    cache.obtener("r", (), 1, calcular)
+    assert llamadas == ["a", "a"]
@@ -0,0 +1,97 @@
+"""Página de reportes: cada pestaña se calcula al abrirla"""
+
+import importlib
+
+import pytest
+from nicegui.testing import User
+
+TITULO_FORMAS = "Análisis de Pagos por Forma de Pago"
+TITULO_AGENTES = "Análisis de Pagos por Pagador y Destinatario"
+TITULO_COMPARACION = (
+    "Comparación por Agente: Pagador vs Destinatario"
+)
+
+
+@pytest.fixture
+def con_pagos(database_app, crear_gestion):
+    with database_app.escritura() as conn:
+        conn.executemany(
+            "INSERT INTO agentes (agente) VALUES (?)",
+            [("SOS",), ("SM",), ("PRESTADOR",)],
+        )
+        conn.execute(
+            "INSERT INTO formaspago (formapago) VALUES ('TRANSFERENCIA')"
+        )
+        conn.commit()
+    for ngestion, fecha, pagador in [
+        (1, "2024-04-10", "SOS"),
+        (2, "2024-05-20", "SM"),
+    ]:
+        gestion_id = crear_gestion(ngestion, fecha=fecha)
+        exito, mensaje = database_app.crear_pago(
+            gestion_id=gestion_id,
+            fecha=fecha,
+            pagador=pagador,
+            destinatario="PRESTADOR",
+            formapago="TRANSFERENCIA",
+            importe=1000.0,
+        )
+        assert exito, mensaje
+    return database_app
+
+
+@pytest.fixture
+def figuras(user, monkeypatch) -> list[str]:
+    """Paneles cuya figura se calculó, en orden"""
+    # El módulo que importó main.py al levantar la aplicación
+    reportes = importlib.import_module("src.pages.reportes")
+    calculadas = []
+    paneles = {}
+    for nombre, panel in reportes.PANELES.items():
+
+        def figura(*args, nombre=nombre, original=panel[2], **kw):
+            calculadas.append(nombre)
+            return original(*args, **kw)
+
+        paneles[nombre] = (*panel[:2], figura, *panel[3:])
+    monkeypatch.setattr(reportes, "PANELES", paneles)
+    return calculadas
+
+
+async def test_solo_se_calcula_la_pestana_inicial(
+    user: User, con_pagos, figuras
+):
+    await user.open("/reportes")
+    await user.should_see(TITULO_FORMAS, retries=50)
+    await user.should_not_see(TITULO_AGENTES)
+    await user.should_not_see(TITULO_COMPARACION)
+    assert figuras == ["formas_pago"]
+
+
+async def test_las_pestanas_se_calculan_al_abrirlas(
+    user: User, con_pagos, figuras
+):
+    await user.open("/reportes")
+    await user.should_see(TITULO_FORMAS, retries=50)
+
+    user.find("👥 Pagadores y Destinatarios").click()
+    await user.should_see(TITULO_AGENTES, retries=50)
+    user.find("🔍 Comparación por Agente").click()
+    await user.should_see(TITULO_COMPARACION, retries=50)
+
+    # Volver a una pestaña ya cargada no la recalcula
+    user.find("📋 Formas de Pago").click()
+    user.find("👥 Pagadores y Destinatarios").click()
+    assert figuras == [
+        "formas_pago",
+        "agentes",
+        "comparacion_agente",
+    ]
+
+
+async def test_sin_pagos(user: User, database_app, figuras):
+    await user.open("/reportes")
+    await user.should_see("No hay datos disponibles", retries=50)
+    await user.should_see(
+        "No hay datos de formas de pago", retries=50
+    )